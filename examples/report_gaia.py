@@ -0,0 +1,87 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+r"""Rescore GAIA result files with the current scorer and compare the runs.
+
+Usage:
+    python examples/report_gaia.py results/*.jsonl results/old.json \
+        --output-dir results/rescored --json results/report.json
+
+Every file is one run, in the JSON format of `GAIABenchmark` or the JSONL
+format of its result store. The table shows the accuracy overall and per
+level, the scores changed by rescoring, the tokens and seconds per task and
+the cost per correct answer.
+"""
+
+import argparse
+import json
+
+from camel.logger import set_log_level
+
+set_log_level(level="WARNING")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("results", nargs="+", help="Result files, one per run.")
+    parser.add_argument(
+        "--output-dir", default=None, help="Directory for the rescored results."
+    )
+    parser.add_argument("--json", default=None, help="File for the report as JSON.")
+    parser.add_argument(
+        "--data-dir", default="data/gaia", help="The GAIA data directory."
+    )
+    parser.add_argument(
+        "--processes", type=int, default=None, help="Files scored at once."
+    )
+    parser.add_argument(
+        "--prompt-price", type=float, default=2.5, help="USD per 1M prompt tokens."
+    )
+    parser.add_argument(
+        "--completion-price",
+        type=float,
+        default=10.0,
+        help="USD per 1M completion tokens.",
+    )
+    parser.add_argument(
+        "--cached-prompt-price",
+        type=float,
+        default=None,
+        help="USD per 1M cached prompt tokens (default: the prompt price).",
+    )
+    return parser.parse_args()
+
+
+def main():
+    r"""Rescore the given result files and print the comparison table."""
+    args = parse_args()
+
+    from owl.utils.gaia_report import Pricing, format_report_table, report_runs
+
+    reports = report_runs(
+        args.results,
+        output_dir=args.output_dir,
+        data_dir=args.data_dir,
+        pricing=Pricing(
+            args.prompt_price, args.completion_price, args.cached_prompt_price
+        ),
+        processes=args.processes,
+    )
+    print(format_report_table(reports))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -29,7 +29,14 @@ from camel.types import ModelPlatformType, ModelType
 from camel.logger import set_log_level
 from camel.societies import RolePlaying
 
-from owl.utils import run_society, DocumentProcessingToolkit
+from owl.utils import (
+    run_society,
+    DocumentProcessingToolkit,
+    SocietyResources,
+    WarmSocietyFactory,
+    LazyToolkit,
+    log_toolkit_report,
+)
 
 base_dir = pathlib.Path(__file__).parent.parent
 env_path = base_dir / "owl" / ".env"
@@ -38,14 +45,12 @@ load_dotenv(dotenv_path=str(env_path))
 set_log_level(level="DEBUG")
 
 
-def construct_society(question: str) -> RolePlaying:
-    r"""Construct a society of agents based on the given question.
-
-    Args:
-        question (str): The task or question to be addressed by the society.
+def build_resources() -> SocietyResources:
+    r"""Build the models and toolkits of the society, which do not depend on
+    the question and are reused across questions.
 
     Returns:
-        RolePlaying: A configured society of agents ready to address the question.
+        SocietyResources: The agent arguments with models and tools.
     """
 
     # Create models for different components
@@ -87,45 +92,57 @@ def construct_society(question: str) -> RolePlaying:
         ),
     }
 
-    # Configure toolkits
+    # Configure toolkits. They are only constructed when the agent first
+    # calls one of their tools.
+    search_toolkit = LazyToolkit(SearchToolkit)
     tools = [
-        *BrowserToolkit(
+        *LazyToolkit(
+            BrowserToolkit,
             headless=False,  # Set to True for headless mode (e.g., on remote servers)
             web_agent_model=models["browsing"],
             planning_agent_model=models["planning"],
         ).get_tools(),
-        *VideoAnalysisToolkit(model=models["video"]).get_tools(),
-        *AudioAnalysisToolkit().get_tools(),  # This requires OpenAI Key
-        *CodeExecutionToolkit(sandbox="subprocess", verbose=True).get_tools(),
-        *ImageAnalysisToolkit(model=models["image"]).get_tools(),
-        SearchToolkit().search_duckduckgo,
-        SearchToolkit().search_google,  # Comment this out if you don't have google search
-        SearchToolkit().search_wiki,
-        *ExcelToolkit().get_tools(),
-        *DocumentProcessingToolkit(model=models["document"]).get_tools(),
-        *FileWriteToolkit(output_dir="./").get_tools(),
+        *LazyToolkit(VideoAnalysisToolkit, model=models["video"]).get_tools(),
+        *LazyToolkit(AudioAnalysisToolkit).get_tools(),  # This requires OpenAI Key
+        *LazyToolkit(
+            CodeExecutionToolkit, sandbox="subprocess", verbose=True
+        ).get_tools(),
+        *LazyToolkit(ImageAnalysisToolkit, model=models["image"]).get_tools(),
+        search_toolkit.get_tool("search_duckduckgo"),
+        # Comment this out if you don't have google search
+        search_toolkit.get_tool("search_google"),
+        search_toolkit.get_tool("search_wiki"),
+        *LazyToolkit(ExcelToolkit).get_tools(),
+        *LazyToolkit(DocumentProcessingToolkit, model=models["document"]).get_tools(),
+        *LazyToolkit(FileWriteToolkit, output_dir="./").get_tools(),
     ]
+    log_toolkit_report(tools)
 
     # Configure agent roles and parameters
     user_agent_kwargs = {"model": models["user"]}
     assistant_agent_kwargs = {"model": models["assistant"], "tools": tools}
 
-    # Configure task parameters
-    task_kwargs = {
-        "task_prompt": question,
-        "with_task_specify": False,
-    }
-
-    # Create and return the society
-    society = RolePlaying(
-        **task_kwargs,
-        user_role_name="user",
+    return SocietyResources(
         user_agent_kwargs=user_agent_kwargs,
-        assistant_role_name="assistant",
         assistant_agent_kwargs=assistant_agent_kwargs,
     )
 
-    return society
+
+# Models and toolkits are built on the first question of every thread and
+# reused afterwards; each society only gets fresh agents.
+society_factory = WarmSocietyFactory(build_resources, society_cls=RolePlaying)
+
+
+def construct_society(question: str) -> RolePlaying:
+    r"""Construct a society of agents based on the given question.
+
+    Args:
+        question (str): The task or question to be addressed by the society.
+
+    Returns:
+        RolePlaying: A configured society of agents ready to address the question.
+    """
+    return society_factory(question)
 
 
 def main():
@@ -139,6 +156,7 @@ def main():
     # Construct and run the society
     society = construct_society(task)
     answer, chat_history, token_count = run_society(society)
+    log_toolkit_report(list(society.assistant_agent.tool_dict.values()))
 
     # Output the result
     print(f"\033[94mAnswer: {answer}\033[0m")
@@ -0,0 +1,110 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+r"""Run many questions concurrently, one society per question.
+
+Usage:
+    python examples/run_batch.py tasks.jsonl --output results.jsonl \
+        --concurrency 8 --timeout 900
+
+Every line of the task file is a JSON object with a ``question`` field and an
+optional ``task_id``. Results are appended to the output file as soon as
+each task finishes.
+"""
+
+import argparse
+import asyncio
+import pathlib
+
+from dotenv import load_dotenv
+from camel.logger import get_logger, set_log_level
+
+base_dir = pathlib.Path(__file__).parent.parent
+env_path = base_dir / "owl" / ".env"
+load_dotenv(dotenv_path=str(env_path))
+
+set_log_level(level="INFO")
+
+logger = get_logger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tasks", help="JSONL file with one task per line.")
+    parser.add_argument(
+        "--output", default="results/batch.jsonl", help="JSONL file for results."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Societies running at once."
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Per-task timeout in seconds."
+    )
+    parser.add_argument("--round-limit", type=int, default=15)
+    parser.add_argument(
+        "--rpm", type=float, default=None, help="Model requests per minute."
+    )
+    parser.add_argument(
+        "--tpm", type=float, default=None, help="Model tokens per minute."
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Do not store the chat history in the results.",
+    )
+    return parser.parse_args()
+
+
+async def main():
+    r"""Run all tasks of the given file with the society of `examples/run.py`."""
+    args = parse_args()
+
+    # Imported after parsing the arguments, so that `--help` and argument
+    # errors do not wait for the agents and toolkits to load
+    from owl.utils.batch_runner import arun_societies, load_tasks
+    from owl.utils.rate_limiter import get_rate_limiter, rate_limit_society
+
+    from run import construct_society
+
+    society_factory = construct_society
+    if args.rpm or args.tpm:
+        # All societies share the limits of the provider key
+        limiter = get_rate_limiter(
+            requests_per_minute=args.rpm, tokens_per_minute=args.tpm
+        )
+
+        def society_factory(question):
+            return rate_limit_society(construct_society(question), limiter)
+
+    pathlib.Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    tasks = load_tasks(args.tasks)
+    logger.info(f"Running {len(tasks)} tasks with concurrency {args.concurrency}.")
+
+    results = await arun_societies(
+        tasks,
+        society_factory,
+        max_concurrency=args.concurrency,
+        task_timeout=args.timeout,
+        round_limit=args.round_limit,
+        output_path=args.output,
+        save_history=not args.no_history,
+    )
+
+    succeeded = sum(result["status"] == "ok" for result in results)
+    print(
+        f"\033[94mFinished {succeeded}/{len(results)} tasks, results in {args.output}\033[0m"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -15,7 +15,9 @@
 from dotenv import load_dotenv
 
 
+import glob
 import os
+from functools import partial
 
 from camel.models import ModelFactory
 from camel.logger import get_logger
@@ -32,7 +34,16 @@ from camel.toolkits import (
 from camel.types import ModelPlatformType, ModelType
 from camel.configs import ChatGPTConfig
 
-from owl.utils import GAIABenchmark
+from owl.utils import (
+    AttachmentCache,
+    DocumentProcessingToolkit,
+    DurationPredictor,
+    GAIABenchmark,
+    LPTScheduler,
+    LLMResponseStore,
+    RecordReplayModel,
+    SocietyResources,
+)
 from camel.logger import set_log_level
 
 import pathlib
@@ -49,16 +60,20 @@ logger = get_logger(__name__)
 LEVEL = 1
 SAVE_RESULT = True
 test_idx = [0]
-
-
-def main():
-    """Main function to run the GAIA benchmark."""
-    # Create cache directory
-    cache_dir = "tmp/"
-    os.makedirs(cache_dir, exist_ok=True)
-    result_dir = "results/"
-    os.makedirs(result_dir, exist_ok=True)
-
+# Number of tasks running at once
+PROCESSES = 1
+# "off" always calls the models, "record" answers repeated requests from
+# tmp/llm_cache and records new ones, "replay" reruns a recorded benchmark
+# offline
+LLM_CACHE_MODE = "off"
+# Add nothing about the extracted attachment to the task prompt ("none"),
+# only the path of the extracted text ("handle"), or also its start
+# ("summary")
+ATTACHMENT_INLINE = "none"
+
+
+def build_resources(llm_store: LLMResponseStore) -> SocietyResources:
+    """Create the models and toolkits of one worker."""
     # Create models for different components
     models = {
         "user": ModelFactory.create(
@@ -93,6 +108,12 @@ def main():
         ),
     }
 
+    # All models are temperature 0, so a rerun sends the same requests
+    models = {
+        name: RecordReplayModel(model, llm_store, mode=LLM_CACHE_MODE)
+        for name, model in models.items()
+    }
+
     # Configure toolkits
     tools = [
         *BrowserToolkit(
@@ -112,16 +133,65 @@ def main():
     ]
 
     # Configure agent roles and parameters
-    user_agent_kwargs = {"model": models["user"]}
-    assistant_agent_kwargs = {"model": models["assistant"], "tools": tools}
+    return SocietyResources(
+        user_agent_kwargs={"model": models["user"]},
+        assistant_agent_kwargs={"model": models["assistant"], "tools": tools},
+    )
+
+
+def main():
+    """Main function to run the GAIA benchmark."""
+    # Create cache directory
+    cache_dir = "tmp/"
+    os.makedirs(cache_dir, exist_ok=True)
+    result_dir = "results/"
+    os.makedirs(result_dir, exist_ok=True)
+
+    llm_store = LLMResponseStore(os.path.join(cache_dir, "llm_cache", "gaia.sqlite3"))
 
     # Initialize benchmark
-    benchmark = GAIABenchmark(data_dir="data/gaia", save_to="results/result.json")
+    benchmark = GAIABenchmark(
+        data_dir="data/gaia", save_to="results/result.json", processes=PROCESSES
+    )
 
     # Print benchmark information
     print(f"Number of validation examples: {len(benchmark.valid)}")
     print(f"Number of test examples: {len(benchmark.test)}")
 
+    # Extract the attachments once, before the societies need them
+    attachment_cache = AttachmentCache(
+        cache_dir=os.path.join(cache_dir, "attachments"),
+        toolkit=DocumentProcessingToolkit(
+            model=ModelFactory.create(
+                model_platform=ModelPlatformType.OPENAI,
+                model_type=ModelType.GPT_4O,
+                model_config_dict=ChatGPTConfig(temperature=0, top_p=1).as_dict(),
+            )
+        ),
+        inline=ATTACHMENT_INLINE,
+    )
+
+    if PROCESSES > 1:
+        # Every worker builds its own models and toolkits
+        agent_kwargs = dict(
+            user_agent_kwargs={},
+            assistant_agent_kwargs={},
+            build_resources=partial(build_resources, llm_store),
+            # Start the tasks predicted to take longest first, learning the
+            # durations from the results of previous runs
+            scheduler=LPTScheduler(
+                DurationPredictor.from_result_files(
+                    glob.glob(os.path.join(result_dir, "*.jsonl"))
+                )
+            ),
+        )
+    else:
+        resources = build_resources(llm_store)
+        agent_kwargs = dict(
+            user_agent_kwargs=resources.user_agent_kwargs,
+            assistant_agent_kwargs=resources.assistant_agent_kwargs,
+        )
+
     # Run benchmark
     result = benchmark.run(
         on="valid",
@@ -129,14 +199,16 @@ def main():
         idx=test_idx,
         save_result=SAVE_RESULT,
         user_role_name="user",
-        user_agent_kwargs=user_agent_kwargs,
         assistant_role_name="assistant",
-        assistant_agent_kwargs=assistant_agent_kwargs,
+        attachment_cache=attachment_cache,
+        **agent_kwargs,
     )
 
     # Output results
     logger.info(f"Correct: {result['correct']}, Total: {result['total']}")
     logger.info(f"Accuracy: {result['accuracy']}")
+    logger.info(f"LLM cache: {llm_store.stats}")
+    logger.info(f"Attachment cache: {attachment_cache.stats}")
 
 
 if __name__ == "__main__":
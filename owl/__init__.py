@@ -6,21 +6,25 @@ This package provides a framework for multi-agent collaboration that pushes the
 
 __version__ = "0.0.1"
 
-# Import key components for easier access
-from owl.utils import (
-    run_society,
-    arun_society,
-    OwlRolePlaying,
-    OwlGAIARolePlaying,
-    DocumentProcessingToolkit,
-    extract_pattern,
-)
-
+# Key components are re-exported from `owl.utils` on first access, so that
+# `import owl` does not load the agents and toolkits.
 __all__ = [
     "run_society",
     "arun_society",
+    "stream_society",
+    "astream_society",
     "OwlRolePlaying",
     "OwlGAIARolePlaying",
     "DocumentProcessingToolkit",
     "extract_pattern",
-] 
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from owl import utils
+
+        value = getattr(utils, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -12,22 +12,146 @@
 # limitations under the License.
 # ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
 
-from .common import extract_pattern
-from .enhanced_role_playing import (
-    OwlRolePlaying,
-    OwlGAIARolePlaying,
-    run_society,
-    arun_society,
-)
-from .gaia import GAIABenchmark
-from .document_toolkit import DocumentProcessingToolkit
-
-__all__ = [
-    "extract_pattern",
-    "OwlRolePlaying",
-    "OwlGAIARolePlaying",
-    "run_society",
-    "arun_society",
-    "GAIABenchmark",
-    "DocumentProcessingToolkit",
-]
+import importlib
+from typing import TYPE_CHECKING
+
+# The heavy dependencies of the submodules (camel agents, datasets, document
+# parsers) are only imported when one of these names is first accessed, so
+# that `import owl.utils` stays cheap.
+_LAZY_IMPORTS = {
+    "extract_pattern": ".common",
+    "OwlRolePlaying": ".enhanced_role_playing",
+    "OwlGAIARolePlaying": ".enhanced_role_playing",
+    "run_society": ".enhanced_role_playing",
+    "arun_society": ".enhanced_role_playing",
+    "stream_society": ".enhanced_role_playing",
+    "astream_society": ".enhanced_role_playing",
+    "resume_society": ".enhanced_role_playing",
+    "BudgetLimits": ".budget",
+    "SocietyBudget": ".budget",
+    "SocietyCheckpointer": ".checkpoint",
+    "load_society": ".checkpoint",
+    "SocietyEvent": ".society_events",
+    "InstructionEvent": ".society_events",
+    "ToolCallStartedEvent": ".society_events",
+    "ToolCallFinishedEvent": ".society_events",
+    "SolutionEvent": ".society_events",
+    "TokenUsageEvent": ".society_events",
+    "TerminationEvent": ".society_events",
+    "ContextCompactor": ".context_compaction",
+    "SocietyTracer": ".tracing",
+    "SocietyResources": ".society_factory",
+    "WarmSocietyFactory": ".society_factory",
+    "LazyToolkit": ".lazy_toolkit",
+    "LazyFunctionTool": ".lazy_toolkit",
+    "toolkit_report": ".lazy_toolkit",
+    "log_toolkit_report": ".lazy_toolkit",
+    "ToolResultCache": ".tool_cache",
+    "CachedFunctionTool": ".tool_cache",
+    "LLMResponseStore": ".llm_cache",
+    "RecordReplayModel": ".llm_cache",
+    "ReplayMissError": ".llm_cache",
+    "RoutedModel": ".model_routing",
+    "RoutingRequest": ".model_routing",
+    "RoutingDecision": ".model_routing",
+    "DefaultRoutingPolicy": ".model_routing",
+    "HedgedModel": ".hedged_model",
+    "RateLimiter": ".rate_limiter",
+    "RateLimitedModel": ".rate_limiter",
+    "get_rate_limiter": ".rate_limiter",
+    "rate_limit_society": ".rate_limiter",
+    "run_societies": ".batch_runner",
+    "arun_societies": ".batch_runner",
+    "ResultStore": ".result_store",
+    "iter_result_file": ".result_store",
+    "AttachmentCache": ".attachment_cache",
+    "AttachmentRecord": ".attachment_cache",
+    "DurationPredictor": ".scheduling",
+    "LPTScheduler": ".scheduling",
+    "GAIABenchmark": ".gaia",
+    "Pricing": ".gaia_report",
+    "rescore_result_file": ".gaia_report",
+    "summarize_results": ".gaia_report",
+    "report_runs": ".gaia_report",
+    "format_report_table": ".gaia_report",
+    "DocumentProcessingToolkit": ".document_toolkit",
+    "DocumentIndex": ".document_index",
+    "BM25Index": ".document_index",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .common import extract_pattern
+    from .enhanced_role_playing import (
+        OwlRolePlaying,
+        OwlGAIARolePlaying,
+        run_society,
+        arun_society,
+        stream_society,
+        astream_society,
+        resume_society,
+    )
+    from .budget import BudgetLimits, SocietyBudget
+    from .checkpoint import SocietyCheckpointer, load_society
+    from .society_events import (
+        SocietyEvent,
+        InstructionEvent,
+        ToolCallStartedEvent,
+        ToolCallFinishedEvent,
+        SolutionEvent,
+        TokenUsageEvent,
+        TerminationEvent,
+    )
+    from .context_compaction import ContextCompactor
+    from .tracing import SocietyTracer
+    from .society_factory import SocietyResources, WarmSocietyFactory
+    from .lazy_toolkit import (
+        LazyToolkit,
+        LazyFunctionTool,
+        toolkit_report,
+        log_toolkit_report,
+    )
+    from .tool_cache import ToolResultCache, CachedFunctionTool
+    from .llm_cache import LLMResponseStore, RecordReplayModel, ReplayMissError
+    from .model_routing import (
+        RoutedModel,
+        RoutingRequest,
+        RoutingDecision,
+        DefaultRoutingPolicy,
+    )
+    from .hedged_model import HedgedModel
+    from .rate_limiter import (
+        RateLimiter,
+        RateLimitedModel,
+        get_rate_limiter,
+        rate_limit_society,
+    )
+    from .batch_runner import run_societies, arun_societies
+    from .result_store import ResultStore, iter_result_file
+    from .attachment_cache import AttachmentCache, AttachmentRecord
+    from .scheduling import DurationPredictor, LPTScheduler
+    from .gaia import GAIABenchmark
+    from .gaia_report import (
+        Pricing,
+        rescore_result_file,
+        summarize_results,
+        report_runs,
+        format_report_table,
+    )
+    from .document_toolkit import DocumentProcessingToolkit
+    from .document_index import DocumentIndex, BM25Index
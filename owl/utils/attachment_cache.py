@@ -0,0 +1,357 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Literal, Optional
+
+from camel.logger import get_logger
+
+if TYPE_CHECKING:
+    from .document_toolkit import DocumentProcessingToolkit
+
+logger = get_logger(__name__)
+
+ATTACHMENT_KINDS = {
+    "document": (".pdf", ".docx", ".doc", ".pptx", ".txt", ".md"),
+    "spreadsheet": (".xlsx", ".xls", ".csv"),
+    "image": (".jpg", ".jpeg", ".png"),
+    "archive": (".zip",),
+    "code": (".py",),
+    "data": (".json", ".jsonl", ".jsonld", ".xml"),
+}
+
+
+def attachment_kind(path: str) -> str:
+    r"""The kind of an attachment from its file extension, ``"other"`` for
+    files that are not extracted (e.g. audio)."""
+    suffix = os.path.splitext(path)[1].lower()
+    for kind, suffixes in ATTACHMENT_KINDS.items():
+        if suffix in suffixes:
+            return kind
+    return "other"
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@dataclass
+class AttachmentRecord:
+    r"""The cached extraction of an attachment.
+
+    Args:
+        sha256 (str): The hash of the file content, the key of the cache.
+        file_name (str): The name of the file the content was extracted
+            from.
+        kind (str): The kind of the attachment, see :obj:`ATTACHMENT_KINDS`.
+        success (bool): Whether the extraction succeeded.
+        content_path (str, optional): The text file with the extracted
+            content.
+        chars (int): The length of the extracted content.
+        error (str, optional): Why the extraction failed.
+    """
+
+    sha256: str
+    file_name: str
+    kind: str
+    success: bool
+    content_path: Optional[str] = None
+    chars: int = 0
+    error: Optional[str] = None
+
+    def read(self) -> str:
+        r"""The extracted content."""
+        if not self.content_path:
+            return ""
+        with open(self.content_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class AttachmentCache:
+    r"""A content-addressed cache of the extracted content of task
+    attachments.
+
+    Attachments are extracted once, in parallel and ahead of the run, with
+    the same tools the agent would call: documents, images and code with
+    :obj:`DocumentProcessingToolkit`, spreadsheets with its Excel toolkit and
+    zip archives member by member. The content is stored under the SHA-256 of
+    the file, so a file shared by several tasks or copied between the
+    validation and test sets is extracted only once, and failed extractions
+    are retried on the next run. A note with the start of the content (or
+    only the path of the extracted text) can then be added to the task
+    prompt, so the agent does not have to extract the attachment itself.
+
+    Args:
+        cache_dir (str, optional): The directory of the cache.
+            (default: :obj:`"tmp/attachments"`)
+        toolkit (DocumentProcessingToolkit, optional): The toolkit used for
+            extraction. (default: a :obj:`DocumentProcessingToolkit` created
+            on first use)
+        max_workers (int, optional): The number of attachments extracted at
+            once. (default: :obj:`8`)
+        inline (Literal["summary", "handle", "none"], optional): What is
+            added to a task prompt: the first :obj:`summary_chars` characters
+            of the content and the path of the full content, only the path,
+            or nothing. (default: :obj:`"summary"`)
+        summary_chars (int, optional): The number of characters of the
+            content inlined in a prompt. (default: :obj:`2000`)
+        max_archive_bytes (int, optional): The largest total uncompressed
+            size of the members of a zip archive; larger archives are not
+            unpacked. (default: :obj:`1 GiB`)
+
+    Example:
+        >>> cache = AttachmentCache(toolkit=DocumentProcessingToolkit(model))
+        >>> benchmark.prefetch_attachments(cache)
+        >>> benchmark.run(..., attachment_cache=cache)
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "tmp/attachments",
+        toolkit: Optional["DocumentProcessingToolkit"] = None,
+        max_workers: int = 8,
+        inline: Literal["summary", "handle", "none"] = "summary",
+        summary_chars: int = 2000,
+        max_archive_bytes: int = 1 << 30,
+    ):
+        if inline not in ("summary", "handle", "none"):
+            raise ValueError(
+                f"Invalid value for `inline`: {inline}, expected 'summary', "
+                "'handle' or 'none'."
+            )
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.inline = inline
+        self.summary_chars = summary_chars
+        self.max_archive_bytes = max_archive_bytes
+        self._toolkit = toolkit
+        self._lock = threading.Lock()
+        self._hashes: Dict[str, str] = {}
+        self.stats = {"hits": 0, "extracted": 0, "failed": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def toolkit(self) -> "DocumentProcessingToolkit":
+        with self._lock:
+            if self._toolkit is None:
+                from .document_toolkit import DocumentProcessingToolkit
+
+                self._toolkit = DocumentProcessingToolkit(
+                    cache_dir=os.path.join(self.cache_dir, "toolkit")
+                )
+            return self._toolkit
+
+    def _entry_path(self, sha256: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, sha256[:2], sha256 + suffix)
+
+    def _hash(self, path: str) -> str:
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        with self._lock:
+            sha256 = self._hashes.get(key)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+            with self._lock:
+                self._hashes[key] = sha256
+        return sha256
+
+    def get(self, path: str) -> Optional[AttachmentRecord]:
+        r"""The cached extraction of a file, if any.
+
+        Args:
+            path (str): The path of the attachment.
+
+        Returns:
+            Optional[AttachmentRecord]: The record, or :obj:`None` if the
+                file was never extracted.
+        """
+        meta_path = self._entry_path(self._hash(path), ".json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return AttachmentRecord(**json.load(f))
+
+    def extract(self, path: str) -> AttachmentRecord:
+        r"""Extract the content of a file, or return its cached extraction.
+
+        Args:
+            path (str): The path of the attachment.
+
+        Returns:
+            AttachmentRecord: The extraction of the file.
+        """
+        record = self.get(path)
+        if record is not None and record.success:
+            with self._lock:
+                self.stats["hits"] += 1
+            return record
+
+        sha256 = self._hash(path)
+        kind = attachment_kind(path)
+        start = time.monotonic()
+        try:
+            success, content = self._extract(path, sha256, kind)
+        except Exception as e:
+            success, content = False, f"{type(e).__name__}: {e}"
+        content = content if isinstance(content, str) else str(content)
+
+        record = AttachmentRecord(sha256, os.path.basename(path), kind, success)
+        if success:
+            record.content_path = self._entry_path(sha256, ".txt")
+            record.chars = len(content)
+            self._write(record.content_path, content)
+        else:
+            record.error = content
+        self._write(self._entry_path(sha256, ".json"), json.dumps(asdict(record)))
+
+        with self._lock:
+            self.stats["extracted" if success else "failed"] += 1
+        if success:
+            logger.info(
+                f"Extracted {kind} attachment {path} in "
+                f"{time.monotonic() - start:.1f}s: {record.chars} characters."
+            )
+        else:
+            logger.warning(f"Could not extract attachment {path}: {record.error}")
+        return record
+
+    def _extract(self, path: str, sha256: str, kind: str):
+        if kind == "other":
+            return False, f"No extractor for {os.path.splitext(path)[1]} files."
+        if kind == "archive":
+            return True, self._extract_archive(path, sha256)
+        if kind == "spreadsheet":
+            return True, self.toolkit.excel_tool.extract_excel_content(path)
+        return self.toolkit.extract_document_content(path)
+
+    def _extract_archive(self, path: str, sha256: str) -> str:
+        r"""Unpack a zip archive next to its cache entry and extract its
+        members one by one.
+
+        Archives with a member outside of the extraction directory or
+        larger than :obj:`max_archive_bytes` uncompressed are refused.
+        """
+        extract_dir = self._entry_path(sha256, "_files")
+        root = os.path.realpath(extract_dir)
+        with zipfile.ZipFile(path) as archive:
+            members = archive.infolist()
+            for info in members:
+                target = os.path.realpath(os.path.join(root, info.filename))
+                if os.path.commonpath([root, target]) != root:
+                    raise ValueError(
+                        f"Archive member {info.filename} is outside of the "
+                        "extraction directory."
+                    )
+            # The sizes are those of the headers, which zipfile enforces
+            # when reading
+            size = sum(info.file_size for info in members)
+            if size > self.max_archive_bytes:
+                raise ValueError(
+                    f"Archive is {size} bytes uncompressed, more than the "
+                    f"limit of {self.max_archive_bytes} bytes."
+                )
+            archive.extractall(extract_dir)
+        sections = []
+        for root, _, files in sorted(os.walk(extract_dir)):
+            for name in sorted(files):
+                member = os.path.join(root, name)
+                relative = os.path.relpath(member, extract_dir)
+                record = self.extract(member)
+                body = record.read() if record.success else record.error
+                sections.append(f"## {relative} (saved at {member})\n{body}")
+        return "\n\n".join(sections)
+
+    def _write(self, path: str, content: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def prefetch(self, paths: Iterable[str]) -> Dict[str, AttachmentRecord]:
+        r"""Extract files in parallel, skipping those already cached.
+
+        Args:
+            paths (Iterable[str]): The paths of the attachments.
+
+        Returns:
+            Dict[str, AttachmentRecord]: The extraction of every file, by
+                path.
+        """
+        paths = list(dict.fromkeys(str(path) for path in paths))
+        # Files with the same content are extracted only once
+        by_hash: Dict[str, List[str]] = {}
+        for path in paths:
+            by_hash.setdefault(self._hash(path), []).append(path)
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="attachment"
+        ) as executor:
+            futures = {
+                sha256: executor.submit(self.extract, same[0])
+                for sha256, same in by_hash.items()
+            }
+        records = {}
+        for sha256, same in by_hash.items():
+            for path in same:
+                records[path] = futures[sha256].result()
+        logger.info(
+            f"Prefetched {len(paths)} attachments ({len(by_hash)} distinct): "
+            f"{self.stats}."
+        )
+        return records
+
+    def prompt_note(self, path: str) -> str:
+        r"""The text added to a task prompt for an extracted attachment.
+
+        Args:
+            path (str): The path of the attachment.
+
+        Returns:
+            str: The note, empty if nothing is inlined or the file was not
+                extracted.
+        """
+        if self.inline == "none":
+            return ""
+        record = self.get(path)
+        if record is None or not record.success:
+            return ""
+        if self.inline == "handle":
+            return (
+                f" The content of this file has already been extracted to "
+                f"{record.content_path}, read it instead of processing the "
+                f"file again."
+            )
+        content = record.read()
+        if len(content) <= self.summary_chars:
+            return (
+                f" Here is the extracted content of the file:\n"
+                f"<attachment>\n{content}\n</attachment>\n"
+            )
+        return (
+            f" Here are the first {self.summary_chars} of {len(content)} "
+            f"characters of the extracted content of the file, the full "
+            f"content is in {record.content_path}:\n"
+            f"<attachment>\n{content[: self.summary_chars]}\n</attachment>\n"
+        )
@@ -0,0 +1,283 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import asyncio
+import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from camel.logger import get_logger
+from camel.societies import RolePlaying
+
+from .enhanced_role_playing import arun_society
+
+if TYPE_CHECKING:
+    from .scheduling import LPTScheduler
+
+logger = get_logger(__name__)
+
+
+class _ThreadBoundTool:
+    r"""Proxy around a synchronous :obj:`FunctionTool` that runs it on the
+    society's own worker thread when the agent calls it asynchronously.
+
+    camel runs synchronous tools inline inside ``ChatAgent.astep``, which
+    would block every other society sharing the event loop. All tools of one
+    society share a single thread, so thread-bound resources such as the
+    Playwright browser of :obj:`BrowserToolkit` keep working.
+    """
+
+    def __init__(self, tool, executor: ThreadPoolExecutor):
+        self._tool = tool
+        self._executor = executor
+
+    @property
+    def wrapped(self):
+        r"""The proxied tool."""
+        return self._tool
+
+    def __getattr__(self, name):
+        return getattr(self._tool, name)
+
+    def __call__(self, *args, **kwargs):
+        return self._tool(*args, **kwargs)
+
+    async def async_call(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: self._tool(*args, **kwargs)
+        )
+
+
+def _bind_tools_to_thread(society: RolePlaying, executor: ThreadPoolExecutor):
+    tools: Optional[Dict] = getattr(society.assistant_agent, "_internal_tools", None)
+    if tools is None:
+        return
+    for name, tool in list(tools.items()):
+        if not tool.is_async:
+            tools[name] = _ThreadBoundTool(tool, executor)
+
+
+def _new_worker(worker_idx: int) -> Tuple[int, ThreadPoolExecutor]:
+    return worker_idx, ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix=f"society-worker-{worker_idx}"
+    )
+
+
+def load_tasks(path: str) -> List[Dict[str, Any]]:
+    r"""Load tasks from a JSONL file.
+
+    Every line is a JSON object with a ``question`` (or ``task``) field and
+    an optional ``task_id`` (or ``id``). Lines without an id get their line
+    number as id.
+
+    Args:
+        path (str): The path of the JSONL file.
+
+    Returns:
+        List[Dict[str, Any]]: The tasks, with ``task_id`` and ``question``
+            always set.
+    """
+    tasks = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            data["task_id"] = str(data.get("task_id", data.get("id", line_no)))
+            data["question"] = data.get("question", data.get("task"))
+            if not data["question"]:
+                raise ValueError(f"Task on line {line_no + 1} has no question.")
+            tasks.append(data)
+    return tasks
+
+
+async def arun_societies(
+    tasks: Iterable[Dict[str, Any]],
+    society_factory: Callable[[str], RolePlaying],
+    max_concurrency: int = 4,
+    task_timeout: Optional[float] = None,
+    round_limit: int = 15,
+    output_path: Optional[str] = None,
+    save_history: bool = True,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    scheduler: Optional["LPTScheduler"] = None,
+) -> List[Dict[str, Any]]:
+    r"""Run many independent societies concurrently.
+
+    At most :obj:`max_concurrency` societies run at the same time. Each
+    running task has a worker thread of its own, which builds the society
+    and runs its synchronous tools, while the model calls go through
+    :meth:`OwlRolePlaying.astep` on the shared event loop. Worker threads are
+    reused by later tasks, so a :obj:`WarmSocietyFactory` keeps its models
+    and toolkits warm across tasks. A task that fails or exceeds
+    :obj:`task_timeout` is recorded with its status and never holds up the
+    others.
+
+    Args:
+        tasks (Iterable[Dict[str, Any]]): Tasks with ``task_id`` and
+            ``question`` fields, e.g. as returned by :func:`load_tasks`.
+        society_factory (Callable[[str], RolePlaying]): Builds the society
+            for a question, e.g. ``construct_society`` of the examples.
+        max_concurrency (int, optional): The maximum number of societies
+            running at once. (default: :obj:`4`)
+        task_timeout (float, optional): Seconds after which a task is
+            cancelled. (default: :obj:`None`)
+        round_limit (int, optional): The round limit of every society.
+            (default: :obj:`15`)
+        output_path (str, optional): A JSONL file to which each result is
+            appended as soon as its task finishes. (default: :obj:`None`)
+        save_history (bool, optional): Whether to keep the chat history in
+            the results. (default: :obj:`True`)
+        on_result (Callable[[Dict[str, Any]], None], optional): Called on the
+            event loop with each result as soon as its task finishes.
+            (default: :obj:`None`)
+        scheduler (LPTScheduler, optional): Chooses the task an idle worker
+            starts next and learns from the finished ones. Without a
+            scheduler, tasks start in their given order.
+            (default: :obj:`None`)
+
+    Returns:
+        List[Dict[str, Any]]: The results, in completion order.
+    """
+    if max_concurrency < 1:
+        raise ValueError(
+            f"Invalid value for `max_concurrency`: {max_concurrency}, "
+            "expected a positive integer."
+        )
+
+    results: List[Dict[str, Any]] = []
+    pending = list(tasks)
+    output_file = open(output_path, "a", encoding="utf-8") if output_path else None
+    # One single-thread executor per concurrent society, reused across tasks
+    workers = [
+        _new_worker(worker_idx)
+        for worker_idx in range(min(max_concurrency, len(pending)))
+    ]
+
+    async def _run_one(
+        task: Dict[str, Any], executor: ThreadPoolExecutor
+    ) -> Tuple[Dict[str, Any], bool]:
+        loop = asyncio.get_running_loop()
+
+        async def _society_run():
+            society = await loop.run_in_executor(
+                executor, society_factory, task["question"]
+            )
+            _bind_tools_to_thread(society, executor)
+            return await arun_society(society, round_limit=round_limit)
+
+        start = time.perf_counter()
+        result: Dict[str, Any] = {
+            "task_id": task["task_id"],
+            "question": task["question"],
+            "status": "ok",
+            "answer": None,
+            "token_info": None,
+            "history": None,
+            "error": None,
+        }
+        reusable = True
+        try:
+            answer, chat_history, token_info = await asyncio.wait_for(
+                _society_run(), timeout=task_timeout
+            )
+            result["answer"] = answer
+            result["token_info"] = token_info
+            if save_history:
+                result["history"] = chat_history
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Task {task['task_id']} timed out after {task_timeout} seconds."
+            )
+            result["status"] = "timeout"
+            reusable = False
+        except Exception as e:
+            logger.error(f"Error in processing task {task['task_id']}: {e}")
+            logger.debug(traceback.format_exc())
+            result["status"] = "error"
+            result["error"] = str(e)
+            reusable = False
+        result["elapsed"] = time.perf_counter() - start
+        return result, reusable
+
+    async def _guarded(task: Dict[str, Any], slot: int) -> None:
+        worker_idx, executor = workers[slot]
+        reusable = False
+        try:
+            result, reusable = await _run_one(task, executor)
+        finally:
+            if not reusable:
+                # A tool that is still running cannot be interrupted, and the
+                # resources of the thread may be broken; let the thread
+                # finish in the background and start a fresh one.
+                executor.shutdown(wait=False)
+                workers[slot] = _new_worker(worker_idx)
+        results.append(result)
+        if scheduler is not None:
+            try:
+                scheduler.observe(task, result)
+            except Exception as e:
+                logger.error(
+                    f"Error in scheduling after the result of {result['task_id']}: {e}"
+                )
+        logger.info(
+            f"Task {result['task_id']} finished with status {result['status']} "
+            f"in {result['elapsed']:.1f}s ({len(results)} done)."
+        )
+        if output_file is not None:
+            try:
+                # Tool results in the history may be any object
+                output_file.write(
+                    json.dumps(result, ensure_ascii=False, default=str) + "\n"
+                )
+                output_file.flush()
+            except Exception as e:
+                logger.error(f"Error in saving the result of {result['task_id']}: {e}")
+        if on_result is not None:
+            try:
+                on_result(result)
+            except Exception as e:
+                logger.error(
+                    f"Error in handling the result of {result['task_id']}: {e}"
+                )
+
+    async def _worker(slot: int) -> None:
+        # An idle worker takes the next task, so the choice of the scheduler
+        # uses everything learned from the tasks finished so far
+        while pending:
+            idx = scheduler.select(pending) if scheduler is not None else 0
+            await _guarded(pending.pop(idx), slot)
+
+    try:
+        await asyncio.gather(*(_worker(slot) for slot in range(len(workers))))
+    finally:
+        if output_file is not None:
+            output_file.close()
+        for _, executor in workers:
+            executor.shutdown(wait=False)
+
+    return results
+
+
+def run_societies(
+    tasks: Iterable[Dict[str, Any]],
+    society_factory: Callable[[str], RolePlaying],
+    **kwargs,
+) -> List[Dict[str, Any]]:
+    r"""Synchronous entry point of :func:`arun_societies`."""
+    return asyncio.run(arun_societies(tasks, society_factory, **kwargs))
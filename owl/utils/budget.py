@@ -0,0 +1,152 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+def token_cost(
+    token_info: Optional[Dict[str, Any]],
+    prompt_price: float,
+    completion_price: float,
+    cached_prompt_price: Optional[float] = None,
+) -> float:
+    r"""The cost in USD of token counts.
+
+    Args:
+        token_info (Dict[str, Any], optional): The token counts, as returned
+            by :func:`run_society`.
+        prompt_price (float): USD per million prompt tokens.
+        completion_price (float): USD per million completion tokens.
+        cached_prompt_price (float, optional): USD per million prompt tokens
+            served from the provider's prompt cache. (default: the price of
+            other prompt tokens)
+
+    Returns:
+        float: The cost, :obj:`0.0` without token counts.
+    """
+    if not token_info:
+        return 0.0
+    prompt_tokens = token_info.get("prompt_token_count", 0)
+    cached_tokens = token_info.get("cached_prompt_token_count", 0)
+    if cached_prompt_price is None:
+        cached_prompt_price = prompt_price
+    return (
+        (prompt_tokens - cached_tokens) * prompt_price
+        + cached_tokens * cached_prompt_price
+        + token_info.get("completion_token_count", 0) * completion_price
+    ) / 1e6
+
+
+@dataclass
+class BudgetLimits:
+    r"""Limits on the resources of a society run. A limit left at
+    :obj:`None` is not enforced.
+
+    Args:
+        prompt_tokens (int, optional): The maximum number of prompt tokens.
+            (default: :obj:`None`)
+        completion_tokens (int, optional): The maximum number of completion
+            tokens. (default: :obj:`None`)
+        cost (float, optional): The maximum estimated cost in USD, see
+            :obj:`SocietyBudget` for the prices. (default: :obj:`None`)
+        wall_time (float, optional): The maximum elapsed time in seconds.
+            (default: :obj:`None`)
+    """
+
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cost: Optional[float] = None
+    wall_time: Optional[float] = None
+
+    def exceeded(self, token_info: dict, cost: float, elapsed: float) -> Optional[str]:
+        r"""Return the name of the first exceeded limit, if any."""
+        usage = {
+            "prompt_tokens": token_info["prompt_token_count"],
+            "completion_tokens": token_info["completion_token_count"],
+            "cost": cost,
+            "wall_time": elapsed,
+        }
+        for name, used in usage.items():
+            limit = getattr(self, name)
+            if limit is not None and used >= limit:
+                return name
+        return None
+
+
+@dataclass
+class SocietyBudget:
+    r"""Soft and hard budgets of a society run, checked after every round.
+
+    When the soft budget is exceeded, the user agent is skipped and the
+    assistant agent is asked for its final answer right away, exactly as if
+    the user agent had replied with `TASK_DONE`. When the hard budget is
+    exceeded, the run stops at once with the answer of the last round.
+
+    Args:
+        soft (BudgetLimits, optional): The limits that trigger a final
+            answer turn. (default: :obj:`None`)
+        hard (BudgetLimits, optional): The limits that stop the run.
+            (default: :obj:`None`)
+        prompt_token_price (float, optional): USD per million prompt tokens,
+            used to estimate the cost. (default: :obj:`0.0`)
+        completion_token_price (float, optional): USD per million completion
+            tokens. (default: :obj:`0.0`)
+        cached_prompt_token_price (float, optional): USD per million prompt
+            tokens served from the provider's prompt cache. If not given,
+            they cost as much as other prompt tokens. (default: :obj:`None`)
+
+    Example:
+        >>> budget = SocietyBudget(
+        ...     soft=BudgetLimits(cost=0.5, wall_time=600),
+        ...     hard=BudgetLimits(cost=1.0, wall_time=900),
+        ...     prompt_token_price=2.5,
+        ...     completion_token_price=10.0,
+        ... )
+        >>> answer, chat_history, token_info = run_society(society, budget=budget)
+    """
+
+    soft: Optional[BudgetLimits] = None
+    hard: Optional[BudgetLimits] = None
+    prompt_token_price: float = 0.0
+    completion_token_price: float = 0.0
+    cached_prompt_token_price: Optional[float] = None
+
+    def cost(self, token_info: dict) -> float:
+        r"""Estimate the cost in USD of the given token counts."""
+        return token_cost(
+            token_info,
+            self.prompt_token_price,
+            self.completion_token_price,
+            self.cached_prompt_token_price,
+        )
+
+    def check(
+        self, token_info: dict, elapsed: float
+    ) -> Tuple[Optional[str], Optional[str]]:
+        r"""Check the usage of a run against the budgets.
+
+        Args:
+            token_info (dict): The accumulated token counts of the run.
+            elapsed (float): The wall time of the run in seconds.
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: The first exceeded soft and
+                hard limit, or :obj:`None` if the budget is not exceeded.
+        """
+        cost = self.cost(token_info)
+        return (
+            self.soft.exceeded(token_info, cost, elapsed) if self.soft else None,
+            self.hard.exceeded(token_info, cost, elapsed) if self.hard else None,
+        )
@@ -0,0 +1,390 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import importlib
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from camel.agents import ChatAgent
+from camel.logger import get_logger
+from camel.memories import MemoryRecord
+from camel.messages import BaseMessage
+from camel.societies import RolePlaying
+from camel.types import RoleType
+
+logger = get_logger(__name__)
+
+_STATE_FILE = "state.json"
+_AGENTS = ("user_agent", "assistant_agent")
+_CHAT_HISTORY = "chat_history"
+# Message fields that are not JSON serializable and not used by the agents
+# once the message is in memory.
+_DROPPED_MESSAGE_FIELDS = ("image_list", "video_bytes", "parsed")
+
+
+class SocietyCheckpointer:
+    r"""Saves the state of a running society after every round so that a
+    crashed or interrupted run can be resumed from the last finished round.
+
+    A checkpoint is a directory holding one JSONL file per agent memory, a
+    JSONL file with the chat history and a small ``state.json`` with the
+    round index, token counters, the next input message and the number of
+    valid lines of every JSONL file. After each round only the new memory
+    records and chat history entries are appended; a memory is rewritten as
+    a whole only if it changed otherwise, e.g. after a context compaction.
+    A rewritten memory goes to a new generation file
+    (``<agent>.<generation>.jsonl``) named in the state, and the previous
+    file is deleted only once the state is replaced. ``state.json`` is
+    replaced atomically last, so a checkpoint always describes a complete
+    round even if the process dies while writing.
+
+    The writes happen on a background thread, so the round loop only pays
+    for serializing the new records.
+
+    Args:
+        checkpoint_dir (str): The directory of the checkpoint.
+        background (bool, optional): Whether to write on a background
+            thread. (default: :obj:`True`)
+
+    Example:
+        >>> checkpoint = SocietyCheckpointer("checkpoints/task-1")
+        >>> run_society(society, checkpoint=checkpoint)
+        >>> # after a crash, the same call resumes from the last round, or:
+        >>> resume_society("checkpoints/task-1", assistant_agent_kwargs=...)
+    """
+
+    def __init__(self, checkpoint_dir: str, background: bool = True):
+        self.checkpoint_dir = checkpoint_dir
+        self._executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+            if background
+            else None
+        )
+        self._pending: Optional[Future] = None
+        # uuids of the memory records already written, per agent
+        self._written: Dict[str, List[str]] = {name: [] for name in _AGENTS}
+        # The generation of the file of every agent memory, bumped on rewrite
+        self._generations: Dict[str, int] = {name: 0 for name in _AGENTS}
+        self._chat_history_lines = 0
+
+    def exists(self) -> bool:
+        r"""Whether the directory holds a checkpoint."""
+        return os.path.exists(self._path(_STATE_FILE))
+
+    def load_state(self) -> Dict[str, Any]:
+        r"""Read the ``state.json`` of the checkpoint."""
+        with open(self._path(_STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def restore(self, society: RolePlaying) -> Optional[Dict[str, Any]]:
+        r"""Restore the memories of both agents of the society from the
+        checkpoint.
+
+        Args:
+            society (RolePlaying): A society built for the same task.
+
+        Returns:
+            Optional[Dict[str, Any]]: The saved state, with the chat history
+                under ``"chat_history"`` and the next input message under
+                ``"input_msg"``, or :obj:`None` if there is no checkpoint.
+        """
+        if not self.exists():
+            return None
+        state = self.load_state()
+        if state["task_prompt"] != society.task_prompt:
+            raise ValueError(
+                f"The checkpoint in {self.checkpoint_dir} belongs to another "
+                "task and cannot be resumed by this society."
+            )
+
+        for name in _AGENTS:
+            self._generations[name] = state.get("generations", {}).get(name, 0)
+            lines = self._read_lines(name, state["lines"][name])
+            records = [MemoryRecord.from_dict(_load_record(line)) for line in lines]
+            agent: ChatAgent = getattr(society, name)
+            agent.memory.clear()
+            agent.memory.write_records(records)
+            self._written[name] = [str(record.uuid) for record in records]
+            # Drop a partially written tail left by a crash
+            self._rewrite(name, lines)
+            self._remove_stale_generations(name)
+
+        history_lines = self._read_lines(_CHAT_HISTORY, state["lines"][_CHAT_HISTORY])
+        self._rewrite(_CHAT_HISTORY, history_lines)
+        self._chat_history_lines = len(history_lines)
+
+        if hasattr(society, "_task_reminded"):
+            society._task_reminded = state.get("task_reminded", False)
+
+        state["chat_history"] = [json.loads(line) for line in history_lines]
+        state["input_msg"] = _message_from_dict(state.get("next_input"))
+        logger.info(
+            f"Resuming society from {self.checkpoint_dir} after round "
+            f"{state['round_idx']}."
+        )
+        return state
+
+    def save(
+        self,
+        society: RolePlaying,
+        round_idx: int,
+        chat_history: List[dict],
+        token_info: dict,
+        next_input: Optional[BaseMessage],
+        reason: Optional[str] = None,
+    ) -> None:
+        r"""Checkpoint the society after a finished round.
+
+        Args:
+            society (RolePlaying): The running society.
+            round_idx (int): The round that just finished.
+            chat_history (List[dict]): The chat history so far.
+            token_info (dict): The accumulated token counts.
+            next_input (BaseMessage, optional): The input message of the next
+                round.
+            reason (str, optional): Why the society stopped, if it did.
+                A society that stopped is not run again on resume.
+                (default: :obj:`None`)
+        """
+        # Snapshot everything on the calling thread, the agents keep running
+        memories: Dict[str, Dict[str, Any]] = {}
+        for name in _AGENTS:
+            agent: ChatAgent = getattr(society, name)
+            records = [
+                context_record.memory_record
+                for context_record in agent.memory.retrieve()
+            ]
+            uuids = [str(record.uuid) for record in records]
+            written = self._written[name]
+            append = uuids[: len(written)] == written
+            new_records = records[len(written) :] if append else records
+            previous_path = self._jsonl_path(name)
+            if not append:
+                self._generations[name] += 1
+            memories[name] = {
+                "path": self._jsonl_path(name),
+                "previous_path": None if append else previous_path,
+                "lines": [_dump_record(record) for record in new_records],
+            }
+            self._written[name] = uuids
+
+        history_lines = [
+            json.dumps(entry, ensure_ascii=False, default=_json_default)
+            for entry in chat_history[self._chat_history_lines :]
+        ]
+        self._chat_history_lines = len(chat_history)
+
+        state = {
+            "version": 2,
+            "society_class": (
+                f"{type(society).__module__}.{type(society).__qualname__}"
+            ),
+            "task_prompt": society.task_prompt,
+            "user_role_name": society.user_agent.role_name,
+            "assistant_role_name": society.assistant_agent.role_name,
+            "prompt_cache_layout": getattr(society, "prompt_cache_layout", False),
+            "task_reminded": getattr(society, "_task_reminded", False),
+            "round_idx": round_idx,
+            "reason": reason,
+            "token_info": dict(token_info),
+            "next_input": _message_to_dict(next_input),
+            "lines": {
+                **{name: len(self._written[name]) for name in _AGENTS},
+                _CHAT_HISTORY: self._chat_history_lines,
+            },
+            "generations": dict(self._generations),
+        }
+
+        if self._executor is None:
+            self._write(memories, history_lines, state)
+            return
+        self.flush()
+        self._pending = self._executor.submit(
+            self._write, memories, history_lines, state
+        )
+
+    def flush(self) -> None:
+        r"""Wait for the last checkpoint to be written."""
+        if self._pending is None:
+            return
+        try:
+            self._pending.result()
+        except Exception as e:
+            logger.warning(f"Failed to write checkpoint {self.checkpoint_dir}: {e}")
+        self._pending = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, name)
+
+    def _jsonl_path(self, name: str) -> str:
+        generation = self._generations.get(name, 0)
+        if generation == 0:
+            return self._path(f"{name}.jsonl")
+        return self._path(f"{name}.{generation}.jsonl")
+
+    def _write(
+        self,
+        memories: Dict[str, Dict[str, Any]],
+        history_lines: List[str],
+        state: Dict[str, Any],
+    ) -> None:
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        for memory in memories.values():
+            if memory["previous_path"] is None:
+                _append_lines(memory["path"], memory["lines"])
+            else:
+                # A new file: the current state still counts the lines of
+                # the previous one
+                _atomic_write(
+                    memory["path"], "".join(line + "\n" for line in memory["lines"])
+                )
+        _append_lines(self._jsonl_path(_CHAT_HISTORY), history_lines)
+        _atomic_write(self._path(_STATE_FILE), json.dumps(state, ensure_ascii=False))
+        for memory in memories.values():
+            if memory["previous_path"] is not None:
+                _remove(memory["previous_path"])
+
+    def _rewrite(self, name: str, lines: List[str]) -> None:
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        _atomic_write(self._jsonl_path(name), "".join(line + "\n" for line in lines))
+
+    def _remove_stale_generations(self, name: str) -> None:
+        r"""Delete the files of other generations of a memory, left by a
+        crash before or after the state was replaced."""
+        current = os.path.basename(self._jsonl_path(name))
+        for file_name in os.listdir(self.checkpoint_dir):
+            if (
+                file_name.startswith(f"{name}.")
+                and file_name.endswith(".jsonl")
+                and file_name != current
+            ):
+                _remove(self._path(file_name))
+
+    def _read_lines(self, name: str, count: int) -> List[str]:
+        r"""Read the first `count` lines, the ones covered by the state."""
+        path = self._jsonl_path(name)
+        if count == 0 or not os.path.exists(path):
+            return []
+        lines: List[str] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if len(lines) == count:
+                    break
+                lines.append(line.rstrip("\n"))
+        if len(lines) < count:
+            raise ValueError(
+                f"Checkpoint file {path} is truncated: expected {count} lines, "
+                f"found {len(lines)}."
+            )
+        return lines
+
+
+def load_society(checkpoint_dir: str, **kwargs) -> RolePlaying:
+    r"""Rebuild the society of a checkpoint, e.g. an :obj:`OwlRolePlaying` or
+    :obj:`OwlGAIARolePlaying`, for the same task and role names.
+
+    Models and tools cannot be checkpointed; pass them again as for the
+    original society. The memories are restored when the society is run with
+    the checkpoint, see :func:`resume_society`.
+
+    Args:
+        checkpoint_dir (str): The directory of the checkpoint.
+        **kwargs: Further arguments of the society, such as
+            ``user_agent_kwargs`` and ``assistant_agent_kwargs``.
+
+    Returns:
+        RolePlaying: The new society.
+    """
+    state = SocietyCheckpointer(checkpoint_dir, background=False).load_state()
+    module_name, _, class_name = state["society_class"].rpartition(".")
+    society_cls = getattr(importlib.import_module(module_name), class_name)
+
+    society_kwargs = dict(
+        task_prompt=state["task_prompt"],
+        with_task_specify=False,
+        user_role_name=state["user_role_name"],
+        assistant_role_name=state["assistant_role_name"],
+    )
+    if state.get("prompt_cache_layout"):
+        society_kwargs["prompt_cache_layout"] = True
+    society_kwargs.update(kwargs)
+    return society_cls(**society_kwargs)
+
+
+def _atomic_write(path: str, content: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _append_lines(path: str, lines: List[str]) -> None:
+    if not lines:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, Enum):
+        return obj.value
+    return str(obj)
+
+
+def _dump_record(record: MemoryRecord) -> str:
+    data = record.to_dict()
+    for field_name in _DROPPED_MESSAGE_FIELDS:
+        data["message"].pop(field_name, None)
+    return json.dumps(data, ensure_ascii=False, default=_json_default)
+
+
+def _load_record(line: str) -> Dict[str, Any]:
+    data = json.loads(line)
+    data["message"]["role_type"] = RoleType(data["message"]["role_type"])
+    return data
+
+
+def _message_to_dict(message: Optional[BaseMessage]) -> Optional[Dict[str, Any]]:
+    if message is None:
+        return None
+    return {
+        "role_name": message.role_name,
+        "role_type": message.role_type.value,
+        "meta_dict": message.meta_dict,
+        "content": message.content,
+    }
+
+
+def _message_from_dict(data: Optional[Dict[str, Any]]) -> Optional[BaseMessage]:
+    if data is None:
+        return None
+    return BaseMessage(
+        role_name=data["role_name"],
+        role_type=RoleType(data["role_type"]),
+        meta_dict=data["meta_dict"],
+        content=data["content"],
+    )
@@ -0,0 +1,304 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import re
+from copy import deepcopy
+from typing import Dict, List, Optional, Tuple
+
+from camel.agents import ChatAgent
+from camel.logger import get_logger
+from camel.memories import MemoryRecord
+from camel.messages import BaseMessage, FunctionCallingMessage
+from camel.models import BaseModelBackend
+from camel.types import OpenAIBackendRole
+
+logger = get_logger(__name__)
+
+_SUMMARY_MARKER = "owl_compaction_summary"
+# The guidance `OwlRolePlaying` appends to every message. It is only useful
+# in the latest rounds, so it is stripped from older ones.
+_BOILERPLATE_PATTERN = re.compile(
+    r"\s*Here are auxiliary information about the overall task.*?"
+    r"</auxiliary_information>"
+    r"|\s*If there are available tools and you want to call them.*?"
+    r"which tool you have called\."
+    r"|\s*Provide me with the next instruction and input.*?"
+    r"to end our conversation\.",
+    re.DOTALL,
+)
+
+
+class ContextCompactor:
+    r"""Keeps the memory of a :obj:`ChatAgent` within a token budget.
+
+    Rounds are delimited by the messages the agent receives. The system
+    message, the message that started the first round and the most recent
+    rounds are kept verbatim. The first message states the task, which the
+    system message does not contain with the prompt cache layout of
+    :obj:`OwlRolePlaying`, so it is never stripped or summarized. When the
+    context exceeds the budget, older rounds are shrunk first: large tool
+    outputs are elided, long messages truncated and the repeated task
+    context stripped. If that is not enough, the oldest rounds are replaced
+    by a single summary message.
+
+    Args:
+        token_budget (int, optional): The number of context tokens above
+            which the memory is compacted. (default: :obj:`16000`)
+        keep_recent_rounds (int, optional): The number of most recent rounds
+            that are never modified. (default: :obj:`3`)
+        max_tool_output_chars (int, optional): Tool outputs of older rounds
+            longer than this are elided. (default: :obj:`2000`)
+        max_message_chars (int, optional): Other messages of older rounds
+            longer than this are truncated. (default: :obj:`4000`)
+        max_summary_chars (int, optional): The maximum length of the summary
+            of dropped rounds. (default: :obj:`4000`)
+        summary_model (BaseModelBackend, optional): A model used to summarize
+            the dropped rounds. If not given, an extractive digest of the
+            rounds is used instead. (default: :obj:`None`)
+        keep_first_round (bool, optional): Whether to keep the first round,
+            with its first message verbatim, instead of summarizing it.
+            (default: :obj:`True`)
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 16000,
+        keep_recent_rounds: int = 3,
+        max_tool_output_chars: int = 2000,
+        max_message_chars: int = 4000,
+        max_summary_chars: int = 4000,
+        summary_model: Optional[BaseModelBackend] = None,
+        keep_first_round: bool = True,
+    ):
+        if keep_recent_rounds < 1:
+            raise ValueError("`keep_recent_rounds` must be at least 1.")
+        self.token_budget = token_budget
+        self.keep_recent_rounds = keep_recent_rounds
+        self.max_tool_output_chars = max_tool_output_chars
+        self.max_message_chars = max_message_chars
+        self.max_summary_chars = max_summary_chars
+        self.summary_model = summary_model
+        self.keep_first_round = keep_first_round
+        self.stats = {"compactions": 0, "tokens_before": 0, "tokens_after": 0}
+
+    def compact(self, agent: ChatAgent) -> bool:
+        r"""Compact the memory of the agent in place if it exceeds the budget.
+
+        Args:
+            agent (ChatAgent): The agent whose memory should be compacted.
+
+        Returns:
+            bool: Whether the memory was rewritten.
+        """
+        records = [
+            context_record.memory_record for context_record in agent.memory.retrieve()
+        ]
+        if not records:
+            return False
+
+        token_counter = agent.model_backend.token_counter
+        token_cache: Dict[str, int] = {}
+
+        def count(records: List[MemoryRecord]) -> int:
+            total = 0
+            for record in records:
+                key = f"{record.uuid}:{id(record)}"
+                if key not in token_cache:
+                    token_cache[key] = token_counter.count_tokens_from_messages(
+                        [record.to_openai_message()]
+                    )
+                total += token_cache[key]
+            return total
+
+        tokens_before = count(records)
+        if tokens_before <= self.token_budget:
+            return False
+
+        head, summary, rounds = self._split_rounds(records)
+        if self.keep_first_round and len(rounds) > self.keep_recent_rounds:
+            # Pinned before the summary; its tool outputs may still be elided
+            first = rounds.pop(0)
+            head = head + first[:1] + [self._shrink(record) for record in first[1:]]
+        older = rounds[: -self.keep_recent_rounds]
+        recent = rounds[-self.keep_recent_rounds :]
+        if not older:
+            return False
+
+        older = [[self._shrink(record) for record in rnd] for rnd in older]
+
+        # Drop the oldest rounds until the rest fits, leaving room for the
+        # summary that replaces them.
+        summary_allowance = self.max_summary_chars // 4
+        kept_tokens = count(head) + sum(count(rnd) for rnd in older + recent)
+        dropped: List[List[MemoryRecord]] = []
+        while older and kept_tokens + summary_allowance > self.token_budget:
+            rnd = older.pop(0)
+            kept_tokens -= count(rnd)
+            dropped.append(rnd)
+
+        if dropped:
+            summary = self._summarize(summary, dropped)
+
+        compacted = head + ([summary] if summary is not None else [])
+        for rnd in older + recent:
+            compacted.extend(rnd)
+
+        agent.memory.clear()
+        agent.memory.write_records(compacted)
+
+        tokens_after = count(compacted)
+        self.stats["compactions"] += 1
+        self.stats["tokens_before"] += tokens_before
+        self.stats["tokens_after"] += tokens_after
+        logger.info(
+            f"Compacted memory of agent {agent.role_name}: "
+            f"{tokens_before} -> {tokens_after} tokens, "
+            f"{len(dropped)} round(s) summarized."
+        )
+        return True
+
+    def _split_rounds(
+        self, records: List[MemoryRecord]
+    ) -> Tuple[List[MemoryRecord], Optional[MemoryRecord], List[List[MemoryRecord]]]:
+        r"""Split the records into the leading system records, the summary of
+        a previous compaction (if any) and the rounds, each starting with a
+        message the agent received."""
+        head: List[MemoryRecord] = []
+        summary: Optional[MemoryRecord] = None
+        rounds: List[List[MemoryRecord]] = []
+        for record in records:
+            if record.extra_info.get(_SUMMARY_MARKER):
+                summary = record
+            elif not rounds and record.role_at_backend in (
+                OpenAIBackendRole.SYSTEM,
+                OpenAIBackendRole.DEVELOPER,
+            ):
+                head.append(record)
+            elif record.role_at_backend == OpenAIBackendRole.USER or not rounds:
+                rounds.append([record])
+            else:
+                rounds[-1].append(record)
+        return head, summary, rounds
+
+    def _shrink(self, record: MemoryRecord) -> MemoryRecord:
+        r"""Return a copy of the record with large contents elided."""
+        message = record.message
+        if isinstance(message, FunctionCallingMessage) and message.result is not None:
+            result = str(message.result)
+            if len(result) <= self.max_tool_output_chars:
+                return record
+            message = deepcopy(message)
+            message.result = _elide(result, self.max_tool_output_chars, "tool output")
+        else:
+            content = message.content or ""
+            shrunk = _BOILERPLATE_PATTERN.sub("", content)
+            if len(shrunk) > self.max_message_chars:
+                shrunk = _elide(shrunk, self.max_message_chars, "message")
+            if shrunk == content:
+                return record
+            message = deepcopy(message)
+            message.content = shrunk
+        return record.model_copy(update={"message": message})
+
+    def _summarize(
+        self,
+        previous: Optional[MemoryRecord],
+        dropped: List[List[MemoryRecord]],
+    ) -> MemoryRecord:
+        r"""Build the summary record replacing the dropped rounds, merged with
+        the summary of previous compactions."""
+        previous_text = previous.message.content if previous is not None else ""
+        digest = "\n".join(_digest_round(rnd) for rnd in dropped)
+
+        text = None
+        if self.summary_model is not None and dropped:
+            try:
+                summarizer = ChatAgent(
+                    "You condense conversation logs. Keep every fact, number, "
+                    "URL, file path and intermediate result that may be needed "
+                    "to finish the task. Drop pleasantries and repetitions.",
+                    model=self.summary_model,
+                )
+                response = summarizer.step(
+                    f"{previous_text}\n{_dump_rounds(dropped)}"[
+                        -4 * self.token_budget :
+                    ]
+                )
+                text = response.msgs[0].content
+            except Exception as e:
+                logger.warning(f"Failed to summarize rounds, using digest: {e}")
+        if text is None:
+            text = f"{previous_text}\n{digest}".strip()
+        if len(text) > self.max_summary_chars:
+            text = _elide(text, self.max_summary_chars, "summary")
+
+        if not text.startswith("Summary of the earlier conversation"):
+            text = f"Summary of the earlier conversation:\n{text}"
+
+        return MemoryRecord(
+            message=BaseMessage.make_user_message(role_name="User", content=text),
+            role_at_backend=OpenAIBackendRole.USER,
+            extra_info={_SUMMARY_MARKER: "true"},
+            timestamp=dropped[-1][-1].timestamp,
+        )
+
+
+def _elide(text: str, limit: int, what: str) -> str:
+    r"""Keep the head and the tail of the text within `limit` characters."""
+    head = limit * 3 // 4
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return (
+        f"{text[:head]}\n[... {omitted} characters of {what} elided ...]\n"
+        f"{text[len(text) - tail :]}"
+    )
+
+
+def _digest_round(records: List[MemoryRecord]) -> str:
+    r"""A short extractive digest of one round: what was received, which
+    tools were called and the last reply."""
+    received = _BOILERPLATE_PATTERN.sub("", records[0].message.content or "")
+    lines = [f"- Received: {_clip(received)}"]
+    for record in records[1:]:
+        message = record.message
+        if isinstance(message, FunctionCallingMessage):
+            if message.args is not None:
+                lines.append(
+                    f"  Called {message.func_name}({_clip(str(message.args), 150)})"
+                )
+            elif message.result is not None:
+                lines.append(f"  -> {_clip(str(message.result), 200)}")
+    if len(records) > 1 and not isinstance(records[-1].message, FunctionCallingMessage):
+        lines.append(f"  Replied: {_clip(records[-1].message.content or '')}")
+    return "\n".join(lines)
+
+
+def _dump_rounds(rounds: List[List[MemoryRecord]]) -> str:
+    parts = []
+    for rnd in rounds:
+        for record in rnd:
+            message = record.message
+            if isinstance(message, FunctionCallingMessage):
+                if message.args is not None:
+                    parts.append(f"[tool call] {message.func_name}({message.args})")
+                else:
+                    parts.append(f"[tool result] {message.result}")
+            else:
+                parts.append(f"[{record.role_at_backend.value}] {message.content}")
+    return "\n".join(parts)
+
+
+def _clip(text: str, limit: int = 300) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 3] + "..."
@@ -0,0 +1,497 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import codecs
+import csv
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from camel.logger import get_logger
+
+logger = get_logger(__name__)
+
+TEXT_SUFFIXES = (
+    ".txt",
+    ".md",
+    ".rst",
+    ".log",
+    ".tex",
+    ".yaml",
+    ".yml",
+    ".ini",
+    ".cfg",
+    ".toml",
+)
+# Files that are never plain text, even when their first bytes decode
+BINARY_SUFFIXES = (
+    ".doc",
+    ".ppt",
+    ".xls",
+    ".xlsx",
+    ".epub",
+    ".html",
+    ".htm",
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".mp3",
+    ".wav",
+    ".mp4",
+    ".zip",
+)
+SNIFF_BYTES = 8192
+# The size of a "page" of a text file, or of a document without pages
+SECTION_CHARS = 4000
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+
+@dataclass
+class ExtractionResult:
+    r"""The text of a document and how it was extracted.
+
+    Args:
+        sections (List[str]): The text of every page, slide or sheet, in
+            document order.
+        tier (str): The extractor that produced the text, e.g. ``"pdf"``,
+            ``"docx"``, ``"unstructured"`` or ``"chunkr"``.
+    """
+
+    sections: List[str] = field(default_factory=list)
+    tier: str = ""
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.sections)
+
+
+def is_usable_text(
+    text: str, sections: int = 1, min_chars_per_section: int = 20
+) -> bool:
+    r"""Whether extracted text is good enough to skip the slower extractors.
+
+    Text is rejected when it is nearly empty for its number of pages, which
+    is how a scanned PDF without a text layer looks, or when it is mostly
+    undecodable or non-printable characters, as from a broken font encoding.
+
+    Args:
+        text (str): The extracted text.
+        sections (int, optional): The number of pages or sections it came
+            from. (default: :obj:`1`)
+        min_chars_per_section (int, optional): The minimum number of
+            non-space characters per section. (default: :obj:`20`)
+
+    Returns:
+        bool: Whether the text is usable.
+    """
+    stripped = re.sub(r"\s+", "", text)
+    if not stripped or len(stripped) < min_chars_per_section * max(1, sections):
+        return False
+    sample = stripped[:20000]
+    bad = sum(1 for char in sample if char == "\ufffd" or not char.isprintable())
+    return bad / len(sample) < 0.05
+
+
+def extract_pdf(path: str) -> Optional[ExtractionResult]:
+    r"""Read the text layer of a PDF, one section per page, with PyMuPDF or
+    else pypdf."""
+    try:
+        import fitz
+
+        with fitz.open(path) as document:
+            pages = [page.get_text() for page in document]
+        return ExtractionResult(pages, "pdf")
+    except ImportError:
+        pass
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.debug("Neither PyMuPDF nor pypdf is installed.")
+        return None
+    reader = PdfReader(path)
+    return ExtractionResult([page.extract_text() or "" for page in reader.pages], "pdf")
+
+
+def _docx_paragraph(paragraph: ElementTree.Element) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == f"{_W}t" and node.text:
+            parts.append(node.text)
+        elif node.tag == f"{_W}tab":
+            parts.append("\t")
+        elif node.tag in (f"{_W}br", f"{_W}cr") and node.get(f"{_W}type") != "page":
+            parts.append("\n")
+    return "".join(parts)
+
+
+def extract_docx(path: str) -> Optional[ExtractionResult]:
+    r"""Read the paragraphs and tables of a DOCX file from its XML, one
+    section per page where the document has explicit page breaks."""
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    body = root.find(f"{_W}body")
+    if body is None:
+        return ExtractionResult([], "docx")
+    pages: List[List[str]] = [[]]
+    for block in body:
+        if block.tag == f"{_W}p":
+            pages[-1].append(_docx_paragraph(block))
+            if any(br.get(f"{_W}type") == "page" for br in block.iter(f"{_W}br")):
+                pages.append([])
+        elif block.tag == f"{_W}tbl":
+            for row in block.iter(f"{_W}tr"):
+                cells = [
+                    " ".join(_docx_paragraph(p) for p in cell.iter(f"{_W}p")).strip()
+                    for cell in row.iter(f"{_W}tc")
+                ]
+                pages[-1].append(" | ".join(cells))
+    return ExtractionResult(
+        ["\n".join(lines).strip() for lines in pages if any(lines)], "docx"
+    )
+
+
+def extract_pptx(path: str) -> Optional[ExtractionResult]:
+    r"""Read the text of every slide of a PPTX file from its XML, one
+    section per slide."""
+    slides = []
+    with zipfile.ZipFile(path) as archive:
+        names = [
+            name
+            for name in archive.namelist()
+            if re.fullmatch(r"ppt/slides/slide\d+\.xml", name)
+        ]
+        names.sort(key=lambda name: int(re.findall(r"\d+", name)[-1]))
+        for number, name in enumerate(names, 1):
+            root = ElementTree.fromstring(archive.read(name))
+            paragraphs = [
+                "".join(node.text or "" for node in paragraph.iter(f"{_A}t"))
+                for paragraph in root.iter(f"{_A}p")
+            ]
+            text = "\n".join(p for p in paragraphs if p.strip())
+            slides.append(f"Slide {number}:\n{text}")
+    return ExtractionResult(slides, "pptx")
+
+
+def _sniff_encoding(head: bytes) -> Optional[str]:
+    r"""The encoding of text bytes, or :obj:`None` for binary data."""
+    if b"\0" in head:
+        return None
+    try:
+        head.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sample
+        if e.start >= len(head) - 3:
+            return "utf-8"
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return None
+    match = from_bytes(head).best()
+    return match.encoding if match is not None else None
+
+
+def extract_delimited(path: str) -> Optional[ExtractionResult]:
+    r"""Stream the rows of a CSV or TSV file as ``|`` separated lines."""
+    with open(path, "rb") as f:
+        encoding = _sniff_encoding(f.read(SNIFF_BYTES))
+    if encoding is None:
+        return None
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        if path.lower().endswith(".tsv"):
+            dialect = csv.excel_tab
+        else:
+            try:
+                dialect = csv.Sniffer().sniff(f.read(SNIFF_BYTES), ",;\t|")
+            except csv.Error:
+                dialect = csv.excel
+            f.seek(0)
+        lines = [" | ".join(row) for row in csv.reader(f, dialect)]
+    return ExtractionResult(["\n".join(lines)], "csv")
+
+
+def extract_plain_text(path: str) -> Optional[ExtractionResult]:
+    r"""Read a file that sniffs as text, :obj:`None` for binary files."""
+    with open(path, "rb") as f:
+        encoding = _sniff_encoding(f.read(SNIFF_BYTES))
+    if encoding is None:
+        return None
+    with open(path, "r", encoding=encoding, errors="replace") as f:
+        return ExtractionResult([f.read()], "text")
+
+
+FAST_EXTRACTORS: Dict[str, Callable[[str], Optional[ExtractionResult]]] = {
+    ".pdf": extract_pdf,
+    ".docx": extract_docx,
+    ".pptx": extract_pptx,
+    ".csv": extract_delimited,
+    ".tsv": extract_delimited,
+    **{suffix: extract_plain_text for suffix in TEXT_SUFFIXES},
+}
+
+
+def extract_fast(path: str) -> Optional[ExtractionResult]:
+    r"""Extract a local document with the fast extractors.
+
+    The extractor is chosen by the file extension. A file with an unknown
+    extension is read as text if its first bytes look like text.
+
+    Args:
+        path (str): The path of the document.
+
+    Returns:
+        Optional[ExtractionResult]: The result, or :obj:`None` if no fast
+            extractor applies or its text is empty or garbled, in which case
+            the slower extractors should be used.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    extractor = FAST_EXTRACTORS.get(suffix)
+    if extractor is None:
+        if suffix in BINARY_SUFFIXES:
+            return None
+        extractor = extract_plain_text
+    try:
+        result = extractor(path)
+    except Exception as e:
+        logger.debug(f"Fast extraction of {path} failed: {e}")
+        return None
+    if result is None:
+        return None
+    # Text files may legitimately be short
+    min_chars = 1 if result.tier in ("text", "csv") else 20
+    if not is_usable_text(result.text, len(result.sections), min_chars):
+        logger.debug(f"Fast extraction of {path} gave too little usable text.")
+        return None
+    return result
+
+
+@dataclass
+class DocumentSection:
+    r"""A page of a document, a slide, or a part of a text file.
+
+    Args:
+        number (int): The 1-based number of the section.
+        text (str): Its text.
+    """
+
+    number: int
+    text: str
+
+
+def parse_page_ranges(spec: str) -> List[int]:
+    r"""Parse page ranges such as ``"40-45"`` or ``"1,3,7-9"``.
+
+    Args:
+        spec (str): Comma separated page numbers and ranges, 1-based and
+            inclusive.
+
+    Returns:
+        List[int]: The page numbers, in the given order.
+    """
+    numbers: List[int] = []
+    for part in str(spec).replace(" ", "").split(","):
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)(?:-(\d+))?", part)
+        if match is None:
+            raise ValueError(f"Invalid page range: {part!r}.")
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: {part!r}.")
+        numbers.extend(range(start, end + 1))
+    return numbers
+
+
+def _text_sections(path: str) -> Optional[Tuple[int, Callable[[int], str]]]:
+    r"""The number of sections of a text file and a reader of one section.
+
+    A section is about :obj:`SECTION_CHARS` bytes, extended to whole lines,
+    so any section is read with a few seeks instead of reading the file up to
+    it.
+    """
+    with open(path, "rb") as f:
+        encoding = _sniff_encoding(f.read(SNIFF_BYTES))
+    if encoding is None:
+        return None
+    size = os.path.getsize(path)
+    count = max(1, -(-size // SECTION_CHARS))
+
+    def boundary(f, number: int) -> int:
+        # The end of the line holding the last byte of the section
+        if number >= count:
+            return size
+        f.seek(number * SECTION_CHARS - 1)
+        f.readline()
+        return f.tell()
+
+    def read(number: int) -> str:
+        with open(path, "rb") as f:
+            start = boundary(f, number - 1) if number > 1 else 0
+            end = boundary(f, number)
+            f.seek(start)
+            # Empty if a line longer than a section spans this one
+            data = f.read(max(0, end - start))
+        return data.decode(encoding, errors="replace")
+
+    return count, read
+
+
+def _pdf_sections(path: str) -> Optional[Tuple[int, Callable[[int], str]]]:
+    try:
+        import fitz
+
+        with fitz.open(path) as document:
+            count = document.page_count
+
+        def read(number: int) -> str:
+            with fitz.open(path) as document:
+                return document.load_page(number - 1).get_text()
+
+        return count, read
+    except ImportError:
+        pass
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    reader = PdfReader(path)
+    return len(
+        reader.pages
+    ), lambda number: reader.pages[number - 1].extract_text() or ""
+
+
+def _pptx_sections(path: str) -> Optional[Tuple[int, Callable[[int], str]]]:
+    with zipfile.ZipFile(path) as archive:
+        names = sorted(
+            (
+                name
+                for name in archive.namelist()
+                if re.fullmatch(r"ppt/slides/slide\d+\.xml", name)
+            ),
+            key=lambda name: int(re.findall(r"\d+", name)[-1]),
+        )
+
+    def read(number: int) -> str:
+        with zipfile.ZipFile(path) as archive:
+            root = ElementTree.fromstring(archive.read(names[number - 1]))
+        paragraphs = [
+            "".join(node.text or "" for node in paragraph.iter(f"{_A}t"))
+            for paragraph in root.iter(f"{_A}p")
+        ]
+        return "\n".join(p for p in paragraphs if p.strip())
+
+    return len(names), read
+
+
+def _docx_sections(path: str) -> Optional[Tuple[int, Callable[[int], str]]]:
+    sections = extract_docx(path).sections
+    return len(sections), lambda number: sections[number - 1]
+
+
+SECTION_READERS: Dict[
+    str, Callable[[str], Optional[Tuple[int, Callable[[int], str]]]]
+] = {
+    ".pdf": _pdf_sections,
+    ".pptx": _pptx_sections,
+    ".docx": _docx_sections,
+    ".csv": _text_sections,
+    ".tsv": _text_sections,
+    **{suffix: _text_sections for suffix in TEXT_SUFFIXES},
+}
+
+
+def open_sections(path: str) -> Optional[Tuple[int, Callable[[int], str]]]:
+    r"""Open a local document for reading section by section.
+
+    Pages of a PDF and slides of a PPTX file are only parsed when read.
+    Text files are split into parts of about :obj:`SECTION_CHARS` bytes.
+
+    Args:
+        path (str): The path of the document.
+
+    Returns:
+        Optional[Tuple[int, Callable[[int], str]]]: The number of sections
+            and a function reading the text of a section by its 1-based
+            number, or :obj:`None` if the format cannot be read by section.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    reader = SECTION_READERS.get(suffix)
+    if reader is None:
+        if suffix in BINARY_SUFFIXES:
+            return None
+        reader = _text_sections
+    try:
+        return reader(path)
+    except Exception as e:
+        logger.debug(f"Cannot read {path} by section: {e}")
+        return None
+
+
+def iter_byte_range(path: str, start: int, end: Optional[int] = None) -> Iterator[str]:
+    r"""Stream a byte range of a text file in parts of about
+    :obj:`SECTION_CHARS` bytes.
+
+    Args:
+        path (str): The path of the file.
+        start (int): The first byte.
+        end (int, optional): The byte after the last one.
+            (default: the end of the file)
+
+    Yields:
+        str: The decoded parts; a character cut by the ends of the range is
+            replaced, those split between parts are kept whole.
+    """
+    with open(path, "rb") as f:
+        encoding = _sniff_encoding(f.read(SNIFF_BYTES))
+        if encoding is None:
+            raise ValueError(f"{path} is not a text file, byte ranges need one.")
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        f.seek(start)
+        remaining = None if end is None else max(0, end - start)
+        while remaining is None or remaining > 0:
+            size = SECTION_CHARS if remaining is None else min(SECTION_CHARS, remaining)
+            data = f.read(size)
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            text = decoder.decode(data)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+
+def limit_sections(
+    sections: Iterable[DocumentSection], max_chars: Optional[int]
+) -> Iterator[DocumentSection]:
+    r"""Stop a stream of sections after :obj:`max_chars` characters, cutting
+    the last section."""
+    remaining = max_chars
+    for section in sections:
+        if remaining is not None:
+            if remaining <= 0:
+                return
+            if len(section.text) > remaining:
+                section = DocumentSection(section.number, section.text[:remaining])
+            remaining -= len(section.text)
+        yield section
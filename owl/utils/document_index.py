@@ -0,0 +1,294 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from .document_extractors import DocumentSection
+
+if TYPE_CHECKING:
+    from camel.embeddings import BaseEmbedding
+
+# Part of the index cache key: bump it when a change of the chunking or the
+# tokenization changes the index
+INDEX_VERSION = "2"
+PASSAGE_CHARS = 800
+PASSAGE_OVERLAP = 150
+# The constant of reciprocal rank fusion, as in Cormack et al. (2009)
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Han, Hiragana, Katakana and Hangul, written without spaces between words
+_CJK_RE = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    r"""The lower-cased words of a text, without the most common English
+    words. Numbers are kept, as questions often hinge on them. Runs of CJK
+    characters, which have no spaces to split words, give their character
+    bigrams, or the character alone."""
+    tokens = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if not _CJK_RE.search(word):
+            tokens.append(word)
+            continue
+        # Split the word into its CJK runs and the rest, e.g. "gpt模型"
+        position = 0
+        for match in _CJK_RE.finditer(word):
+            if match.start() > position:
+                tokens.append(word[position : match.start()])
+            run = match.group()
+            tokens.extend(
+                [run]
+                if len(run) == 1
+                else [run[i : i + 2] for i in range(len(run) - 1)]
+            )
+            position = match.end()
+        if position < len(word):
+            tokens.append(word[position:])
+    return tokens
+
+
+@dataclass
+class Passage:
+    r"""A passage of a document.
+
+    Args:
+        number (int): The 1-based number of the section (page, slide or
+            part) the passage is taken from.
+        text (str): The text of the passage.
+    """
+
+    number: int
+    text: str
+
+
+def _cut(text: str, start: int, end: int) -> int:
+    r"""A position near :obj:`end`, after a paragraph, line, sentence or word
+    break, not before the middle of ``[start, end)``."""
+    if end >= len(text):
+        return len(text)
+    middle = start + (end - start) // 2
+    for separator in ("\n\n", "\n", ". ", " "):
+        position = text.rfind(separator, middle, end)
+        if position != -1:
+            return position + len(separator)
+    return end
+
+
+def chunk_sections(
+    sections: Iterable[DocumentSection],
+    passage_chars: int = PASSAGE_CHARS,
+    overlap: int = PASSAGE_OVERLAP,
+) -> List[Passage]:
+    r"""Split the sections of a document into overlapping passages.
+
+    Passages do not cross sections, so every passage has one page reference.
+
+    Args:
+        sections (Iterable[DocumentSection]): The sections of the document.
+        passage_chars (int, optional): The maximum length of a passage.
+            (default: :obj:`800`)
+        overlap (int, optional): The number of characters shared by
+            consecutive passages of a section. (default: :obj:`150`)
+
+    Returns:
+        List[Passage]: The passages, in document order.
+    """
+    passages = []
+    for section in sections:
+        text = section.text
+        start = 0
+        while start < len(text):
+            end = _cut(text, start, start + passage_chars)
+            passage = text[start:end].strip()
+            if passage:
+                passages.append(Passage(section.number, passage))
+            if end >= len(text):
+                break
+            # Restart after a line, sentence or word break within the overlap
+            start = max(start + 1, end - overlap)
+            for separator in ("\n", ". ", " "):
+                position = text.find(separator, start, end)
+                if position != -1:
+                    start = position + len(separator)
+                    break
+    return passages
+
+
+class BM25Index:
+    r"""An Okapi BM25 index of passages.
+
+    Args:
+        texts (Iterable[str]): The texts of the passages.
+        k1 (float, optional): The term frequency saturation.
+            (default: :obj:`1.5`)
+        b (float, optional): The length normalization. (default: :obj:`0.75`)
+    """
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.lengths: List[int] = []
+        # Per term, the passages containing it and how often
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for idx, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self.postings.setdefault(term, []).append((idx, count))
+        self.average_length = (
+            sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        )
+
+    def scores(self, query: str) -> Dict[int, float]:
+        r"""The scores of the passages sharing a term with the query.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            Dict[int, float]: The score of every matching passage, by index.
+        """
+        n = len(self.lengths)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for idx, count in postings:
+                norm = 1 - self.b + self.b * self.lengths[idx] / self.average_length
+                scores[idx] = scores.get(idx, 0.0) + idf * count * (self.k1 + 1) / (
+                    count + self.k1 * norm
+                )
+        return scores
+
+
+class DocumentIndex:
+    r"""The passages of a document with a BM25 index and, optionally,
+    their embeddings.
+
+    With embeddings, passages are ranked by the reciprocal rank fusion of
+    their BM25 and cosine similarity ranks, so that both exact terms (names,
+    numbers) and paraphrases are found.
+
+    Args:
+        passages (List[Passage]): The passages of the document.
+        vectors (Any, optional): The normalized embeddings of the passages,
+            a numpy array with one row per passage. (default: :obj:`None`)
+        unit (str, optional): What the sections of the document are, e.g.
+            ``"page"`` or ``"slide"``. (default: :obj:`"page"`)
+    """
+
+    def __init__(
+        self, passages: List[Passage], vectors: Any = None, unit: str = "page"
+    ):
+        self.passages = passages
+        self.unit = unit
+        self.bm25 = BM25Index(passage.text for passage in passages)
+        self.vectors = vectors
+
+    @classmethod
+    def build(
+        cls,
+        sections: Iterable[DocumentSection],
+        embedding: Optional["BaseEmbedding"] = None,
+        passage_chars: int = PASSAGE_CHARS,
+        overlap: int = PASSAGE_OVERLAP,
+        unit: str = "page",
+    ) -> "DocumentIndex":
+        r"""Index the sections of a document.
+
+        Args:
+            sections (Iterable[DocumentSection]): The sections of the
+                document.
+            embedding (BaseEmbedding, optional): The model embedding the
+                passages, e.g. a local ``SentenceTransformerEncoder``.
+                (default: :obj:`None`)
+            passage_chars (int, optional): The maximum length of a passage.
+                (default: :obj:`800`)
+            overlap (int, optional): The number of characters shared by
+                consecutive passages. (default: :obj:`150`)
+            unit (str, optional): What the sections are.
+                (default: :obj:`"page"`)
+
+        Returns:
+            DocumentIndex: The index.
+        """
+        passages = chunk_sections(sections, passage_chars, overlap)
+        index = cls(passages, unit=unit)
+        if embedding is not None:
+            index.add_embeddings(embedding)
+        return index
+
+    def add_embeddings(self, embedding: "BaseEmbedding") -> None:
+        r"""Embed the passages, for semantic search."""
+        self.vectors = _normalize(
+            embedding.embed_list([passage.text for passage in self.passages])
+            if self.passages
+            else []
+        )
+
+    def search(
+        self, query: str, k: int = 5, embedding: Optional["BaseEmbedding"] = None
+    ) -> List[Tuple[float, Passage]]:
+        r"""The passages most relevant to a query.
+
+        Args:
+            query (str): The query.
+            k (int, optional): The number of passages. (default: :obj:`5`)
+            embedding (BaseEmbedding, optional): The model the passages were
+                embedded with, to embed the query. Without it, or without
+                embeddings, passages are ranked by BM25 only.
+                (default: :obj:`None`)
+
+        Returns:
+            List[Tuple[float, Passage]]: The passages with their scores, best
+                first.
+        """
+        bm25 = self.bm25.scores(query)
+        if embedding is None or self.vectors is None or not len(self.passages):
+            ranked = sorted(bm25.items(), key=lambda item: -item[1])
+            return [(score, self.passages[idx]) for idx, score in ranked[:k]]
+
+        similarities = self.vectors @ _normalize([embedding.embed(query)])[0]
+        fused: Dict[int, float] = {}
+        for rank, idx in enumerate(sorted(bm25, key=lambda idx: -bm25[idx])):
+            fused[idx] = 1 / (RRF_K + rank + 1)
+        for rank, idx in enumerate(similarities.argsort()[::-1].tolist()):
+            fused[idx] = fused.get(idx, 0.0) + 1 / (RRF_K + rank + 1)
+        ranked = sorted(fused.items(), key=lambda item: -item[1])
+        return [(score, self.passages[idx]) for idx, score in ranked[:k]]
+
+
+def _normalize(vectors: Any) -> Any:
+    import numpy as np
+
+    array = np.asarray(vectors, dtype=np.float32)
+    if array.size == 0:
+        return array
+    norms = np.linalg.norm(array, axis=1, keepdims=True)
+    return array / np.maximum(norms, 1e-12)
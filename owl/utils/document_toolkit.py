@@ -12,38 +12,181 @@
 # limitations under the License.
 # ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
 
-from camel.loaders import UnstructuredIO
 from camel.toolkits.base import BaseToolkit
 from camel.toolkits.function_tool import FunctionTool
 from camel.toolkits import ImageAnalysisToolkit, ExcelToolkit
 from camel.utils import retry_on_error
 from camel.logger import get_logger
 from camel.models import BaseModelBackend
-from chunkr_ai import Chunkr
+from camel.embeddings import BaseEmbedding
 import requests
 import mimetypes
+import hashlib
 import json
-from typing import List, Optional, Tuple, Literal
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Literal,
+)
 from urllib.parse import urlparse
+import asyncio
+import multiprocessing
 import os
 import subprocess
-import xmltodict
-import nest_asyncio
+import tempfile
+import threading
 import traceback
-
-nest_asyncio.apply()
+import weakref
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .attachment_cache import file_sha256
+from .document_extractors import (
+    SECTION_CHARS,
+    DocumentSection,
+    extract_fast,
+    is_usable_text,
+    iter_byte_range,
+    limit_sections,
+    open_sections,
+    parse_page_ranges,
+)
+from .document_index import INDEX_VERSION, DocumentIndex
+from .tool_cache import _MISSING, ToolResultCache
 
 logger = get_logger(__name__)
 
+# Part of the extraction cache key: bump it when a change of the extraction
+# code changes its output, so that stale entries are not served
+EXTRACTOR_VERSION = "3"
+# Seconds after which cached extractions expire; a changed local file gets
+# a new key anyway, and webpages are only cached with a validator
+LOCAL_EXTRACTION_TTL = 365 * 24 * 3600
+URL_EXTRACTION_TTL = 7 * 24 * 3600
+# Formats whose fast extraction parses the file, worth a separate process
+# when several documents are extracted at once
+CPU_BOUND_SUFFIXES = (".pdf", ".docx", ".pptx")
+
+
+def _run_coroutine(coroutine: Any) -> Any:
+    r"""Run a coroutine from synchronous code, in a new thread if an event
+    loop is already running in this one."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+class _DocumentTool(FunctionTool):
+    r"""A :obj:`FunctionTool` of a synchronous method of the toolkit that
+    does not block the event loop when the agent calls it asynchronously:
+    the async counterpart of the method is awaited if it has one, otherwise
+    the method runs in the I/O thread pool of the toolkit.
+
+    Args:
+        func (Callable): The synchronous method, called by the synchronous
+            agent and describing the tool.
+        toolkit (DocumentProcessingToolkit): The toolkit of the method.
+        async_func (Callable, optional): The async counterpart of the
+            method. (default: :obj:`None`)
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        toolkit: "DocumentProcessingToolkit",
+        async_func: Optional[Callable] = None,
+    ):
+        super().__init__(func)
+        self._toolkit = toolkit
+        self._async_func = async_func
+
+    async def async_call(self, *args: Any, **kwargs: Any) -> Any:
+        if self._async_func is not None:
+            return await self._async_func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._toolkit._get_io_pool(), lambda: self.func(*args, **kwargs)
+        )
+
 
 class DocumentProcessingToolkit(BaseToolkit):
     r"""A class representing a toolkit for processing document and return the content of the document.
 
     This class provides method for processing docx, pdf, pptx, etc. It cannot process excel files.
+
+    Extractions are cached under :obj:`cache_dir`, keyed by the SHA-256 of a
+    local file, or the URL and its ETag or Last-Modified header, together
+    with :obj:`EXTRACTOR_VERSION`. Entries are compressed on disk and the
+    least recently used ones are evicted beyond :obj:`max_cache_bytes`, so
+    asking again about a document is a cache read instead of a new parse.
+
+    Local documents are first read with fast extractors (the text layer of
+    PDFs, the XML of DOCX and PPTX files, CSV and plain text). Only when
+    these give empty or garbled text, as for a scanned PDF, is the document
+    parsed with ``UnstructuredIO``, and then with Chunkr (which runs OCR) if
+    ``CHUNKR_API_KEY`` is set. The extractor that handled each document is
+    kept in :obj:`extraction_tiers`, and cached with the content, so it is
+    still known when the document is served from the cache;
+    :obj:`tier_counts` counts extractions and :obj:`cache_hits` cache reads.
+
+    Long documents can be read a few pages at a time with
+    :meth:`read_document_pages`, or streamed with :meth:`iter_document`.
+    Several documents are extracted at once with :meth:`extract_documents`,
+    or from a running event loop with :meth:`aextract_document_content`:
+    downloads and model calls run in a thread pool and the parsing of PDF,
+    DOCX and PPTX files in a process pool, at most :obj:`max_concurrency`
+    documents at a time. The tools of :meth:`get_tools` use these when an
+    agent calls them asynchronously, e.g. under :func:`arun_society`.
+    :meth:`query_document` returns only the passages relevant to a question,
+    from a BM25 index of the document (fused with an embedding index if
+    :obj:`embedding` is given) kept in the extraction cache, so follow-up
+    questions about a document do not parse it again.
+
+    Args:
+        cache_dir (str, optional): The directory for downloads, unzipped
+            files and the extraction cache. (default: :obj:`"tmp/"`)
+        model (BaseModelBackend, optional): The model used to caption
+            images. (default: :obj:`None`)
+        cache_extractions (bool, optional): Whether to cache extractions.
+            (default: :obj:`True`)
+        max_cache_bytes (int, optional): The size limit of the extraction
+            cache on disk. (default: :obj:`1024 * 1024 * 1024`)
+        max_content_chars (int, optional): The maximum length of the text
+            returned by :meth:`extract_document_content`; longer documents
+            are cut, with a hint to read them by page. (default: :obj:`None`)
+        embedding (BaseEmbedding, optional): The model embedding passages
+            for :meth:`query_document`, e.g. a local
+            ``SentenceTransformerEncoder``. (default: :obj:`None`, BM25 only)
+        max_concurrency (int, optional): The number of documents extracted
+            at once by the batch and async methods. (default: :obj:`8`)
+        parse_processes (int, optional): The number of processes parsing
+            documents for the batch and async methods, 0 to parse them in
+            threads. The processes are started with ``forkserver`` (or
+            ``spawn``), so a script using them needs an
+            ``if __name__ == "__main__":`` guard.
+            (default: :obj:`min(max_concurrency, os.cpu_count())`)
     """
 
     def __init__(
-        self, cache_dir: Optional[str] = None, model: Optional[BaseModelBackend] = None
+        self,
+        cache_dir: Optional[str] = None,
+        model: Optional[BaseModelBackend] = None,
+        cache_extractions: bool = True,
+        max_cache_bytes: int = 1024 * 1024 * 1024,
+        max_content_chars: Optional[int] = None,
+        embedding: Optional[BaseEmbedding] = None,
+        max_concurrency: int = 8,
+        parse_processes: Optional[int] = None,
     ):
         self.image_tool = ImageAnalysisToolkit(model=model)
         # self.audio_tool = AudioAnalysisToolkit()
@@ -53,7 +196,46 @@ class DocumentProcessingToolkit(BaseToolkit):
         if cache_dir:
             self.cache_dir = cache_dir
 
-        self.uio = UnstructuredIO()
+        self._uio = None
+        self.max_content_chars = max_content_chars
+        self.embedding = embedding
+        self.max_concurrency = max_concurrency
+        self.parse_processes = (
+            min(max_concurrency, os.cpu_count() or 1)
+            if parse_processes is None
+            else parse_processes
+        )
+        self._lock = threading.Lock()
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        # One semaphore per event loop, as they cannot be shared across loops
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        # The SHA-256 of local files by path, size and modification time
+        self._file_hashes: Dict[Tuple[str, int, int], str] = {}
+        # The extractor that handled each document, how often each did, and
+        # how often an extraction was read from the cache instead
+        self.extraction_tiers: Dict[str, str] = {}
+        self.tier_counts: Counter = Counter()
+        self.cache_hits = 0
+
+        self.extraction_cache: Optional[ToolResultCache] = None
+        if cache_extractions:
+            self.extraction_cache = ToolResultCache(
+                cache_dir=os.path.join(self.cache_dir, "extractions"),
+                default_ttl=LOCAL_EXTRACTION_TTL,
+                tool_ttls={"url": URL_EXTRACTION_TTL},
+                max_disk_bytes=max_cache_bytes,
+                max_memory_entries=32,
+            )
+
+    @property
+    def uio(self):
+        r"""The `UnstructuredIO` loader, imported on first use."""
+        if self._uio is None:
+            from camel.loaders import UnstructuredIO
+
+            self._uio = UnstructuredIO()
+        return self._uio
 
     @retry_on_error()
     def extract_document_content(self, document_path: str) -> Tuple[bool, str]:
@@ -71,10 +253,270 @@ class DocumentProcessingToolkit(BaseToolkit):
             f"Calling extract_document_content function with document_path=`{document_path}`"
         )
 
+        success, content = self._cached_extract(document_path)
+        return success, self._limit_content(content) if success else content
+
+    def _cached_extract(self, document_path: str) -> Tuple[bool, Any]:
+        r"""Extract the whole content of a document, through the cache."""
+        key, cached = self._cache_lookup(document_path)
+        if cached is not _MISSING:
+            return True, cached
+
+        success, content = self._extract_document_content(document_path)
+        self._cache_store(document_path, key, success, content)
+        return success, content
+
+    def _cache_lookup(self, document_path: str) -> Tuple[Optional[str], Any]:
+        r"""The extraction cache key of a document and its cached content, or
+        :obj:`_MISSING`."""
+        key = self._extraction_key(document_path)
+        if key is None:
+            return None, _MISSING
+        cached = self.extraction_cache.get(key)
+        if cached is _MISSING:
+            return key, _MISSING
+        logger.debug(f"Using the cached extraction of {document_path}.")
+        tier, content = cached
+        self._record_tier(document_path, tier, cached=True)
+        return key, content
+
+    def _cache_store(
+        self, document_path: str, key: Optional[str], success: bool, content: Any
+    ) -> None:
+        if success and key is not None:
+            # The tier recorded by the extraction that just finished
+            with self._lock:
+                tier = self.extraction_tiers.get(document_path, "unknown")
+            self.extraction_cache.put(
+                key, "url" if self._is_url(document_path) else "file", (tier, content)
+            )
+
+    async def aextract_document_content(self, document_path: str) -> Tuple[bool, str]:
+        r"""Extract the content of a given document (or url) without blocking the event loop. See `extract_document_content`.
+
+        Args:
+            document_path (str): The path of the document to be processed, either a local path or a URL.
+
+        Returns:
+            Tuple[bool, str]: A tuple containing a boolean indicating whether the document was processed successfully, and the content of the document (if success).
+        """
+        loop = asyncio.get_running_loop()
+        io_pool = self._get_io_pool()
+        async with self._get_semaphore():
+            key, cached = await loop.run_in_executor(
+                io_pool, self._cache_lookup, document_path
+            )
+            if cached is not _MISSING:
+                success, content = True, cached
+            else:
+                try:
+                    success, content = await self._aextract_document_content(
+                        document_path
+                    )
+                except Exception as e:
+                    logger.error(traceback.format_exc())
+                    return False, f"Error occurred while processing document: {e}"
+                await loop.run_in_executor(
+                    io_pool, self._cache_store, document_path, key, success, content
+                )
+        return success, self._limit_content(content) if success else content
+
+    async def aextract_documents(
+        self, document_paths: List[str]
+    ) -> List[Tuple[bool, str]]:
+        r"""Extract the content of several documents concurrently, see
+        :meth:`aextract_document_content`.
+
+        Args:
+            document_paths (List[str]): The local paths or URLs of the
+                documents.
+
+        Returns:
+            List[Tuple[bool, str]]: The result of every document, in the
+                order of :obj:`document_paths`.
+        """
+        # A document listed twice is extracted once
+        unique = list(dict.fromkeys(document_paths))
+        results = await asyncio.gather(
+            *(self.aextract_document_content(path) for path in unique)
+        )
+        by_path = dict(zip(unique, results))
+        return [by_path[path] for path in document_paths]
+
+    def extract_documents(self, document_paths: List[str]) -> List[Tuple[bool, str]]:
+        r"""Extract the content of several documents (or urls) at once, faster than one by one.
+
+        Args:
+            document_paths (List[str]): The paths of the documents to be processed, either local paths or URLs.
+
+        Returns:
+            List[Tuple[bool, str]]: For every document, in order, whether it was processed successfully and its content (if success).
+        """
+        logger.debug(
+            f"Calling extract_documents function with document_paths=`{document_paths}`"
+        )
+        return _run_coroutine(self.aextract_documents(document_paths))
+
+    async def _aextract_document_content(self, document_path: str) -> Tuple[bool, Any]:
+        r"""The async counterpart of :meth:`_extract_document_content`, with
+        the parsing of PDF, DOCX and PPTX files in the process pool."""
+        loop = asyncio.get_running_loop()
+        if not (
+            document_path.lower().endswith(CPU_BOUND_SUFFIXES)
+            and os.path.isfile(document_path)
+        ):
+            return await loop.run_in_executor(
+                self._get_io_pool(), self._extract_document_content, document_path
+            )
+
+        result = await self._parse(document_path)
+        if result is not None:
+            self._record_tier(document_path, result.tier)
+            return True, result.text
+        success, content = await loop.run_in_executor(
+            self._get_io_pool(), self._extract_with_unstructured, document_path
+        )
+        if self._needs_ocr(success, content):
+            return await self._aextract_with_ocr(document_path, success, content)
+        if success:
+            self._record_tier(document_path, "unstructured")
+        return success, content
+
+    async def _parse(self, document_path: str):
+        r"""Run :func:`extract_fast` in the process pool, or in the thread
+        pool if processes are disabled or cannot be started."""
+        loop = asyncio.get_running_loop()
+        parse_pool = self._get_parse_pool()
+        if parse_pool is not None:
+            try:
+                return await loop.run_in_executor(
+                    parse_pool, extract_fast, document_path
+                )
+            except (BrokenProcessPool, OSError) as e:
+                logger.warning(
+                    f"Parsing documents in threads instead of processes: {e}"
+                )
+                with self._lock:
+                    self.parse_processes = 0
+                    self._parse_pool = None
+                parse_pool.shutdown(wait=False)
+        return await loop.run_in_executor(
+            self._get_io_pool(), extract_fast, document_path
+        )
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _get_io_pool(self) -> Executor:
+        with self._lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="document"
+                )
+            return self._io_pool
+
+    def _get_parse_pool(self) -> Optional[Executor]:
+        with self._lock:
+            if self._parse_pool is None and self.parse_processes > 0:
+                # Forking a process with running threads (the I/O pool, the
+                # event loop of the caller) can deadlock the child
+                method = (
+                    "forkserver"
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else "spawn"
+                )
+                self._parse_pool = ProcessPoolExecutor(
+                    max_workers=self.parse_processes,
+                    mp_context=multiprocessing.get_context(method),
+                )
+            return self._parse_pool
+
+    def close(self) -> None:
+        r"""Shut down the thread and process pools of the batch and async
+        methods, once their running extractions finish."""
+        with self._lock:
+            pools = [self._io_pool, self._parse_pool]
+            self._io_pool = self._parse_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown()
+
+    def _limit_content(self, content: Any) -> Any:
+        if (
+            self.max_content_chars is None
+            or not isinstance(content, str)
+            or len(content) <= self.max_content_chars
+        ):
+            return content
+        return (
+            content[: self.max_content_chars]
+            + f"\n\n[The document is cut after {self.max_content_chars} of "
+            f"{len(content)} characters. Use `read_document_pages` to read the "
+            f"rest.]"
+        )
+
+    def _extraction_key(self, document_path: str) -> Optional[str]:
+        r"""The extraction cache key of a document, or :obj:`None` if its
+        extraction is not cached: zip archives, whose result lists unpacked
+        files, and URLs without an ETag or Last-Modified header."""
+        if self.extraction_cache is None or document_path.endswith(".zip"):
+            return None
+        if os.path.isfile(document_path):
+            stat = os.stat(document_path)
+            file_key = (
+                os.path.abspath(document_path),
+                stat.st_size,
+                stat.st_mtime_ns,
+            )
+            if file_key not in self._file_hashes:
+                self._file_hashes[file_key] = file_sha256(document_path)
+            identity = f"sha256:{self._file_hashes[file_key]}"
+        elif self._is_url(document_path):
+            try:
+                response = requests.head(
+                    document_path, allow_redirects=True, timeout=10
+                )
+            except requests.exceptions.RequestException:
+                return None
+            validator = response.headers.get("ETag") or response.headers.get(
+                "Last-Modified"
+            )
+            if not validator:
+                return None
+            identity = f"url:{document_path}:{validator}"
+        else:
+            return None
+        return hashlib.sha256(
+            f"{EXTRACTOR_VERSION}:{identity}".encode("utf-8")
+        ).hexdigest()
+
+    def _record_tier(self, document_path: str, tier: str, cached: bool = False) -> None:
+        with self._lock:
+            self.extraction_tiers[document_path] = tier
+            if cached:
+                self.cache_hits += 1
+            else:
+                self.tier_counts[tier] += 1
+        if not cached:
+            logger.debug(f"Extracted {document_path} with the {tier} extractor.")
+
+    def _is_url(self, document_path: str) -> bool:
+        parsed_url = urlparse(document_path)
+        return bool(parsed_url.scheme and parsed_url.netloc)
+
+    def _extract_document_content(self, document_path: str) -> Tuple[bool, Any]:
+        r"""Extract the content of a document, without the cache."""
         if any(document_path.endswith(ext) for ext in [".jpg", ".jpeg", ".png"]):
             res = self.image_tool.ask_question_about_image(
                 document_path, "Please make a detailed caption about the image."
             )
+            self._record_tier(document_path, "image")
             return True, res
 
         # if any(document_path.endswith(ext) for ext in ['.mp3', '.wav']):
@@ -83,22 +525,26 @@ class DocumentProcessingToolkit(BaseToolkit):
 
         if any(document_path.endswith(ext) for ext in ["xls", "xlsx"]):
             res = self.excel_tool.extract_excel_content(document_path)
+            self._record_tier(document_path, "excel")
             return True, res
 
         if any(document_path.endswith(ext) for ext in ["zip"]):
             extracted_files = self._unzip_file(document_path)
+            self._record_tier(document_path, "zip")
             return True, f"The extracted files are: {extracted_files}"
 
         if any(document_path.endswith(ext) for ext in ["json", "jsonl", "jsonld"]):
             with open(document_path, "r", encoding="utf-8") as f:
                 content = json.load(f)
             f.close()
+            self._record_tier(document_path, "json")
             return True, content
 
         if any(document_path.endswith(ext) for ext in ["py"]):
             with open(document_path, "r", encoding="utf-8") as f:
                 content = f.read()
             f.close()
+            self._record_tier(document_path, "text")
             return True, content
 
         if any(document_path.endswith(ext) for ext in ["xml"]):
@@ -107,7 +553,10 @@ class DocumentProcessingToolkit(BaseToolkit):
                 content = f.read()
             f.close()
 
+            self._record_tier(document_path, "xml")
             try:
+                import xmltodict
+
                 data = xmltodict.parse(content)
                 logger.debug(f"The extracted xml data is: {data}")
                 return True, data
@@ -119,6 +568,7 @@ class DocumentProcessingToolkit(BaseToolkit):
         if self._is_webpage(document_path):
             try:
                 extracted_text = self._extract_webpage_content(document_path)
+                self._record_tier(document_path, "firecrawl")
                 return True, extracted_text
             except Exception:
                 try:
@@ -129,24 +579,238 @@ class DocumentProcessingToolkit(BaseToolkit):
                     else:
                         # Convert elements list to string
                         elements_str = "\n".join(str(element) for element in elements)
+                        self._record_tier(document_path, "unstructured")
                         return True, elements_str
                 except Exception:
                     return False, "Failed to extract content from the webpage."
 
         else:
-            try:
-                elements = self.uio.parse_file_or_url(document_path)
-                if elements is None:
-                    logger.error(f"Failed to parse the document: {document_path}.")
-                    return False, f"Failed to parse the document: {document_path}."
-                else:
-                    # Convert elements list to string
-                    elements_str = "\n".join(str(element) for element in elements)
-                    return True, elements_str
-
-            except Exception as e:
-                logger.error(traceback.format_exc())
-                return False, f"Error occurred while processing document: {e}"
+            if os.path.isfile(document_path):
+                result = extract_fast(document_path)
+                if result is not None:
+                    self._record_tier(document_path, result.tier)
+                    return True, result.text
+
+            success, content = self._extract_with_unstructured(document_path)
+            if self._needs_ocr(success, content):
+                return _run_coroutine(
+                    self._aextract_with_ocr(document_path, success, content)
+                )
+            if success:
+                self._record_tier(document_path, "unstructured")
+            return success, content
+
+    def _extract_with_unstructured(self, document_path: str) -> Tuple[bool, str]:
+        try:
+            elements = self.uio.parse_file_or_url(document_path)
+            if elements is None:
+                logger.error(f"Failed to parse the document: {document_path}.")
+                return False, f"Failed to parse the document: {document_path}."
+            # Convert elements list to string
+            return True, "\n".join(str(element) for element in elements)
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            return False, f"Error occurred while processing document: {e}"
+
+    def _needs_ocr(self, success: bool, content: Any) -> bool:
+        r"""Whether a document is scanned or badly encoded and Chunkr, which
+        runs OCR, is available."""
+        return not (success and is_usable_text(content)) and bool(
+            os.getenv("CHUNKR_API_KEY")
+        )
+
+    async def _aextract_with_ocr(
+        self, document_path: str, success: bool, content: Any
+    ) -> Tuple[bool, Any]:
+        r"""Extract a document with Chunkr, or return the previous result
+        :obj:`(success, content)` if it fails. Failures of Chunkr are raised
+        by :meth:`_extract_content_with_chunkr`, so they are never returned
+        as content."""
+        try:
+            content = await self._extract_content_with_chunkr(document_path)
+        except Exception as e:
+            logger.error(f"Error while processing document with Chunkr: {e}")
+            return success, content
+        self._record_tier(document_path, "chunkr")
+        return True, content
+
+    def _open_sections(self, document_path: str) -> Tuple[int, Callable, str]:
+        r"""The number of sections of a document, a reader of one section
+        and the name of a section."""
+        suffix = os.path.splitext(document_path)[1].lower()
+        opened = open_sections(document_path) if os.path.isfile(document_path) else None
+        if opened is not None and suffix == ".pdf":
+            count, read = opened
+            # A scanned PDF has no text layer to read page by page
+            if not any(read(number).strip() for number in range(1, min(count, 3) + 1)):
+                opened = None
+        if opened is not None:
+            unit = {".pdf": "page", ".docx": "page", ".pptx": "slide"}
+            return (*opened, unit.get(suffix, "part"))
+
+        success, content = self._cached_extract(document_path)
+        if not success:
+            raise ValueError(content)
+        text = content if isinstance(content, str) else str(content)
+        parts = [
+            text[start : start + SECTION_CHARS]
+            for start in range(0, max(len(text), 1), SECTION_CHARS)
+        ]
+        return len(parts), lambda number: parts[number - 1], "part"
+
+    def iter_document(
+        self,
+        document_path: str,
+        pages: Optional[Iterable[int]] = None,
+        byte_range: Optional[Tuple[int, Optional[int]]] = None,
+        max_chars: Optional[int] = None,
+    ) -> Iterator[DocumentSection]:
+        r"""Stream a document section by section: the pages of a PDF or DOCX
+        file, the slides of a presentation, or parts of about 4000
+        characters of other documents. Pages are only parsed when reached.
+
+        Args:
+            document_path (str): The local path or URL of the document.
+            pages (Iterable[int], optional): The 1-based numbers of the
+                sections to read. (default: all of them)
+            byte_range (Tuple[int, Optional[int]], optional): Read this byte
+                range of a text file instead, e.g. ``(0, 1_000_000)``.
+                (default: :obj:`None`)
+            max_chars (int, optional): Stop after this many characters.
+                (default: :obj:`None`)
+
+        Yields:
+            DocumentSection: The sections, in the requested order.
+        """
+        if byte_range is not None:
+            sections: Iterable[DocumentSection] = (
+                DocumentSection(number, text)
+                for number, text in enumerate(
+                    iter_byte_range(document_path, *byte_range), 1
+                )
+            )
+        else:
+            count, read, _ = self._open_sections(document_path)
+            numbers = range(1, count + 1) if pages is None else pages
+            sections = (
+                DocumentSection(number, read(number))
+                for number in numbers
+                if 1 <= number <= count
+            )
+        yield from limit_sections(sections, max_chars)
+
+    def read_document_pages(
+        self, document_path: str, pages: str = "1-5", max_chars: int = 20000
+    ) -> str:
+        r"""Read some pages of a document, for documents too long to read at once. Pages are the pages of a PDF or Word file, the slides of a presentation, or parts of about 4000 characters of other documents.
+
+        Args:
+            document_path (str): The local path or URL of the document.
+            pages (str): The pages to read, e.g. "40-45" or "1,3,7-9". (default: "1-5")
+            max_chars (int): The maximum number of characters to return. (default: 20000)
+
+        Returns:
+            str: The text of the pages, each under a header with its number, and the total number of pages of the document.
+        """
+        try:
+            numbers = parse_page_ranges(pages)
+            count, read, unit = self._open_sections(document_path)
+        except Exception as e:
+            return f"Error reading {document_path}: {e}"
+
+        # The full length of every section read, to tell if the last is cut
+        lengths: Dict[int, int] = {}
+
+        def _sections() -> Iterator[DocumentSection]:
+            for number in numbers:
+                if 1 <= number <= count:
+                    text = read(number)
+                    lengths[number] = len(text)
+                    yield DocumentSection(number, text)
+
+        sections = list(limit_sections(_sections(), max_chars))
+        parts = [
+            f"--- {unit.capitalize()} {section.number} ---\n{section.text}"
+            for section in sections
+        ]
+        last = sections[-1].number if sections else 0
+        footer = f"[The document has {count} {unit}s."
+        if sections and len(sections[-1].text) < lengths[last]:
+            footer += (
+                f" {unit.capitalize()} {last} was cut after "
+                f"{len(sections[-1].text)} of its {lengths[last]} characters."
+                f" Continue with pages='{last}-{min(count, last + 4)}' and "
+                f"max_chars={max(max_chars, lengths[last])}."
+            )
+        elif last < count:
+            footer += f" Continue with pages='{last + 1}-{min(count, last + 5)}'."
+        return "\n\n".join(parts + [footer + "]"])
+
+    def _document_index(self, document_path: str) -> DocumentIndex:
+        r"""The passage index of a document, through the extraction cache."""
+        key = self._extraction_key(document_path)
+        if key is not None:
+            embedding = self.embedding
+            embedding_name = (
+                "bm25"
+                if embedding is None
+                else f"{type(embedding).__name__}:"
+                f"{getattr(embedding, 'model_name', '')}:"
+                f"{embedding.get_output_dim()}"
+            )
+            key = hashlib.sha256(
+                f"index:{INDEX_VERSION}:{embedding_name}:{key}".encode("utf-8")
+            ).hexdigest()
+            cached = self.extraction_cache.get(key)
+            if cached is not _MISSING:
+                return cached
+
+        count, read, unit = self._open_sections(document_path)
+        index = DocumentIndex.build(
+            (DocumentSection(number, read(number)) for number in range(1, count + 1)),
+            embedding=self.embedding,
+            unit=unit,
+        )
+        logger.debug(
+            f"Indexed {len(index.passages)} passages of {count} {unit}s of "
+            f"{document_path}."
+        )
+        if key is not None:
+            self.extraction_cache.put(
+                key, "url" if self._is_url(document_path) else "file", index
+            )
+        return index
+
+    def query_document(self, document_path: str, question: str, k: int = 3) -> str:
+        r"""Find the passages of a document most relevant to a question, with the page each comes from. Prefer it to extracting a long document entirely. If the passages do not answer the question, ask again with other words, or read the pages around a passage with `read_document_pages`.
+
+        Args:
+            document_path (str): The local path or URL of the document.
+            question (str): The question, or the words to look for.
+            k (int): The number of passages to return. (default: 3)
+
+        Returns:
+            str: The passages, most relevant first, each under a header with its page number.
+        """
+        try:
+            index = self._document_index(document_path)
+            results = index.search(question, k=k, embedding=self.embedding)
+        except Exception as e:
+            return f"Error querying {document_path}: {e}"
+
+        if not results:
+            return (
+                f"No passage of {document_path} matches the question. Try "
+                f"other words, or read it with `read_document_pages`."
+            )
+        parts = [
+            f"--- Passage {rank}, {index.unit} {passage.number} ---\n{passage.text}"
+            for rank, (_, passage) in enumerate(results, 1)
+        ]
+        return "\n\n".join(
+            parts
+            + [f"[The {len(results)} most relevant of {len(index.passages)} passages.]"]
+        )
 
     def _is_webpage(self, url: str) -> bool:
         r"""Judge whether the given URL is a webpage."""
@@ -183,6 +847,8 @@ class DocumentProcessingToolkit(BaseToolkit):
         document_path: str,
         output_format: Literal["json", "markdown"] = "markdown",
     ) -> str:
+        from chunkr_ai import Chunkr
+
         chunkr = Chunkr(api_key=os.getenv("CHUNKR_API_KEY"))
 
         result = await chunkr.upload(document_path)
@@ -190,30 +856,33 @@ class DocumentProcessingToolkit(BaseToolkit):
         # result = chunkr.upload(document_path)
 
         if result.status == "Failed":
-            logger.error(
-                f"Error while processing document {document_path}: {result.message} using Chunkr."
-            )
-            return f"Error while processing document: {result.message}"
-
-        # extract document name
-        document_name = os.path.basename(document_path)
-        output_file_path: str
-
-        if output_format == "json":
-            output_file_path = f"{document_name}.json"
-            result.json(output_file_path)
-
-        elif output_format == "markdown":
-            output_file_path = f"{document_name}.md"
-            result.markdown(output_file_path)
-
-        else:
-            return "Invalid output format."
+            # Raised rather than returned, so the error is not taken for the
+            # content of the document and cached
+            raise RuntimeError(f"Error while processing document: {result.message}")
+
+        if output_format not in ("json", "markdown"):
+            raise ValueError(f"Invalid output format: {output_format}.")
+
+        # A unique file under the cache directory, as documents with the same
+        # name may be extracted at once
+        output_dir = os.path.join(self.cache_dir, "chunkr")
+        os.makedirs(output_dir, exist_ok=True)
+        fd, output_file_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(document_path)}.",
+            suffix=".json" if output_format == "json" else ".md",
+            dir=output_dir,
+        )
+        os.close(fd)
+        try:
+            if output_format == "json":
+                result.json(output_file_path)
+            else:
+                result.markdown(output_file_path)
 
-        with open(output_file_path, "r") as f:
-            extracted_text = f.read()
-        f.close()
-        return extracted_text
+            with open(output_file_path, "r") as f:
+                return f.read()
+        finally:
+            os.remove(output_file_path)
 
     @retry_on_error()
     def _extract_webpage_content(self, url: str) -> str:
@@ -230,8 +899,9 @@ class DocumentProcessingToolkit(BaseToolkit):
         if len(data["data"]) == 0:
             if data["success"]:
                 return "No content found on the webpage."
-            else:
-                return "Error while crawling the webpage."
+            # Raised, so the webpage is parsed with UnstructuredIO instead
+            # and the error is never cached
+            raise RuntimeError(f"Error while crawling the webpage: {url}")
 
         return str(data["data"][0]["markdown"])
 
@@ -284,6 +954,12 @@ class DocumentProcessingToolkit(BaseToolkit):
         Returns:
             List[FunctionTool]: A list of FunctionTool objects representing the functions in the toolkit.
         """
+        # Agents running on an event loop call the async counterparts
         return [
-            FunctionTool(self.extract_document_content),
-        ]  # Added closing triple quotes here
+            _DocumentTool(
+                self.extract_document_content, self, self.aextract_document_content
+            ),
+            _DocumentTool(self.extract_documents, self, self.aextract_documents),
+            _DocumentTool(self.read_document_pages, self),
+            _DocumentTool(self.query_document, self),
+        ]
@@ -12,8 +12,10 @@
 # limitations under the License.
 # ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
 
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
 import threading
+import time
 
 
 from camel.agents import ChatAgent
@@ -23,8 +25,28 @@ from camel.societies import RolePlaying
 from camel.logger import get_logger
 
 
+from contextlib import contextmanager, nullcontext
 from copy import deepcopy
 
+from .budget import SocietyBudget
+from .checkpoint import SocietyCheckpointer, load_society
+from .context_compaction import ContextCompactor
+from .tool_cache import tool_cache_counts
+from .tracing import SocietyTracer
+from .society_events import (
+    InstructionEvent,
+    SocietyEvent,
+    SocietyEventBus,
+    SolutionEvent,
+    TerminationEvent,
+    TokenUsageEvent,
+    ToolCallFinishedEvent,
+    ToolCallStartedEvent,
+)
+
+if TYPE_CHECKING:
+    from .rate_limiter import RateLimiter
+
 logger = get_logger(__name__)
 
 
@@ -40,6 +62,20 @@ class OwlRolePlaying(RolePlaying):
 
         self.output_language = kwargs.get("output_language", None)
 
+        # Set by `stream_society` / `astream_society` while the society runs
+        self.event_bus: Optional[SocietyEventBus] = None
+
+        self.context_compactor: Optional[ContextCompactor] = kwargs.pop(
+            "context_compactor", None
+        )
+        # Keep the system messages and the per-round augmentation texts free
+        # of the task, so that requests share a long byte-identical prefix
+        # that providers can serve from their prompt cache.
+        self.prompt_cache_layout: bool = kwargs.pop("prompt_cache_layout", False)
+        # Shared by the model calls of all societies using the same provider
+        self.rate_limiter: Optional["RateLimiter"] = kwargs.pop("rate_limiter", None)
+        self._task_reminded = False
+
         super().__init__(**kwargs)
 
         init_user_sys_msg, init_assistant_sys_msg = self._construct_gaia_sys_msgs()
@@ -49,20 +85,12 @@ class OwlRolePlaying(RolePlaying):
         self.assistant_sys_msg: Optional[BaseMessage]
         self.user_sys_msg: Optional[BaseMessage]
 
-        # self.is_reasoning_task = self._judge_if_reasoning_task(self.task_prompt)
-
-        # if self.is_reasoning_task:
-        #     logger.info("The task is judged as a reasoning or coding task. The assistant agent will use the reasoning model O3-MINI.")
-        # else:
-        #     logger.info("The assistant agent will use the default model.")
-
         self._init_agents(
             init_assistant_sys_msg,
             init_user_sys_msg,
             assistant_agent_kwargs=self.assistant_agent_kwargs,
             user_agent_kwargs=self.user_agent_kwargs,
             output_language=self.output_language,
-            # is_reasoning_task=self.is_reasoning_task
         )
 
     def _init_agents(
@@ -72,7 +100,6 @@ class OwlRolePlaying(RolePlaying):
         assistant_agent_kwargs: Optional[Dict] = None,
         user_agent_kwargs: Optional[Dict] = None,
         output_language: Optional[str] = None,
-        is_reasoning_task: bool = False,
         stop_event: Optional[threading.Event] = None,
     ) -> None:
         r"""Initialize assistant and user agents with their system messages.
@@ -99,13 +126,6 @@ class OwlRolePlaying(RolePlaying):
             elif "model" not in user_agent_kwargs:
                 user_agent_kwargs.update(dict(model=self.model))
 
-        # # If the task is a reasoning task, the assistant agent should use the reasoning model O3-MINI
-        # if is_reasoning_task:
-        #     assistant_agent_kwargs['model'] = ModelFactory.create(
-        #         model_platform=ModelPlatformType.OPENAI,
-        #         model_type=ModelType.O3_MINI,
-        #     )
-
         self.assistant_agent = ChatAgent(
             init_assistant_sys_msg,
             output_language=output_language,
@@ -120,25 +140,11 @@ class OwlRolePlaying(RolePlaying):
         )
         self.user_sys_msg = self.user_agent.system_message
 
-    # def _judge_if_reasoning_task(self, question: str) -> bool:
-    #     r"""Judge if the question is a reasoning task."""
-
-    #     LLM = OpenAIModel(model_type=ModelType.O3_MINI)
-    #     prompt = f"""
-    #     Please judge whether the following question is a reasoning or coding task, which can be solved by reasoning without leveraging external resources, or is suitable for writing code to solve the task.
-    #     If it is a reasoning or coding task, please return only "yes".
-    #     If it is not a reasoning or coding task, please return only "no".
-    #     Note:
-    #     - If the question required some world knowledge to answer the question, please carefully judge it, because the model's own knowledge is often unreliable.
-    #     - If it is suitable for writing codes (e.g. process excel files, write simulation codes, etc.), in most cases, it can be considered as a coding task.
-    #     Question: <question>{question}</question>
-    #     """
-    #     messages = [{"role": "user", "content": prompt}]
-    #     resp = LLM.run(messages)
-    #     if 'yes' in resp.choices[0].message.content.lower():
-    #         return True
-    #     else:
-    #         return False
+        if self.rate_limiter is not None:
+            # Imported here, the rate limiter module imports this one
+            from .rate_limiter import rate_limit_society
+
+            rate_limit_society(self, self.rate_limiter)
 
     def _construct_gaia_sys_msgs(self):
         user_system_prompt = f"""
@@ -163,7 +169,7 @@ Here are some tips that will help you to give more valuable instructions about o
 - Flexibly write codes to solve some problems, such as excel relevant tasks.
 </tips>
 
-Now, here is the overall task: <task>{self.task_prompt}</task>. Never forget our task!
+Now, here is the overall task: <task>{self._system_prompt_task()}</task>. Never forget our task!
 
 Now you must start to instruct me to solve the task step-by-step. Do not add anything else other than your instruction!
 Keep giving me instructions until you think the task is completed.
@@ -177,7 +183,7 @@ Never forget you are a assistant and I am a user. Never flip roles! Never instru
 We share a common interest in collaborating to successfully complete a complex task.
 You must help me to complete the task.
 
-Here is our overall task: {self.task_prompt}. Never forget our task!
+Here is our overall task: {self._system_prompt_task()}. Never forget our task!
 
 I must instruct you based on your expertise and my needs to complete the task. An instruction is typically a sub-task or question.
 
@@ -213,25 +219,58 @@ Please note that our overall task may be very complicated. Here are some tips th
 
         return user_sys_msg, assistant_sys_msg
 
-    def step(
-        self, assistant_msg: BaseMessage
-    ) -> Tuple[ChatAgentResponse, ChatAgentResponse]:
-        user_response = self.user_agent.step(assistant_msg)
-        if user_response.terminated or user_response.msgs is None:
-            return (
-                ChatAgentResponse(msgs=[], terminated=False, info={}),
-                ChatAgentResponse(
-                    msgs=[],
-                    terminated=user_response.terminated,
-                    info=user_response.info,
-                ),
+    def _system_prompt_task(self) -> str:
+        r"""The task as it appears in the system messages."""
+        if self.prompt_cache_layout:
+            return "the task stated at the beginning of our conversation"
+        return self.task_prompt
+
+    def init_chat(self, init_msg_content: Optional[str] = None) -> BaseMessage:
+        self._task_reminded = False
+        init_msg = super().init_chat(init_msg_content)
+        if self.prompt_cache_layout:
+            # The system messages do not contain the task in this layout
+            init_msg.content += (
+                f"\nHere is our overall task: <task>{self.task_prompt}</task>"
             )
-        user_msg = self._reduce_message_options(user_response.msgs)
+        return init_msg
+
+    def _remind_task_once(self) -> bool:
+        return self.context_compactor is not None or self.prompt_cache_layout
+
+    def _publish_instruction(self, user_msg: BaseMessage) -> None:
+        r"""Publish the instruction of the user agent as soon as it is known,
+        before the (possibly long) assistant turn starts."""
+        if self.event_bus is not None:
+            self.event_bus.publish(InstructionEvent, instruction=user_msg.content)
+
+    def _task_reminder(self) -> str:
+        r"""The task prompt to interpolate into the augmentation texts. With a
+        context compactor or the prompt cache layout, the task is only
+        repeated in the first round."""
+        if self._remind_task_once() and self._task_reminded:
+            return "the overall task given at the beginning"
+        return self.task_prompt
+
+    def _final_answer_prompt(self) -> str:
+        r"""The text appended to the instruction once the user agent replied
+        with `TASK_DONE`, asking the assistant for the final answer."""
+        return f"""\n
+            Now please make a final answer of the original task based on our conversation : <task>{self.task_prompt}</task>
+            """
 
+    def _augment_user_message(self, user_msg: BaseMessage) -> BaseMessage:
+        r"""Return a copy of the user message extended with the task context
+        (or the final answer request) for the assistant agent."""
         modified_user_msg = deepcopy(user_msg)
 
         if "TASK_DONE" not in user_msg.content:
-            modified_user_msg.content += f"""\n
+            if self._remind_task_once() and self._task_reminded:
+                modified_user_msg.content += """\n
+            If there are available tools and you want to call them, never say 'I will ...', but first call the tool and reply based on tool call's result, and tell me which tool you have called.
+            """
+            else:
+                modified_user_msg.content += f"""\n
             Here are auxiliary information about the overall task, which may help you understand the intent of the current task:
             <auxiliary_information>
             {self.task_prompt}
@@ -241,12 +280,53 @@ Please note that our overall task may be very complicated. Here are some tips th
 
         else:
             # The task is done, and the assistant agent need to give the final answer about the original task
-            modified_user_msg.content += f"""\n
-            Now please make a final answer of the original task based on our conversation : <task>{self.task_prompt}</task>
+            modified_user_msg.content += self._final_answer_prompt()
+
+        return modified_user_msg
+
+    def _augment_assistant_message(
+        self, assistant_msg: BaseMessage, user_msg: BaseMessage
+    ) -> BaseMessage:
+        r"""Return a copy of the assistant message extended with the request
+        for the next instruction for the user agent."""
+        modified_assistant_msg = deepcopy(assistant_msg)
+        if "TASK_DONE" not in user_msg.content:
+            modified_assistant_msg.content += f"""\n
+                Provide me with the next instruction and input (if needed) based on my response and our current task: <task>{self._task_reminder()}</task>
+                Before producing the final answer, please check whether I have rechecked the final answer using different toolkit as much as possible. If not, please remind me to do that.
+                If I have written codes, remind me to run the codes.
+                If you think our task is done, reply with `TASK_DONE` to end our conversation.
             """
+        return modified_assistant_msg
+
+    def _compact_memories(self) -> None:
+        if self.context_compactor is None:
+            return
+        for agent in (self.user_agent, self.assistant_agent):
+            self.context_compactor.compact(agent)
+
+    def step(
+        self, assistant_msg: BaseMessage
+    ) -> Tuple[ChatAgentResponse, ChatAgentResponse]:
+        self._compact_memories()
+        user_response = self.user_agent.step(assistant_msg)
+        if user_response.terminated or user_response.msgs is None:
+            return (
+                ChatAgentResponse(msgs=[], terminated=False, info={}),
+                ChatAgentResponse(
+                    msgs=[],
+                    terminated=user_response.terminated,
+                    info=user_response.info,
+                ),
+            )
+        user_msg = self._reduce_message_options(user_response.msgs)
+        self._publish_instruction(user_msg)
+
+        modified_user_msg = self._augment_user_message(user_msg)
 
         # process assistant's response
         assistant_response = self.assistant_agent.step(modified_user_msg)
+        self._task_reminded = True
         if assistant_response.terminated or assistant_response.msgs is None:
             return (
                 ChatAgentResponse(
@@ -260,14 +340,9 @@ Please note that our overall task may be very complicated. Here are some tips th
             )
         assistant_msg = self._reduce_message_options(assistant_response.msgs)
 
-        modified_assistant_msg = deepcopy(assistant_msg)
-        if "TASK_DONE" not in user_msg.content:
-            modified_assistant_msg.content += f"""\n
-                Provide me with the next instruction and input (if needed) based on my response and our current task: <task>{self.task_prompt}</task>
-                Before producing the final answer, please check whether I have rechecked the final answer using different toolkit as much as possible. If not, please remind me to do that.
-                If I have written codes, remind me to run the codes.
-                If you think our task is done, reply with `TASK_DONE` to end our conversation.
-            """
+        modified_assistant_msg = self._augment_assistant_message(
+            assistant_msg, user_msg
+        )
 
         # return the modified messages
         return (
@@ -286,6 +361,7 @@ Please note that our overall task may be very complicated. Here are some tips th
     async def astep(
         self, assistant_msg: BaseMessage
     ) -> Tuple[ChatAgentResponse, ChatAgentResponse]:
+        self._compact_memories()
         user_response = await self.user_agent.astep(assistant_msg)
         if user_response.terminated or user_response.msgs is None:
             return (
@@ -297,25 +373,12 @@ Please note that our overall task may be very complicated. Here are some tips th
                 ),
             )
         user_msg = self._reduce_message_options(user_response.msgs)
+        self._publish_instruction(user_msg)
 
-        modified_user_msg = deepcopy(user_msg)
-
-        if "TASK_DONE" not in user_msg.content:
-            modified_user_msg.content += f"""\n
-            Here are auxiliary information about the overall task, which may help you understand the intent of the current task:
-            <auxiliary_information>
-            {self.task_prompt}
-            </auxiliary_information>
-            If there are available tools and you want to call them, never say 'I will ...', but first call the tool and reply based on tool call's result, and tell me which tool you have called.
-            """
-
-        else:
-            # The task is done, and the assistant agent need to give the final answer about the original task
-            modified_user_msg.content += f"""\n
-            Now please make a final answer of the original task based on our conversation : <task>{self.task_prompt}</task>
-            """
+        modified_user_msg = self._augment_user_message(user_msg)
 
         assistant_response = await self.assistant_agent.astep(modified_user_msg)
+        self._task_reminded = True
         if assistant_response.terminated or assistant_response.msgs is None:
             return (
                 ChatAgentResponse(
@@ -329,62 +392,83 @@ Please note that our overall task may be very complicated. Here are some tips th
             )
         assistant_msg = self._reduce_message_options(assistant_response.msgs)
 
-        modified_assistant_msg = deepcopy(assistant_msg)
-        if "TASK_DONE" not in user_msg.content:
-            modified_assistant_msg.content += f"""\n
-                Provide me with the next instruction and input (if needed) based on my response and our current task: <task>{self.task_prompt}</task>
-                Before producing the final answer, please check whether I have rechecked the final answer using different toolkit as much as possible. If not, please remind me to do that.
-                If I have written codes, remind me to run the codes.
-                If you think our task is done, reply with `TASK_DONE` to end our conversation.
-            """
+        modified_assistant_msg = self._augment_assistant_message(
+            assistant_msg, user_msg
+        )
 
+        # Same messages as `step`, so that sync and async runs are identical
         return (
             ChatAgentResponse(
-                msgs=[assistant_msg],
+                msgs=[modified_assistant_msg],
                 terminated=assistant_response.terminated,
                 info=assistant_response.info,
             ),
             ChatAgentResponse(
-                msgs=[user_msg],
+                msgs=[modified_user_msg],
                 terminated=user_response.terminated,
                 info=user_response.info,
             ),
         )
 
+    def _final_answer_request(self) -> BaseMessage:
+        r"""The instruction of a forced final answer turn."""
+        user_msg = BaseMessage.make_user_message(
+            role_name=self.user_role_name, content="<TASK_DONE>"
+        )
+        self._publish_instruction(user_msg)
+        return user_msg
 
-class OwlGAIARolePlaying(OwlRolePlaying):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
+    def _final_answer_responses(
+        self, user_msg: BaseMessage, assistant_response: ChatAgentResponse
+    ) -> Tuple[ChatAgentResponse, ChatAgentResponse]:
+        assistant_msgs = (
+            [self._reduce_message_options(assistant_response.msgs)]
+            if assistant_response.msgs
+            else []
+        )
+        return (
+            ChatAgentResponse(
+                msgs=assistant_msgs,
+                terminated=assistant_response.terminated,
+                info=assistant_response.info,
+            ),
+            ChatAgentResponse(msgs=[user_msg], terminated=False, info={}),
+        )
 
-    def step(
-        self, assistant_msg: BaseMessage
+    def final_answer_step(self) -> Tuple[ChatAgentResponse, ChatAgentResponse]:
+        r"""Skip the user agent and ask the assistant agent for the final
+        answer right away, as if the user agent had replied with
+        `TASK_DONE`. Used when the soft budget of a run is exceeded.
+
+        Returns:
+            Tuple[ChatAgentResponse, ChatAgentResponse]: The responses of the
+                assistant and of the (skipped) user agent.
+        """
+        self._compact_memories()
+        user_msg = self._final_answer_request()
+        assistant_response = self.assistant_agent.step(
+            self._augment_user_message(user_msg)
+        )
+        return self._final_answer_responses(user_msg, assistant_response)
+
+    async def afinal_answer_step(
+        self,
     ) -> Tuple[ChatAgentResponse, ChatAgentResponse]:
-        user_response = self.user_agent.step(assistant_msg)
-        if user_response.terminated or user_response.msgs is None:
-            return (
-                ChatAgentResponse(msgs=[], terminated=False, info={}),
-                ChatAgentResponse(
-                    msgs=[],
-                    terminated=user_response.terminated,
-                    info=user_response.info,
-                ),
-            )
-        user_msg = self._reduce_message_options(user_response.msgs)
+        r"""Asynchronous version of :meth:`final_answer_step`."""
+        self._compact_memories()
+        user_msg = self._final_answer_request()
+        assistant_response = await self.assistant_agent.astep(
+            self._augment_user_message(user_msg)
+        )
+        return self._final_answer_responses(user_msg, assistant_response)
 
-        modified_user_msg = deepcopy(user_msg)
 
-        if "TASK_DONE" not in user_msg.content:
-            modified_user_msg.content += f"""\n
-            Here are auxiliary information about the overall task, which may help you understand the intent of the current task:
-            <auxiliary_information>
-            {self.task_prompt}
-            </auxiliary_information>
-            If there are available tools and you want to call them, never say 'I will ...', but first call the tool and reply based on tool call's result, and tell me which tool you have called.
-            """
+class OwlGAIARolePlaying(OwlRolePlaying):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
 
-        else:
-            # The task is done, and the assistant agent need to give the final answer about the original task
-            modified_user_msg.content += f"""\n
+    def _final_answer_prompt(self) -> str:
+        return f"""\n
             Now please make a final answer of the original task based on our conversation : <task>{self.task_prompt}</task>
             Please pay special attention to the format in which the answer is presented.
             You should first analyze the answer format required by the question and then output the final answer that meets the format requirements. 
@@ -400,67 +484,188 @@ class OwlGAIARolePlaying(OwlRolePlaying):
             </hint>
             """
 
-        # process assistant's response
-        assistant_response = self.assistant_agent.step(modified_user_msg)
-        if assistant_response.terminated or assistant_response.msgs is None:
-            return (
-                ChatAgentResponse(
-                    msgs=[],
-                    terminated=assistant_response.terminated,
-                    info=assistant_response.info,
-                ),
-                ChatAgentResponse(
-                    msgs=[user_msg], terminated=False, info=user_response.info
-                ),
-            )
-        assistant_msg = self._reduce_message_options(assistant_response.msgs)
 
-        modified_assistant_msg = deepcopy(assistant_msg)
-        if "TASK_DONE" not in user_msg.content:
-            modified_assistant_msg.content += f"""\n
-                Provide me with the next instruction and input (if needed) based on my response and our current task: <task>{self.task_prompt}</task>
-                Before producing the final answer, please check whether I have rechecked the final answer using different toolkit as much as possible. If not, please remind me to do that.
-                If I have written codes, remind me to run the codes.
-                If you think our task is done, reply with `TASK_DONE` to end our conversation.
-            """
+SOCIETY_INIT_PROMPT = """
+    Now please give me instructions to solve over overall task step by step. If the task requires some specific knowledge, please instruct me to use tools to complete the task.
+        """
 
-        # return the modified messages
-        return (
-            ChatAgentResponse(
-                msgs=[modified_assistant_msg],
-                terminated=assistant_response.terminated,
-                info=assistant_response.info,
-            ),
-            ChatAgentResponse(
-                msgs=[modified_user_msg],
-                terminated=user_response.terminated,
-                info=user_response.info,
-            ),
+TASK_DONE_MARKERS = ("TASK_DONE", "任务已完成")
+
+
+class _ObservedTool:
+    r"""Proxy around a :obj:`FunctionTool` that publishes tool call events on
+    the society event bus. Everything else is delegated to the wrapped tool.
+    """
+
+    def __init__(self, tool, event_bus: SocietyEventBus):
+        self._tool = tool
+        self._event_bus = event_bus
+
+    @property
+    def wrapped(self):
+        r"""The proxied tool."""
+        return self._tool
+
+    def __getattr__(self, name):
+        return getattr(self._tool, name)
+
+    def _publish_finished(self, args, start, result=None, error=None):
+        self._event_bus.publish(
+            ToolCallFinishedEvent,
+            tool_name=self._tool.get_function_name(),
+            args=args,
+            result=result,
+            error=error,
+            duration=time.perf_counter() - start,
         )
 
+    def __call__(self, *args, **kwargs):
+        self._event_bus.publish(
+            ToolCallStartedEvent,
+            tool_name=self._tool.get_function_name(),
+            args=kwargs,
+        )
+        start = time.perf_counter()
+        try:
+            result = self._tool(*args, **kwargs)
+        except Exception as e:
+            self._publish_finished(kwargs, start, error=str(e))
+            raise
+        self._publish_finished(kwargs, start, result=result)
+        return result
+
+    async def async_call(self, *args, **kwargs):
+        self._event_bus.publish(
+            ToolCallStartedEvent,
+            tool_name=self._tool.get_function_name(),
+            args=kwargs,
+        )
+        start = time.perf_counter()
+        try:
+            result = await self._tool.async_call(*args, **kwargs)
+        except Exception as e:
+            self._publish_finished(kwargs, start, error=str(e))
+            raise
+        self._publish_finished(kwargs, start, result=result)
+        return result
+
+
+@contextmanager
+def _observe_society(society: RolePlaying, event_bus: SocietyEventBus):
+    r"""Attach the event bus to the society and to the tools of its assistant
+    agent for the duration of a run, restoring both afterwards."""
+    tools: Optional[Dict] = getattr(society.assistant_agent, "_internal_tools", None)
+    original_tools = dict(tools) if tools is not None else None
+    previous_bus = getattr(society, "event_bus", None)
+    society.event_bus = event_bus
+    if tools is not None:
+        for name, tool in original_tools.items():
+            tools[name] = _ObservedTool(tool, event_bus)
+    try:
+        yield
+    finally:
+        society.event_bus = previous_bus
+        if tools is not None:
+            tools.clear()
+            tools.update(original_tools)
+
+
+def _cached_prompt_tokens(usage: dict) -> int:
+    r"""Extract the number of prompt tokens served from the provider's prompt
+    cache from a usage dict, whichever provider convention it follows."""
+    details = usage.get("prompt_tokens_details") or {}
+    for cached in (
+        details.get("cached_tokens"),  # OpenAI, Azure, Qwen, Gemini
+        usage.get("prompt_cache_hit_tokens"),  # DeepSeek
+        usage.get("cache_read_input_tokens"),  # Anthropic
+    ):
+        if cached:
+            return cached
+    return 0
+
+
+def _instrument(society: RolePlaying, tracer: Optional[SocietyTracer]):
+    if tracer is None:
+        return nullcontext()
+    return tracer.instrument(society)
+
+
+class _RoundTracker:
+    r"""Turns the responses of one society step into events and keeps the
+    state shared by :func:`stream_society` and :func:`astream_society`."""
+
+    def __init__(self, event_bus: SocietyEventBus, society: RolePlaying):
+        self.event_bus = event_bus
+        self.chat_history: List[dict] = []
+        self.prompt_token_count = 0
+        self.completion_token_count = 0
+        self.cached_prompt_token_count = 0
+        # Tool cache counts of the run: the tools' counts minus the counts
+        # they had when the run started
+        tools = getattr(society.assistant_agent, "_internal_tools", None) or {}
+        self._tools = list(tools.values())
+        self._tool_cache_offset = tool_cache_counts(self._tools)
+        if self._tool_cache_offset is not None:
+            for key in self._tool_cache_offset:
+                self._tool_cache_offset[key] *= -1
+
+    @property
+    def token_info(self) -> dict:
+        token_info = {
+            "completion_token_count": self.completion_token_count,
+            "prompt_token_count": self.prompt_token_count,
+            "cached_prompt_token_count": self.cached_prompt_token_count,
+        }
+        counts = tool_cache_counts(self._tools)
+        if counts is not None:
+            token_info["tool_cache_hits"] = (
+                counts["hits"] + self._tool_cache_offset["hits"]
+            )
+            token_info["tool_cache_misses"] = (
+                counts["misses"] + self._tool_cache_offset["misses"]
+            )
+        return token_info
 
-def run_society(
-    society: OwlRolePlaying,
-    round_limit: int = 15,
-) -> Tuple[str, List[dict], dict]:
-    overall_completion_token_count = 0
-    overall_prompt_token_count = 0
+    def finish_round(
+        self,
+        round_idx: int,
+        assistant_response: ChatAgentResponse,
+        user_response: ChatAgentResponse,
+        final_reason: Optional[str] = None,
+    ) -> Tuple[List[SocietyEvent], bool]:
+        r"""Record a finished round.
 
-    chat_history = []
-    init_prompt = """
-    Now please give me instructions to solve over overall task step by step. If the task requires some specific knowledge, please instruct me to use tools to complete the task.
+        Args:
+            round_idx (int): The round that finished.
+            assistant_response (ChatAgentResponse): The response of the
+                assistant agent.
+            user_response (ChatAgentResponse): The response of the user agent.
+            final_reason (str, optional): The termination reason if this was
+                the last round anyway, e.g. a forced final answer turn.
+                (default: :obj:`None`)
+
+        Returns:
+            Tuple[List[SocietyEvent], bool]: The events of the round that were
+                not published live, and whether the society should stop.
         """
-    input_msg = society.init_chat(init_prompt)
-    for _round in range(round_limit):
-        assistant_response, user_response = society.step(input_msg)
-        # Check if usage info is available before accessing it
-        if assistant_response.info.get("usage") and user_response.info.get("usage"):
-            overall_completion_token_count += assistant_response.info["usage"].get(
-                "completion_tokens", 0
-            ) + user_response.info["usage"].get("completion_tokens", 0)
-            overall_prompt_token_count += assistant_response.info["usage"].get(
-                "prompt_tokens", 0
-            ) + user_response.info["usage"].get("prompt_tokens", 0)
+        events: List[SocietyEvent] = []
+        user_content = (
+            user_response.msg.content
+            if hasattr(user_response, "msg") and user_response.msg
+            else ""
+        )
+        assistant_content = (
+            assistant_response.msg.content
+            if hasattr(assistant_response, "msg") and assistant_response.msg
+            else ""
+        )
+
+        # Societies that do not publish the instruction themselves (e.g. the
+        # plain camel `RolePlaying`) get it reported after the step.
+        if user_content and not self.event_bus.has_published(InstructionEvent):
+            events.append(
+                InstructionEvent(round_idx=round_idx, instruction=user_content)
+            )
 
         # convert tool call to dict
         tool_call_records: List[dict] = []
@@ -468,104 +673,421 @@ def run_society(
             for tool_call in assistant_response.info["tool_calls"]:
                 tool_call_records.append(tool_call.as_dict())
 
-        _data = {
-            "user": user_response.msg.content
-            if hasattr(user_response, "msg") and user_response.msg
-            else "",
-            "assistant": assistant_response.msg.content
-            if hasattr(assistant_response, "msg") and assistant_response.msg
-            else "",
-            "tool_calls": tool_call_records,
-        }
-
-        chat_history.append(_data)
-        logger.info(
-            f"Round #{_round} user_response:\n {user_response.msgs[0].content if user_response.msgs and len(user_response.msgs) > 0 else ''}"
+        self.chat_history.append(
+            {
+                "user": user_content,
+                "assistant": assistant_content,
+                "tool_calls": tool_call_records,
+            }
         )
-        logger.info(
-            f"Round #{_round} assistant_response:\n {assistant_response.msgs[0].content if assistant_response.msgs and len(assistant_response.msgs) > 0 else ''}"
+        logger.info(f"Round #{round_idx} user_response:\n {user_content}")
+        logger.info(f"Round #{round_idx} assistant_response:\n {assistant_content}")
+        events.append(
+            SolutionEvent(
+                round_idx=round_idx,
+                instruction=user_content,
+                solution=assistant_content,
+                tool_calls=tool_call_records,
+            )
         )
 
-        if (
-            assistant_response.terminated
-            or user_response.terminated
-            or "TASK_DONE" in user_response.msg.content
-        ):
-            break
+        prompt_tokens = 0
+        completion_tokens = 0
+        cached_prompt_tokens = 0
+        for response in (assistant_response, user_response):
+            usage = response.info.get("usage") or {}
+            prompt_tokens += usage.get("prompt_tokens", 0)
+            completion_tokens += usage.get("completion_tokens", 0)
+            cached_prompt_tokens += _cached_prompt_tokens(usage)
+        self.prompt_token_count += prompt_tokens
+        self.completion_token_count += completion_tokens
+        self.cached_prompt_token_count += cached_prompt_tokens
+        events.append(
+            TokenUsageEvent(
+                round_idx=round_idx,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cached_prompt_tokens=cached_prompt_tokens,
+                total_prompt_tokens=self.prompt_token_count,
+                total_completion_tokens=self.completion_token_count,
+                total_cached_prompt_tokens=self.cached_prompt_token_count,
+            )
+        )
 
-        input_msg = assistant_response.msg
+        reason = None
+        if assistant_response.terminated:
+            reason = "assistant_terminated"
+        elif user_response.terminated:
+            reason = "user_terminated"
+        elif final_reason is not None:
+            reason = final_reason
+        elif any(marker in user_content for marker in TASK_DONE_MARKERS):
+            reason = "task_done"
+        if reason is not None:
+            events.append(self.terminate(round_idx, reason))
+        return events, reason is not None
+
+    def restore(self, state: dict) -> None:
+        r"""Continue from the chat history and token counts of a checkpoint."""
+        self.chat_history = state["chat_history"]
+        token_info = state["token_info"]
+        self.prompt_token_count = token_info.get("prompt_token_count", 0)
+        self.completion_token_count = token_info.get("completion_token_count", 0)
+        self.cached_prompt_token_count = token_info.get("cached_prompt_token_count", 0)
+        if self._tool_cache_offset is not None:
+            self._tool_cache_offset["hits"] += token_info.get("tool_cache_hits", 0)
+            self._tool_cache_offset["misses"] += token_info.get("tool_cache_misses", 0)
+
+    def terminate(self, round_idx: int, reason: str) -> TerminationEvent:
+        answer = self.chat_history[-1]["assistant"] if self.chat_history else ""
+        return TerminationEvent(
+            round_idx=round_idx,
+            reason=reason,
+            answer=answer,
+            chat_history=self.chat_history,
+            token_info=self.token_info,
+        )
 
-    answer = chat_history[-1]["assistant"]
-    token_info = {
-        "completion_token_count": overall_completion_token_count,
-        "prompt_token_count": overall_prompt_token_count,
-    }
 
-    return answer, chat_history, token_info
+def _start_society(
+    society: OwlRolePlaying,
+    tracker: _RoundTracker,
+    checkpoint: Optional[SocietyCheckpointer],
+) -> Tuple[int, Optional[BaseMessage], Optional[TerminationEvent]]:
+    r"""Start the chat, or continue it from the checkpoint if there is one.
+
+    Returns:
+        Tuple[int, Optional[BaseMessage], Optional[TerminationEvent]]: The
+            first round to run, its input message and, if the checkpointed
+            society had already stopped, its termination event.
+    """
+    state = checkpoint.restore(society) if checkpoint is not None else None
+    if state is None:
+        return 0, society.init_chat(SOCIETY_INIT_PROMPT), None
+    tracker.restore(state)
+    if state.get("reason"):
+        return 0, None, tracker.terminate(state["round_idx"], state["reason"])
+    return state["round_idx"] + 1, state["input_msg"], None
+
+
+def _save_checkpoint(
+    checkpoint: Optional[SocietyCheckpointer],
+    society: OwlRolePlaying,
+    round_idx: int,
+    tracker: _RoundTracker,
+    assistant_response: ChatAgentResponse,
+    events: List[SocietyEvent],
+    done: bool,
+) -> None:
+    if checkpoint is None:
+        return
+    checkpoint.save(
+        society,
+        round_idx,
+        tracker.chat_history,
+        tracker.token_info,
+        next_input=None if done else assistant_response.msg,
+        reason=events[-1].reason if done else None,
+    )
+    if done:
+        checkpoint.flush()
+
+
+def _check_budget(
+    budget: Optional[SocietyBudget],
+    society: OwlRolePlaying,
+    tracker: _RoundTracker,
+    round_idx: int,
+    started: float,
+) -> Tuple[Optional[TerminationEvent], bool]:
+    r"""Check the budget after a round.
+
+    Returns:
+        Tuple[Optional[TerminationEvent], bool]: The termination event if the
+            society must stop now, and whether the next round is a forced
+            final answer turn.
+    """
+    if budget is None:
+        return None, False
+    soft, hard = budget.check(tracker.token_info, time.monotonic() - started)
+    if hard is not None:
+        logger.warning(
+            f"Hard budget on {hard} exceeded after round #{round_idx}, "
+            "stopping the society."
+        )
+        return tracker.terminate(round_idx, "hard_budget"), False
+    if soft is None:
+        return None, False
+    if hasattr(society, "final_answer_step"):
+        logger.warning(
+            f"Soft budget on {soft} exceeded after round #{round_idx}, "
+            "asking for the final answer."
+        )
+        return None, True
+    logger.warning(
+        f"Soft budget on {soft} exceeded after round #{round_idx}, "
+        "stopping the society."
+    )
+    return tracker.terminate(round_idx, "soft_budget"), False
 
 
-async def arun_society(
+def stream_society(
     society: OwlRolePlaying,
     round_limit: int = 15,
-) -> Tuple[str, List[dict], dict]:
-    overall_completion_token_count = 0
-    overall_prompt_token_count = 0
+    tracer: Optional[SocietyTracer] = None,
+    checkpoint: Optional[SocietyCheckpointer] = None,
+    budget: Optional[SocietyBudget] = None,
+) -> Iterator[SocietyEvent]:
+    r"""Run the society and yield an event for every step of the conversation.
+
+    The instruction and tool call events of a round are delivered when the
+    round finishes, followed by the :obj:`SolutionEvent` and
+    :obj:`TokenUsageEvent` of the round. The last event is always a
+    :obj:`TerminationEvent` holding the answer, chat history and token info.
+
+    Args:
+        society (OwlRolePlaying): The society to run.
+        round_limit (int, optional): The maximum number of rounds.
+            (default: :obj:`15`)
+        tracer (SocietyTracer, optional): Records timing spans of the run
+            if given. (default: :obj:`None`)
+        checkpoint (SocietyCheckpointer, optional): Saves the society after
+            every round. If the checkpoint already holds a run of the same
+            task, the society continues after its last saved round.
+            (default: :obj:`None`)
+        budget (SocietyBudget, optional): Soft and hard limits on tokens,
+            cost and wall time, checked after every round.
+            (default: :obj:`None`)
+
+    Yields:
+        SocietyEvent: The events of the run.
+    """
+    pending: List[SocietyEvent] = []
+    event_bus = SocietyEventBus(pending.append)
+    tracker = _RoundTracker(event_bus, society)
+    started = time.monotonic()
+    final_answer_turn = False
+
+    with _observe_society(society, event_bus), _instrument(society, tracer):
+        start_round, input_msg, stopped = _start_society(society, tracker, checkpoint)
+        if stopped is not None:
+            yield stopped
+            return
+        for _round in range(start_round, round_limit):
+            event_bus.start_round(_round)
+            round_start = tracer.now() if tracer is not None else 0.0
+            if final_answer_turn:
+                assistant_response, user_response = society.final_answer_step()
+            else:
+                assistant_response, user_response = society.step(input_msg)
+            if tracer is not None:
+                tracer.record(
+                    "round", "round", round_start, tracer.now(), round_idx=_round
+                )
+            events, done = tracker.finish_round(
+                _round,
+                assistant_response,
+                user_response,
+                final_reason="soft_budget" if final_answer_turn else None,
+            )
+            _save_checkpoint(
+                checkpoint,
+                society,
+                _round,
+                tracker,
+                assistant_response,
+                events,
+                done,
+            )
+            yield from pending
+            pending.clear()
+            yield from events
+            if done:
+                return
+
+            input_msg = assistant_response.msg
+            stopped, final_answer_turn = _check_budget(
+                budget, society, tracker, _round, started
+            )
+            if stopped is not None:
+                if checkpoint is not None:
+                    checkpoint.flush()
+                yield stopped
+                return
 
-    chat_history = []
-    init_prompt = """
-    Now please give me instructions to solve over overall task step by step. If the task requires some specific knowledge, please instruct me to use tools to complete the task.
-        """
-    input_msg = society.init_chat(init_prompt)
-    for _round in range(round_limit):
-        assistant_response, user_response = await society.astep(input_msg)
-        # Check if usage info is available before accessing it
-        if assistant_response.info.get("usage") and user_response.info.get("usage"):
-            overall_prompt_token_count += assistant_response.info["usage"].get(
-                "completion_tokens", 0
+    if checkpoint is not None:
+        checkpoint.flush()
+    yield tracker.terminate(round_limit - 1, "round_limit")
+
+
+async def astream_society(
+    society: OwlRolePlaying,
+    round_limit: int = 15,
+    tracer: Optional[SocietyTracer] = None,
+    checkpoint: Optional[SocietyCheckpointer] = None,
+    budget: Optional[SocietyBudget] = None,
+) -> AsyncIterator[SocietyEvent]:
+    r"""Asynchronous version of :func:`stream_society`.
+
+    Unlike the synchronous version, instruction and tool call events are
+    yielded live while the round is still running.
+
+    Args:
+        society (OwlRolePlaying): The society to run.
+        round_limit (int, optional): The maximum number of rounds.
+            (default: :obj:`15`)
+        tracer (SocietyTracer, optional): Records timing spans of the run
+            if given. (default: :obj:`None`)
+        checkpoint (SocietyCheckpointer, optional): Saves the society after
+            every round. If the checkpoint already holds a run of the same
+            task, the society continues after its last saved round.
+            (default: :obj:`None`)
+        budget (SocietyBudget, optional): Soft and hard limits on tokens,
+            cost and wall time, checked after every round.
+            (default: :obj:`None`)
+
+    Yields:
+        SocietyEvent: The events of the run.
+    """
+    loop = asyncio.get_running_loop()
+    loop_thread = threading.get_ident()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event: SocietyEvent) -> None:
+        # Tools may run in worker threads
+        if threading.get_ident() == loop_thread:
+            queue.put_nowait(event)
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    event_bus = SocietyEventBus(on_event)
+    tracker = _RoundTracker(event_bus, society)
+    started = time.monotonic()
+    final_answer_turn = False
+
+    with _observe_society(society, event_bus), _instrument(society, tracer):
+        start_round, input_msg, stopped = _start_society(society, tracker, checkpoint)
+        if stopped is not None:
+            yield stopped
+            return
+        for _round in range(start_round, round_limit):
+            event_bus.start_round(_round)
+            round_start = tracer.now() if tracer is not None else 0.0
+            step_task = asyncio.ensure_future(
+                society.afinal_answer_step()
+                if final_answer_turn
+                else society.astep(input_msg)
+            )
+            getter = None
+            try:
+                while True:
+                    getter = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait(
+                        {step_task, getter}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if getter not in done:
+                        break
+                    yield getter.result()
+            finally:
+                if getter is not None and not getter.done():
+                    getter.cancel()
+                if not step_task.done():
+                    step_task.cancel()
+            while not queue.empty():
+                yield queue.get_nowait()
+
+            assistant_response, user_response = step_task.result()
+            if tracer is not None:
+                tracer.record(
+                    "round", "round", round_start, tracer.now(), round_idx=_round
+                )
+            events, done = tracker.finish_round(
+                _round,
+                assistant_response,
+                user_response,
+                final_reason="soft_budget" if final_answer_turn else None,
+            )
+            _save_checkpoint(
+                checkpoint, society, _round, tracker, assistant_response, events, done
             )
-            overall_prompt_token_count += assistant_response.info["usage"].get(
-                "prompt_tokens", 0
-            ) + user_response.info["usage"].get("prompt_tokens", 0)
+            for event in events:
+                yield event
+            if done:
+                return
+
+            input_msg = assistant_response.msg
+            stopped, final_answer_turn = _check_budget(
+                budget, society, tracker, _round, started
+            )
+            if stopped is not None:
+                if checkpoint is not None:
+                    checkpoint.flush()
+                yield stopped
+                return
 
-        # convert tool call to dict
-        tool_call_records: List[dict] = []
-        if assistant_response.info.get("tool_calls"):
-            for tool_call in assistant_response.info["tool_calls"]:
-                tool_call_records.append(tool_call.as_dict())
+    if checkpoint is not None:
+        checkpoint.flush()
+    yield tracker.terminate(round_limit - 1, "round_limit")
 
-        _data = {
-            "user": user_response.msg.content
-            if hasattr(user_response, "msg") and user_response.msg
-            else "",
-            "assistant": assistant_response.msg.content
-            if hasattr(assistant_response, "msg") and assistant_response.msg
-            else "",
-            "tool_calls": tool_call_records,
-        }
 
-        chat_history.append(_data)
-        logger.info(
-            f"Round #{_round} user_response:\n {user_response.msgs[0].content if user_response.msgs and len(user_response.msgs) > 0 else ''}"
-        )
-        logger.info(
-            f"Round #{_round} assistant_response:\n {assistant_response.msgs[0].content if assistant_response.msgs and len(assistant_response.msgs) > 0 else ''}"
-        )
+def run_society(
+    society: OwlRolePlaying,
+    round_limit: int = 15,
+    tracer: Optional[SocietyTracer] = None,
+    checkpoint: Optional[SocietyCheckpointer] = None,
+    budget: Optional[SocietyBudget] = None,
+) -> Tuple[str, List[dict], dict]:
+    for event in stream_society(
+        society, round_limit, tracer=tracer, checkpoint=checkpoint, budget=budget
+    ):
+        if isinstance(event, TerminationEvent):
+            return event.answer, event.chat_history, event.token_info
 
-        # Check other termination conditions
-        if (
-            assistant_response.terminated
-            or user_response.terminated
-            or "TASK_DONE" in user_response.msg.content
-            or "任务已完成" in user_response.msg.content
-        ):
-            break
 
-        input_msg = assistant_response.msg
+async def arun_society(
+    society: OwlRolePlaying,
+    round_limit: int = 15,
+    tracer: Optional[SocietyTracer] = None,
+    checkpoint: Optional[SocietyCheckpointer] = None,
+    budget: Optional[SocietyBudget] = None,
+) -> Tuple[str, List[dict], dict]:
+    async for event in astream_society(
+        society, round_limit, tracer=tracer, checkpoint=checkpoint, budget=budget
+    ):
+        if isinstance(event, TerminationEvent):
+            return event.answer, event.chat_history, event.token_info
 
-    answer = chat_history[-1]["assistant"]
-    token_info = {
-        "completion_token_count": overall_completion_token_count,
-        "prompt_token_count": overall_prompt_token_count,
-    }
 
-    return answer, chat_history, token_info
+def resume_society(
+    checkpoint_dir: str,
+    round_limit: int = 15,
+    tracer: Optional[SocietyTracer] = None,
+    budget: Optional[SocietyBudget] = None,
+    **society_kwargs,
+) -> Tuple[str, List[dict], dict]:
+    r"""Rebuild the society saved in a checkpoint and run it to the end.
+
+    Args:
+        checkpoint_dir (str): The directory of the checkpoint.
+        round_limit (int, optional): The maximum number of rounds, including
+            the rounds run before the checkpoint. (default: :obj:`15`)
+        tracer (SocietyTracer, optional): Records timing spans of the rest of
+            the run if given. (default: :obj:`None`)
+        budget (SocietyBudget, optional): The budget of the rest of the run.
+            (default: :obj:`None`)
+        **society_kwargs: The arguments of the society that cannot be
+            checkpointed, such as ``user_agent_kwargs`` and
+            ``assistant_agent_kwargs`` with the models and tools.
+
+    Returns:
+        Tuple[str, List[dict], dict]: The answer, the full chat history and
+            the accumulated token info, as returned by :func:`run_society`.
+    """
+    society = load_society(checkpoint_dir, **society_kwargs)
+    return run_society(
+        society,
+        round_limit,
+        tracer=tracer,
+        checkpoint=SocietyCheckpointer(checkpoint_dir),
+        budget=budget,
+    )
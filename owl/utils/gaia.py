@@ -15,12 +15,15 @@ import sys
 
 sys.path.append("../")
 
+import asyncio
 import json
+import os
 import random
 import re
 import string
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Union, Tuple
+from typing import Any, Callable, Dict, List, Literal, Optional, Union, Tuple
 
 from tqdm import tqdm
 from camel.benchmarks import BaseBenchmark
@@ -29,6 +32,12 @@ from camel.logger import get_logger
 
 from .common import extract_pattern
 from .enhanced_role_playing import run_society, OwlGAIARolePlaying
+from .attachment_cache import AttachmentCache, attachment_kind
+from .batch_runner import arun_societies
+from .gaia_report import summarize_results
+from .result_store import ResultStore, iter_result_file
+from .scheduling import LPTScheduler
+from .society_factory import SocietyResources, WarmSocietyFactory
 
 logger = get_logger(__name__)
 
@@ -40,7 +49,11 @@ class GAIABenchmark(BaseBenchmark):
 
     Args:
         data_dir (str): The directory to save the data.
-        save_to (str): The file to save the results.
+        save_to (str): The file to save the results. Results are appended to
+            a JSONL file as each task finishes: ``save_to`` itself if it ends
+            in ``.jsonl`` or ``.jsonl.zst``, otherwise a ``.jsonl`` file next
+            to it, and a ``.json`` ``save_to`` is written in the legacy format
+            at the end of the run.
         processes (int, optional): The number of processes to use.
             (default: :obj:`1`)
     """
@@ -60,6 +73,8 @@ class GAIABenchmark(BaseBenchmark):
                 parallel processing. (default: :obj:`1`)
         """
         super().__init__("gaia", data_dir, save_to, processes)
+        self._store: Optional[ResultStore] = None
+        self._attachment_cache: Optional[AttachmentCache] = None
 
     def download(self):
         r"""Download the GAIA dataset."""
@@ -73,10 +88,53 @@ class GAIABenchmark(BaseBenchmark):
         )
 
     def _check_task_completed(self, task_id: str) -> bool:
-        for data in self._results:
-            if data["task_id"] == task_id:
-                return True
-        return False
+        if self._store is not None:
+            return task_id in self._store
+        return any(data["task_id"] == task_id for data in self._results)
+
+    def _open_result_store(self) -> ResultStore:
+        r"""Open the JSONL store of the results, importing the results of a
+        legacy JSON file on the first run."""
+        save_to = str(self.save_to)
+        if not save_to.endswith(".json"):
+            return ResultStore(save_to)
+        store = ResultStore(os.path.splitext(save_to)[0] + ".jsonl")
+        if not len(store) and os.path.exists(save_to):
+            try:
+                for result in iter_result_file(save_to):
+                    store.append(result)
+            except Exception as e:
+                logger.warning(f"Could not import results from {save_to}: {e}")
+        return store
+
+    def prefetch_attachments(
+        self,
+        cache: AttachmentCache,
+        on: Optional[List[Literal["valid", "test"]]] = None,
+    ) -> Dict[str, Any]:
+        r"""Extract the attachments of the tasks in parallel into a cache.
+
+        Args:
+            cache (AttachmentCache): The cache to extract into.
+            on (List[str], optional): The sets of the tasks.
+                (default: :obj:`["valid", "test"]`)
+
+        Returns:
+            Dict[str, Any]: The number of attachments and the cache stats.
+        """
+        splits = on or ["valid", "test"]
+        paths = [
+            str(data["file_name"])
+            for split in splits
+            for data in self._data[split]
+            if data["file_name"] and Path(data["file_name"]).exists()
+        ]
+        records = cache.prefetch(paths)
+        return {
+            "attachments": len(records),
+            "failed": sum(not record.success for record in records.values()),
+            **cache.stats,
+        }
 
     def dump_tasks(self, save_path: str, datas):
         constructed_data = []
@@ -148,7 +206,47 @@ class GAIABenchmark(BaseBenchmark):
         subset: Optional[int] = None,
         idx: Optional[List[int]] = None,
         save_result: bool = False,
+        build_resources: Optional[Callable[[], SocietyResources]] = None,
+        attachment_cache: Optional[AttachmentCache] = None,
+        scheduler: Optional[LPTScheduler] = None,
     ) -> Dict[str, Any]:
+        r"""Run the benchmark.
+
+        With :obj:`processes` greater than 1 and :obj:`build_resources`
+        given, :obj:`processes` tasks run concurrently, each worker with its
+        own models and toolkits. Otherwise the tasks run one after the other
+        with the given agent arguments.
+
+        Args:
+            user_role_name (str): The role name of the user agent.
+            assistant_role_name (str): The role name of the assistant agent.
+            user_agent_kwargs (dict): The arguments of the user agent.
+            assistant_agent_kwargs (dict): The arguments of the assistant
+                agent.
+            on (Literal["train", "valid", "test"]): The split to run on.
+            level (Union[int, List[int], Literal["all"]]): The levels to run.
+            randomize (bool, optional): Whether to shuffle the tasks.
+                (default: :obj:`False`)
+            subset (int, optional): The number of tasks to run.
+                (default: :obj:`None`)
+            idx (List[int], optional): The indices of the tasks to run.
+                (default: :obj:`None`)
+            save_result (bool, optional): Whether to save the results to
+                :obj:`save_to` after every task, and skip the tasks already
+                in it. (default: :obj:`False`)
+            build_resources (Callable[[], SocietyResources], optional): Builds
+                the models and toolkits of a worker for parallel runs.
+                (default: :obj:`None`)
+            attachment_cache (AttachmentCache, optional): Extracts the
+                attachments of the tasks before the run and adds their
+                content to the task prompts. (default: :obj:`None`)
+            scheduler (LPTScheduler, optional): Chooses the order of the
+                tasks of a parallel run, longest predicted task first.
+                (default: :obj:`None`)
+
+        Returns:
+            Dict[str, Any]: The summary of the results.
+        """
         # Validate inputs
         if on not in ["valid", "test"]:
             raise ValueError(
@@ -182,33 +280,46 @@ class GAIABenchmark(BaseBenchmark):
         logger.info(f"Number of tasks: {len(datas)}")
 
         self._results = []
+        self._store = None
 
         if save_result:
-            try:
-                with open(self.save_to, "r", encoding="utf-8") as f:
-                    self._results = json.load(f)
-                f.close()
-            except Exception as e:
-                logger.warning(e)
-                # raise FileNotFoundError(f"{self.save_to} does not exist.")
+            self._store = self._open_result_store()
+            self._results = self._store.results
         datas = [
             data for data in datas if not self._check_task_completed(data["task_id"])
         ]
         logger.info(f"Number of tasks to be processed: {len(datas)}")
+
+        self._attachment_cache = attachment_cache
+        if attachment_cache is not None:
+            # Keep the extraction off the critical path of the societies
+            attachment_cache.prefetch(
+                str(data["file_name"])
+                for data in datas
+                if data["file_name"] and Path(data["file_name"]).exists()
+            )
+
+        if self.processes > 1 and build_resources is None:
+            logger.warning(
+                "Running tasks serially: parallel runs need `build_resources`, "
+                "so that every worker has its own models and toolkits."
+            )
+        if self.processes > 1 and build_resources is not None:
+            self._run_parallel(
+                datas,
+                build_resources,
+                user_role_name=user_role_name,
+                assistant_role_name=assistant_role_name,
+                save_result=save_result,
+                scheduler=scheduler,
+            )
+            return self._generate_summary()
+
         # Process tasks
         for task in tqdm(datas, desc="Running"):
             if_prepared_task, info = self._prepare_task(task)
             if not if_prepared_task:
-                _result_info = {
-                    "task_id": task["task_id"],
-                    "question": task["Question"],
-                    "level": task["Level"],
-                    "model_answer": None,
-                    "ground_truth": None,
-                    "score": 0,
-                    "history": None,
-                }
-                self._results.append(_result_info)
+                self._add_result(self._skipped_result(task))
                 continue
             try:
                 logger.info(f"Task Question: {task['Question']}")
@@ -227,42 +338,188 @@ class GAIABenchmark(BaseBenchmark):
                     assistant_agent_kwargs=assistant_agent_kwargs,
                 )
 
+                start = time.perf_counter()
                 raw_answer, chat_history, token_info = run_society(society)
-                try:
-                    answer = extract_pattern(raw_answer, "final_answer")
-                except Exception as e:
-                    logger.error(
-                        f"Error in extracting final answer from text {raw_answer}: {e}"
+                self._add_result(
+                    self._task_result(
+                        task,
+                        raw_answer,
+                        chat_history,
+                        token_info,
+                        time.perf_counter() - start,
                     )
-                    answer = None
-
-                logger.info(
-                    f"Model answer: {answer}, Ground truth: {task['Final answer']}"
                 )
 
-                _result_info = {
-                    "task_id": task["task_id"],
-                    "question": task["Question"]
-                    + "Please decompose the task into several sub-tasks and find the answer step-by-step.",
-                    "level": task["Level"],
-                    "model_answer": answer,
-                    "ground_truth": task["Final answer"],
-                    "score": self.question_scorer(answer, task["Final answer"]),
-                    "token_info": token_info,
-                    "history": chat_history,
-                }
-                self._results.append(_result_info)
-
             except Exception as e:
                 logger.error(f"Error in processing task: {e}")
 
-            if save_result:
-                with open(self.save_to, "w") as f:
-                    json.dump(self._results, f, indent=4, ensure_ascii=False)
-                f.close()
+        if save_result:
+            self._save_results()
 
         return self._generate_summary()
 
+    def _run_parallel(
+        self,
+        datas: List[Dict[str, Any]],
+        build_resources: Callable[[], SocietyResources],
+        user_role_name: str,
+        assistant_role_name: str,
+        save_result: bool,
+        scheduler: Optional[LPTScheduler] = None,
+    ) -> None:
+        r"""Run the tasks on :obj:`self.processes` concurrent societies.
+
+        Every worker thread builds its own models and toolkits once and reuses
+        them for all of its tasks. As in the serial run, a task that fails is
+        logged and left out of the results, so it is retried when the run is
+        resumed. With a scheduler, the predicted and actual makespans of the
+        run are logged.
+        """
+        tasks: Dict[str, Dict[str, Any]] = {}
+        for task in datas:
+            if_prepared_task, info = self._prepare_task(task)
+            if not if_prepared_task:
+                self._add_result(self._skipped_result(task))
+                continue
+            tasks[task["task_id"]] = task
+
+        society_factory = WarmSocietyFactory(
+            build_resources,
+            society_cls=OwlGAIARolePlaying,
+            user_role_name=user_role_name,
+            assistant_role_name=assistant_role_name,
+        )
+        # Results in the order of the tasks, as in the serial run
+        task_order = {task["task_id"]: idx for idx, task in enumerate(datas)}
+        num_previous = len(self._results)
+        progress = tqdm(total=len(tasks), desc="Running")
+
+        def on_result(result: Dict[str, Any]) -> None:
+            progress.update(1)
+            if result["status"] != "ok":
+                logger.error(
+                    f"Error in processing task {result['task_id']}: "
+                    f"{result['error'] or result['status']}"
+                )
+                return
+            self._add_result(
+                self._task_result(
+                    tasks[result["task_id"]],
+                    result["answer"],
+                    result["history"],
+                    result["token_info"],
+                    result["elapsed"],
+                )
+            )
+
+        batch = [
+            {
+                "task_id": task_id,
+                "question": task["Question"],
+                "level": task["Level"],
+                "file_name": task["file_name"],
+            }
+            for task_id, task in tasks.items()
+        ]
+        plan = None
+        if scheduler is not None:
+            plan = scheduler.plan(batch, self.processes)
+            logger.info(
+                f"Predicted makespan: {plan['predicted_makespan']:.0f}s "
+                f"longest task first, "
+                f"{plan['predicted_makespan_in_order']:.0f}s in task order."
+            )
+        start = time.perf_counter()
+        try:
+            asyncio.run(
+                arun_societies(
+                    batch,
+                    society_factory,
+                    max_concurrency=self.processes,
+                    on_result=on_result,
+                    scheduler=scheduler,
+                )
+            )
+        finally:
+            progress.close()
+            society_factory.close()
+        if plan is not None:
+            logger.info(
+                f"Makespan: {time.perf_counter() - start:.0f}s, predicted "
+                f"{plan['predicted_makespan']:.0f}s."
+            )
+
+        self._results[num_previous:] = sorted(
+            self._results[num_previous:],
+            key=lambda result: task_order.get(result["task_id"], -1),
+        )
+        if save_result:
+            self._save_results()
+
+    def _skipped_result(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        r"""The result of a task that could not be prepared."""
+        return {
+            "task_id": task["task_id"],
+            "question": task["Question"],
+            "level": task["Level"],
+            "model_answer": None,
+            "ground_truth": None,
+            "score": 0,
+            "history": None,
+        }
+
+    def _task_result(
+        self,
+        task: Dict[str, Any],
+        raw_answer: str,
+        chat_history: List[Dict[str, Any]],
+        token_info: Dict[str, Any],
+        elapsed: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        r"""Extract and score the final answer of a finished task."""
+        try:
+            answer = extract_pattern(raw_answer, "final_answer")
+        except Exception as e:
+            logger.error(
+                f"Error in extracting final answer from text {raw_answer}: {e}"
+            )
+            answer = None
+
+        logger.info(f"Model answer: {answer}, Ground truth: {task['Final answer']}")
+
+        return {
+            "task_id": task["task_id"],
+            "question": task["Question"]
+            + "Please decompose the task into several sub-tasks and find the answer step-by-step.",
+            "level": task["Level"],
+            "model_answer": answer,
+            "ground_truth": task["Final answer"],
+            "score": self.question_scorer(answer, task["Final answer"]),
+            "token_info": token_info,
+            "elapsed": elapsed,
+            "attachment": (
+                attachment_kind(str(task["file_name"])) if task["file_name"] else None
+            ),
+            "history": chat_history,
+        }
+
+    def _add_result(self, result: Dict[str, Any]) -> None:
+        r"""Keep the result of a task and append it to the result store, so
+        that it survives a crash of the run."""
+        self._results.append(result)
+        if self._store is not None:
+            self._store.append(result)
+
+    def _save_results(self) -> None:
+        r"""Write all results to a legacy JSON :obj:`save_to` at the end of a
+        run. The JSONL result store is already up to date."""
+        if not str(self.save_to).endswith(".json"):
+            return
+        tmp_path = f"{self.save_to}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._results, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.save_to)
+
     def _prepare_task(self, task: Dict[str, Any]) -> Tuple[bool, str]:
         r"""Prepare the task by validating and enriching its data."""
         if task["file_name"]:
@@ -292,6 +549,9 @@ class GAIABenchmark(BaseBenchmark):
             else:
                 task["Question"] += f" Here are the necessary files: {file_path}"
 
+            if self._attachment_cache is not None:
+                task["Question"] += self._attachment_cache.prompt_note(str(file_path))
+
         return True, None
 
     def _create_task(self, task: Dict[str, Any]) -> Task:
@@ -306,14 +566,13 @@ class GAIABenchmark(BaseBenchmark):
         return Task(id=str(task["task_id"]), content=task["Question"])
 
     def _generate_summary(self) -> Dict[str, Any]:
-        r"""Generate and return a summary of the benchmark results."""
-        correct = sum(result["score"] for result in self._results)
-        return {
-            "total": len(self._results),
-            "correct": correct,
-            "results": self._results,
-            "accuracy": correct / len(self._results) if len(self._results) > 0 else 0,
-        }
+        r"""Generate and return a summary of the benchmark results: the
+        accuracy overall and per level, the distributions of tokens and
+        seconds per task and the cost, see :func:`summarize_results`."""
+        summary = summarize_results(self._results)
+        # Only meaningful when rescoring stored results
+        summary.pop("changed")
+        return {**summary, "results": self._results}
 
     def question_scorer(self, model_answer: str, ground_truth: str) -> bool:
         r"""Scorer for the GAIA benchmark.
@@ -336,20 +595,17 @@ class GAIABenchmark(BaseBenchmark):
                 return False
 
         if is_float(ground_truth):
-            logger.info(f"Evaluating {model_answer} as a number.")
+            logger.debug(f"Evaluating {model_answer} as a number.")
             normalized_answer = self.normalize_number_str(model_answer)
             return normalized_answer == float(ground_truth)
 
         elif any(char in ground_truth for char in [",", ";"]):
-            logger.info(f"Evaluating {model_answer} as a comma separated list.")
+            logger.debug(f"Evaluating {model_answer} as a comma separated list.")
             gt_elems = self.split_string(ground_truth)
             ma_elems = self.split_string(model_answer)
 
             if len(gt_elems) != len(ma_elems):
-                logger.warning(
-                    "Answer lists have different lengths, returning False.",
-                    UserWarning,
-                )
+                logger.warning("Answer lists have different lengths, returning False.")
                 return False
 
             comparisons = []
@@ -363,7 +619,7 @@ class GAIABenchmark(BaseBenchmark):
                     comparisons.append(ma_elem == gt_elem)
             return all(comparisons)
         else:
-            logger.info(f"Evaluating {model_answer} as a string.")
+            logger.debug(f"Evaluating {model_answer} as a string.")
             ma_elem = self.normalize_str(model_answer)
             gt_elem = self.normalize_str(ground_truth)
             return ma_elem == gt_elem
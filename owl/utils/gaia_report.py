@@ -0,0 +1,351 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from camel.logger import get_logger
+
+from .budget import token_cost
+from .result_store import iter_result_file
+
+logger = get_logger(__name__)
+
+# USD per million tokens, the list prices of GPT-4o
+DEFAULT_PROMPT_PRICE = 2.5
+DEFAULT_COMPLETION_PRICE = 10.0
+
+
+@dataclass
+class Pricing:
+    r"""The prices of a model in USD per million tokens.
+
+    Args:
+        prompt (float, optional): The price of prompt tokens.
+            (default: :obj:`2.5`)
+        completion (float, optional): The price of completion tokens.
+            (default: :obj:`10.0`)
+        cached_prompt (float, optional): The price of cached prompt tokens.
+            (default: the price of prompt tokens)
+    """
+
+    prompt: float = DEFAULT_PROMPT_PRICE
+    completion: float = DEFAULT_COMPLETION_PRICE
+    cached_prompt: Optional[float] = None
+
+    def cost(self, token_info: Optional[Dict[str, Any]]) -> float:
+        r"""The cost in USD of the tokens of a task."""
+        return token_cost(token_info, self.prompt, self.completion, self.cached_prompt)
+
+
+class _BatchScorer:
+    r"""Scores answers with :meth:`GAIABenchmark.question_scorer`, once per
+    distinct answer and ground truth.
+
+    Runs repeat the same tasks, and failed runs repeat the same empty
+    answers, so most pairs of a batch of result files have been scored
+    before.
+    """
+
+    def __init__(self, data_dir: str):
+        from .gaia import GAIABenchmark
+
+        self.benchmark = GAIABenchmark(data_dir=data_dir, save_to="")
+        self._scores: Dict[Tuple[str, str], bool] = {}
+
+    def __call__(self, model_answer: Any, ground_truth: Any) -> bool:
+        if model_answer is None or ground_truth is None:
+            return False
+        key = (str(model_answer), str(ground_truth))
+        score = self._scores.get(key)
+        if score is None:
+            try:
+                score = bool(self.benchmark.question_scorer(*key))
+            except Exception as e:
+                logger.warning(f"Could not score answer {key[0]!r}: {e}")
+                score = False
+            self._scores[key] = score
+        return score
+
+
+_scorer: Optional[_BatchScorer] = None
+
+
+def _get_scorer(data_dir: str) -> _BatchScorer:
+    global _scorer
+    if _scorer is None:
+        _scorer = _BatchScorer(data_dir)
+    return _scorer
+
+
+def rescore_result_file(
+    path: str,
+    output_path: Optional[str] = None,
+    data_dir: str = "data/gaia",
+) -> List[Dict[str, Any]]:
+    r"""Rescore the results of a file with the current scorer.
+
+    The file is streamed, so its chat histories are never all in memory.
+
+    Args:
+        path (str): A JSON, JSONL or JSONL.zst result file.
+        output_path (str, optional): A JSONL file to write the rescored
+            results to, histories included. (default: :obj:`None`)
+        data_dir (str, optional): The GAIA data directory, only needed to
+            create the scorer. (default: :obj:`"data/gaia"`)
+
+    Returns:
+        List[Dict[str, Any]]: One row per result with the fields of a report:
+            ``task_id``, ``level``, ``score``, ``old_score``, ``token_info``,
+            ``elapsed`` and ``attachment``.
+    """
+    scorer = _get_scorer(data_dir)
+    rows = []
+    output_file = None
+    if output_path is not None:
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        output_file = open(output_path, "w", encoding="utf-8")
+    try:
+        for result in iter_result_file(path):
+            old_score = result.get("score")
+            score = scorer(result.get("model_answer"), result.get("ground_truth"))
+            if output_file is not None:
+                result["score"] = score
+                output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            rows.append(
+                {
+                    "task_id": result.get("task_id"),
+                    "level": result.get("level"),
+                    "score": score,
+                    "old_score": old_score,
+                    "token_info": result.get("token_info"),
+                    "elapsed": result.get("elapsed"),
+                    "attachment": result.get("attachment"),
+                }
+            )
+    finally:
+        if output_file is not None:
+            output_file.close()
+    return rows
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def summarize_results(
+    results: Iterable[Dict[str, Any]], pricing: Optional[Pricing] = None
+) -> Dict[str, Any]:
+    r"""Summarize the results of a run.
+
+    Args:
+        results (Iterable[Dict[str, Any]]): Results or report rows with
+            ``score`` and, if known, ``level``, ``old_score``,
+            ``token_info`` and ``elapsed`` fields.
+        pricing (Pricing, optional): The model prices.
+            (default: :obj:`Pricing()`)
+
+    Returns:
+        Dict[str, Any]: The number of tasks, correct answers, accuracy and
+            scores changed since the results were stored, the accuracy per
+            level, the p50 and p90 of the tokens and seconds of a task, the
+            total cost and the cost per correct answer.
+    """
+    pricing = pricing or Pricing()
+    total = correct = changed = 0
+    levels: Dict[Any, List[int]] = {}
+    tokens: List[float] = []
+    seconds: List[float] = []
+    cost = 0.0
+    for result in results:
+        score = bool(result["score"])
+        total += 1
+        correct += score
+        if "old_score" in result and result["old_score"] is not None:
+            changed += score != bool(result["old_score"])
+        level = levels.setdefault(result.get("level"), [0, 0])
+        level[0] += score
+        level[1] += 1
+        token_info = result.get("token_info")
+        if token_info:
+            tokens.append(
+                token_info.get("prompt_token_count", 0)
+                + token_info.get("completion_token_count", 0)
+            )
+            cost += pricing.cost(token_info)
+        if result.get("elapsed") is not None:
+            seconds.append(result["elapsed"])
+    return {
+        "total": total,
+        "correct": correct,
+        "accuracy": correct / total if total else 0,
+        "changed": changed,
+        "levels": {
+            level: {"total": n, "correct": c, "accuracy": c / n}
+            for level, (c, n) in sorted(levels.items(), key=lambda kv: str(kv[0]))
+        },
+        "tokens_p50": _percentile(tokens, 50),
+        "tokens_p90": _percentile(tokens, 90),
+        "seconds_p50": _percentile(seconds, 50),
+        "seconds_p90": _percentile(seconds, 90),
+        "cost": cost,
+        "cost_per_correct": cost / correct if correct else None,
+    }
+
+
+def _report_file(
+    args: Tuple[str, Optional[str], str, Pricing],
+) -> Dict[str, Any]:
+    path, output_path, data_dir, pricing = args
+    rows = rescore_result_file(path, output_path, data_dir)
+    return {"run": path, **summarize_results(rows, pricing)}
+
+
+def _run_name(path: str) -> str:
+    r"""The path without the extension of a result file."""
+    for suffix in (".jsonl.zst", ".jsonl", ".json"):
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return os.path.splitext(path)[0]
+
+
+def _output_names(paths: List[str]) -> List[str]:
+    r"""Unique file names for the rescored results of the given runs: the
+    file name of a run, or its path from the common directory of the runs
+    with the same file name."""
+    names = [_run_name(os.path.basename(path)) for path in paths]
+    for name in set(names):
+        same = [idx for idx, other in enumerate(names) if other == name]
+        if len(same) < 2:
+            continue
+        paths_of_name = [os.path.abspath(paths[idx]) for idx in same]
+        common = os.path.commonpath([os.path.dirname(p) for p in paths_of_name])
+        for idx, path in zip(same, paths_of_name):
+            names[idx] = _run_name(os.path.relpath(path, common)).replace(os.sep, "_")
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Several runs would write their rescored results to the same file: "
+            f"{', '.join(duplicates)}."
+        )
+    return [f"{name}.jsonl" for name in names]
+
+
+def report_runs(
+    paths: List[str],
+    output_dir: Optional[str] = None,
+    data_dir: str = "data/gaia",
+    pricing: Optional[Pricing] = None,
+    processes: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    r"""Rescore and summarize result files, one process per file.
+
+    Args:
+        paths (List[str]): The result files, one per run.
+        output_dir (str, optional): A directory to write the rescored
+            results to, one JSONL file per run, named after the result file
+            (and its directories if several runs have the same file name).
+            (default: :obj:`None`)
+        data_dir (str, optional): The GAIA data directory.
+            (default: :obj:`"data/gaia"`)
+        pricing (Pricing, optional): The model prices.
+            (default: :obj:`Pricing()`)
+        processes (int, optional): The number of processes.
+            (default: one per CPU)
+
+    Returns:
+        List[Dict[str, Any]]: The summary of every run, see
+            :func:`summarize_results`, with its path as ``run``.
+    """
+    pricing = pricing or Pricing()
+    output_paths: List[Optional[str]] = [None] * len(paths)
+    if output_dir is not None:
+        output_paths = [os.path.join(output_dir, name) for name in _output_names(paths)]
+    jobs = [
+        (path, output_path, data_dir, pricing)
+        for path, output_path in zip(paths, output_paths)
+    ]
+    if len(jobs) <= 1 or processes == 1:
+        return [_report_file(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_report_file, jobs))
+
+
+def _format(value: Any, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def format_report_table(reports: List[Dict[str, Any]]) -> str:
+    r"""A plain text table comparing runs.
+
+    Args:
+        reports (List[Dict[str, Any]]): The summaries of the runs, see
+            :func:`report_runs`.
+
+    Returns:
+        str: The table, one row per run.
+    """
+    levels = sorted(
+        {level for report in reports for level in report["levels"]}, key=str
+    )
+    header = [
+        "run",
+        "tasks",
+        "acc",
+        *[f"L{level}" for level in levels],
+        "changed",
+        "tok p50",
+        "tok p90",
+        "sec p50",
+        "sec p90",
+        "cost $",
+        "$/correct",
+    ]
+    rows = [header]
+    for report in reports:
+        rows.append(
+            [
+                report["run"],
+                str(report["total"]),
+                _format(report["accuracy"], ".1%"),
+                *[
+                    _format(report["levels"].get(level, {}).get("accuracy"), ".1%")
+                    for level in levels
+                ],
+                str(report["changed"]),
+                _format(report["tokens_p50"], ".0f"),
+                _format(report["tokens_p90"], ".0f"),
+                _format(report["seconds_p50"], ".0f"),
+                _format(report["seconds_p90"], ".0f"),
+                _format(report["cost"], ".2f"),
+                _format(report["cost_per_correct"], ".3f"),
+            ]
+        )
+    widths = [max(len(row[col]) for row in rows) for col in range(len(header))]
+    lines = [
+        "  ".join(
+            cell.ljust(width) if col == 0 else cell.rjust(width)
+            for col, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
@@ -0,0 +1,400 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import asyncio
+import copy
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Type
+
+from camel.logger import get_logger
+from camel.messages import OpenAIMessage
+from camel.models import BaseModelBackend
+from camel.utils import BaseTokenCounter
+from pydantic import BaseModel
+
+logger = get_logger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429})
+RETRYABLE_ERROR_NAMES = frozenset(
+    {"APIConnectionError", "APITimeoutError", "RateLimitError", "TimeoutError"}
+)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    r"""Whether a failed request may succeed on another provider: rate
+    limits (429), server errors (5xx), timeouts and connection errors."""
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES or isinstance(
+        error, (ConnectionError, TimeoutError)
+    )
+
+
+class _BackendState:
+    r"""The recent latencies and the health of one backend."""
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.unhealthy_until = 0.0
+        self.failures = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def _without_client_retries(backend: BaseModelBackend) -> BaseModelBackend:
+    r"""A shallow copy of the backend whose OpenAI clients do not retry, or
+    the backend itself if it has no such client."""
+    clients = {
+        attr: getattr(backend, attr)
+        for attr in ("_client", "_async_client")
+        if hasattr(getattr(backend, attr, None), "with_options")
+    }
+    if not clients:
+        return backend
+    backend = copy.copy(backend)
+    for attr, client in clients.items():
+        setattr(backend, attr, client.with_options(max_retries=0))
+    return backend
+
+
+class HedgedModel(BaseModelBackend):
+    r"""A model backend spreading the requests of an agent over several
+    providers.
+
+    Requests go to the first healthy backend. If it has not answered after
+    its p95 latency, a duplicate request is sent to the next backend and the
+    first response wins, which cuts off the slow tail of a provider. A
+    backend failing with a rate limit (429), a server error (5xx), a timeout
+    or a connection error is skipped for a cooldown period and the request
+    fails over to the next backend. Other errors are raised as is.
+
+    The backends should answer the same requests equally well, e.g. the
+    same model served by several providers. The model uses copies of the
+    backends whose OpenAI clients do not retry, so that a rate limit fails
+    over at once instead of being retried against the same provider; the
+    backends passed in, and any agent sharing them, keep their retries.
+
+    A request cancelled because the other request of its hedge won is
+    recorded with the time it ran, a lower bound of its latency, so that the
+    percentiles are not fitted on the winners only.
+
+    Args:
+        backends (List[BaseModelBackend]): The backends in order of
+            preference.
+        hedge (bool, optional): Whether to send hedged duplicate requests.
+            (default: :obj:`True`)
+        hedge_percentile (float, optional): The latency percentile of a
+            backend after which a request is hedged. (default: :obj:`95`)
+        initial_hedge_delay (float, optional): The delay in seconds after
+            which a request is hedged while a backend has fewer than
+            ``min_samples`` latencies. (default: :obj:`30.0`)
+        min_samples (int, optional): The number of latencies needed before
+            the percentile is used. (default: :obj:`20`)
+        window (int, optional): The number of recent latencies kept per
+            backend. (default: :obj:`200`)
+        cooldown (float, optional): Seconds a failed backend is skipped.
+            (default: :obj:`30.0`)
+        disable_client_retries (bool, optional): Whether to use copies of
+            the backends with the retries of their OpenAI clients turned
+            off. (default: :obj:`True`)
+
+    Example:
+        >>> model = HedgedModel([
+        ...     ModelFactory.create(ModelPlatformType.OPENAI, ModelType.GPT_4O),
+        ...     ModelFactory.create(
+        ...         ModelPlatformType.AZURE, ModelType.GPT_4O, ...
+        ...     ),
+        ... ])
+        >>> assistant_agent_kwargs = {"model": model, "tools": tools}
+    """
+
+    def __init__(
+        self,
+        backends: List[BaseModelBackend],
+        hedge: bool = True,
+        hedge_percentile: float = 95,
+        initial_hedge_delay: float = 30.0,
+        min_samples: int = 20,
+        window: int = 200,
+        cooldown: float = 30.0,
+        disable_client_retries: bool = True,
+    ):
+        if not backends:
+            raise ValueError("HedgedModel needs at least one backend.")
+        self.backends = [
+            _without_client_retries(backend) if disable_client_retries else backend
+            for backend in backends
+        ]
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self._states = [
+            _BackendState(f"{idx}:{backend.model_type}", window)
+            for idx, backend in enumerate(self.backends)
+        ]
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=8 * len(self.backends), thread_name_prefix="hedged-model"
+        )
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    @property
+    def model_type(self) -> Any:
+        return self.backends[0].model_type
+
+    @property
+    def model_config_dict(self) -> Dict[str, Any]:
+        return self.backends[0].model_config_dict
+
+    @model_config_dict.setter
+    def model_config_dict(self, model_config_dict: Dict[str, Any]) -> None:
+        self.backends[0].model_config_dict = model_config_dict
+
+    @property
+    def token_counter(self) -> BaseTokenCounter:
+        return self.backends[0].token_counter
+
+    @property
+    def token_limit(self) -> int:
+        return min(backend.token_limit for backend in self.backends)
+
+    @property
+    def stream(self) -> bool:
+        return self.backends[0].stream
+
+    def check_model_config(self):
+        for backend in self.backends:
+            backend.check_model_config()
+
+    def latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        r"""The latency percentiles and health of every backend.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per backend, the number of recorded
+                latencies, their p50 and p95 in seconds, the number of
+                failures and whether it is cooling down.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                state.name: {
+                    "count": len(state.latencies),
+                    "p50": state.percentile(50),
+                    "p95": state.percentile(95),
+                    "failures": state.failures,
+                    "cooling_down": state.unhealthy_until > now,
+                }
+                for state in self._states
+            }
+
+    def _order(self) -> List[int]:
+        r"""The backends to try: healthy ones in order of preference, then
+        the cooling down ones as a last resort."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [
+                idx
+                for idx, state in enumerate(self._states)
+                if state.unhealthy_until <= now
+            ]
+            self.stats["requests"] += 1
+        return healthy + [
+            idx for idx in range(len(self.backends)) if idx not in healthy
+        ]
+
+    def _hedge_delay(self, idx: int, remaining: List[int]) -> Optional[float]:
+        if not self.hedge or not remaining:
+            return None
+        state = self._states[idx]
+        with self._lock:
+            if len(state.latencies) < self.min_samples:
+                return self.initial_hedge_delay
+            return state.percentile(self.hedge_percentile)
+
+    def _record_latency(self, idx: int, latency: float) -> None:
+        with self._lock:
+            self._states[idx].latencies.append(latency)
+
+    def _record_failure(self, idx: int, error: BaseException) -> None:
+        state = self._states[idx]
+        with self._lock:
+            state.failures += 1
+            state.unhealthy_until = time.monotonic() + self.cooldown
+        logger.warning(
+            f"Model backend {state.name} failed ({error!r}), "
+            f"skipping it for {self.cooldown:.0f}s."
+        )
+
+    def _record_hedge(self, idx: int) -> None:
+        with self._lock:
+            self.stats["hedged"] += 1
+        logger.info(
+            f"Hedging slow request with model backend {self._states[idx].name}."
+        )
+
+    def _record_result(self, idx: int, first: int, failed_over: bool) -> None:
+        with self._lock:
+            if failed_over:
+                self.stats["failovers"] += 1
+            elif idx != first:
+                self.stats["hedge_wins"] += 1
+
+    def _timed_run(
+        self,
+        idx: int,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]],
+        tools: Optional[List[Dict[str, Any]]],
+    ) -> Any:
+        start = time.monotonic()
+        response = self.backends[idx]._run(messages, response_format, tools)
+        self._record_latency(idx, time.monotonic() - start)
+        return response
+
+    async def _atimed_run(
+        self,
+        idx: int,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]],
+        tools: Optional[List[Dict[str, Any]]],
+    ) -> Any:
+        start = time.monotonic()
+        try:
+            response = await self.backends[idx]._arun(messages, response_format, tools)
+        except asyncio.CancelledError:
+            # The request lost a hedge: it took at least this long
+            self._record_latency(idx, time.monotonic() - start)
+            raise
+        self._record_latency(idx, time.monotonic() - start)
+        return response
+
+    def _run(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        remaining = self._order()
+        first = remaining[0]
+        pending: Dict[Any, int] = {}
+        last_error: Optional[BaseException] = None
+        failed_over = False
+
+        def submit(idx: int) -> None:
+            future = self._executor.submit(
+                self._timed_run, idx, messages, response_format, tools
+            )
+            pending[future] = idx
+
+        submit(remaining.pop(0))
+        while pending:
+            # Only hedge a request that runs alone
+            timeout = None
+            if len(pending) == 1:
+                timeout = self._hedge_delay(next(iter(pending.values())), remaining)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                idx = remaining.pop(0)
+                self._record_hedge(idx)
+                submit(idx)
+                continue
+            for future in done:
+                idx = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    self._record_failure(idx, e)
+                    last_error = e
+                    continue
+                self._record_result(idx, first, failed_over)
+                return response
+            if not pending and remaining:
+                failed_over = True
+                submit(remaining.pop(0))
+        assert last_error is not None
+        raise last_error
+
+    async def _arun(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        remaining = self._order()
+        first = remaining[0]
+        pending: Dict[asyncio.Task, int] = {}
+        last_error: Optional[BaseException] = None
+        failed_over = False
+
+        def submit(idx: int) -> None:
+            task = asyncio.ensure_future(
+                self._atimed_run(idx, messages, response_format, tools)
+            )
+            pending[task] = idx
+
+        submit(remaining.pop(0))
+        try:
+            while pending:
+                timeout = None
+                if len(pending) == 1:
+                    timeout = self._hedge_delay(next(iter(pending.values())), remaining)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    idx = remaining.pop(0)
+                    self._record_hedge(idx)
+                    submit(idx)
+                    continue
+                for task in done:
+                    idx = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        if not is_retryable(e):
+                            raise
+                        self._record_failure(idx, e)
+                        last_error = e
+                        continue
+                    self._record_result(idx, first, failed_over)
+                    return response
+                if not pending and remaining:
+                    failed_over = True
+                    submit(remaining.pop(0))
+        finally:
+            # The losing request of a hedge is no longer needed
+            for task in pending:
+                task.cancel()
+        assert last_error is not None
+        raise last_error
@@ -0,0 +1,205 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type
+
+from camel.logger import get_logger
+from camel.toolkits import BaseToolkit, FunctionTool
+
+logger = get_logger(__name__)
+
+
+class LazyToolkit:
+    r"""Defers the construction of a toolkit until one of its tools is
+    called for the first time.
+
+    The tool schemas are read from the methods of the toolkit class without
+    running its constructor, so the agent sees the tools right away while
+    launching a browser or loading heavy dependencies only happens for the
+    toolkits a task actually uses. Toolkits whose ``get_tools`` needs a
+    constructed instance are built eagerly, with a log message.
+
+    Args:
+        toolkit_cls (Type[BaseToolkit]): The toolkit class.
+        *args: Positional arguments of the toolkit constructor.
+        **kwargs: Keyword arguments of the toolkit constructor.
+
+    Example:
+        >>> browser = LazyToolkit(BrowserToolkit, headless=True)
+        >>> search = LazyToolkit(SearchToolkit)
+        >>> tools = [*browser.get_tools(), search.get_tool("search_wiki")]
+    """
+
+    def __init__(self, toolkit_cls: Type[BaseToolkit], *args: Any, **kwargs: Any):
+        self.toolkit_cls = toolkit_cls
+        self.name = toolkit_cls.__name__
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._instance: Optional[BaseToolkit] = None
+        self._tools: Dict[str, FunctionTool] = {}
+        self._shell_instance: Optional[BaseToolkit] = None
+        self.init_time = 0.0
+
+    @property
+    def instantiated(self) -> bool:
+        return self._instance is not None
+
+    @property
+    def instance(self) -> BaseToolkit:
+        r"""The toolkit, constructed on first access."""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    instance = self.toolkit_cls(*self._args, **self._kwargs)
+                    self._tools = {
+                        tool.get_function_name(): tool for tool in instance.get_tools()
+                    }
+                    self.init_time = time.perf_counter() - start
+                    self._instance = instance
+                    logger.info(f"Instantiated {self.name} in {self.init_time:.2f}s.")
+        return self._instance
+
+    def get_tools(self) -> List[FunctionTool]:
+        r"""The tools of the toolkit, as returned by its ``get_tools``.
+
+        Returns:
+            List[FunctionTool]: Lazy proxies of the tools.
+        """
+        if self._instance is not None:
+            return list(self._instance.get_tools())
+        try:
+            schema_tools = self.toolkit_cls.get_tools(self._shell())
+        except Exception as e:
+            logger.info(
+                f"Cannot list the tools of {self.name} without "
+                f"constructing it ({e}), constructing it now."
+            )
+            return list(self.instance.get_tools())
+        return [LazyFunctionTool(self, tool) for tool in schema_tools]
+
+    def get_tool(self, name: str) -> FunctionTool:
+        r"""A single tool of the toolkit, e.g. one search engine of
+        :obj:`SearchToolkit`.
+
+        Args:
+            name (str): The name of the method.
+
+        Returns:
+            FunctionTool: A lazy proxy of the tool.
+        """
+        return LazyFunctionTool(self, FunctionTool(getattr(self._shell(), name)))
+
+    def _shell(self) -> BaseToolkit:
+        r"""An instance of the toolkit class whose constructor did not run,
+        only used to read the tool schemas from its bound methods."""
+        if self._shell_instance is None:
+            # Destructors of toolkits expect the attributes set by __init__
+            shell_cls = type(
+                self.toolkit_cls.__name__,
+                (self.toolkit_cls,),
+                {"__del__": lambda self: None},
+            )
+            self._shell_instance = shell_cls.__new__(shell_cls)
+        return self._shell_instance
+
+    def resolve(self, name: str) -> FunctionTool:
+        r"""The real tool of the given method, constructing the toolkit if
+        needed."""
+        instance = self.instance
+        tool = self._tools.get(name)
+        if tool is None:
+            tool = FunctionTool(getattr(instance, name))
+            self._tools[name] = tool
+        return tool
+
+
+class LazyFunctionTool(FunctionTool):
+    r"""A :obj:`FunctionTool` with the schema of a tool of a
+    :obj:`LazyToolkit`, which constructs the toolkit when it is called.
+
+    Args:
+        toolkit (LazyToolkit): The toolkit the tool belongs to.
+        schema_tool (FunctionTool): A tool of an unconstructed toolkit
+            instance, only used for its schema.
+    """
+
+    def __init__(self, toolkit: LazyToolkit, schema_tool: FunctionTool):
+        super().__init__(
+            schema_tool.func,
+            openai_tool_schema=schema_tool.get_openai_tool_schema(),
+        )
+        self.toolkit = toolkit
+        self._method_name = schema_tool.func.__name__
+        self._tool: Optional[FunctionTool] = None
+
+    def _resolve(self) -> FunctionTool:
+        if self._tool is None:
+            self._tool = self.toolkit.resolve(self._method_name)
+            # Code inspecting `func` sees the real method from now on
+            self.func = self._tool.func
+        return self._tool
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    async def async_call(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._resolve().async_call(*args, **kwargs)
+
+
+def toolkit_report(tools: List[FunctionTool]) -> Dict[str, Dict[str, Any]]:
+    r"""Report which toolkits behind a list of tools are constructed.
+
+    Args:
+        tools (List[FunctionTool]): The tools of an agent.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Per toolkit (or plain function), whether it
+            is ``instantiated``, whether it is ``lazy``, its ``init_time`` in
+            seconds if known and the names of its ``tools``.
+    """
+    report: Dict[str, Dict[str, Any]] = {}
+    for tool in tools:
+        if isinstance(tool, LazyFunctionTool):
+            name = tool.toolkit.name
+            entry = report.setdefault(
+                name,
+                {"instantiated": False, "lazy": True, "init_time": 0.0, "tools": []},
+            )
+            entry["instantiated"] = tool.toolkit.instantiated
+            entry["init_time"] = tool.toolkit.init_time
+        else:
+            owner = getattr(tool.func, "__self__", None)
+            name = type(owner).__name__ if owner is not None else "functions"
+            entry = report.setdefault(
+                name,
+                {"instantiated": True, "lazy": False, "init_time": None, "tools": []},
+            )
+        entry["tools"].append(tool.get_function_name())
+    return report
+
+
+def log_toolkit_report(tools: List[FunctionTool]) -> None:
+    r"""Log which toolkits behind a list of tools are constructed and which
+    are still deferred."""
+    report = toolkit_report(tools)
+    instantiated = [name for name, entry in report.items() if entry["instantiated"]]
+    deferred = [name for name, entry in report.items() if not entry["instantiated"]]
+    logger.info(
+        f"Toolkits instantiated: {', '.join(instantiated) or 'none'}; "
+        f"deferred until first use: {', '.join(deferred) or 'none'}."
+    )
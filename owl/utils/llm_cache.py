@@ -0,0 +1,258 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Type
+
+from camel.logger import get_logger
+from camel.messages import OpenAIMessage
+from camel.models import BaseModelBackend
+from camel.types import ChatCompletion
+from camel.utils import BaseTokenCounter
+from pydantic import BaseModel
+
+logger = get_logger(__name__)
+
+RECORD_REPLAY_MODES = ("record", "replay", "off")
+
+
+class ReplayMissError(RuntimeError):
+    r"""Raised in replay mode when a request has no recorded response."""
+
+
+class LLMResponseStore:
+    r"""A local store of model responses keyed on the canonical request.
+
+    Responses are kept as zlib-compressed JSON in a single SQLite file, which
+    can be shared by all models of a run and copied to another machine to
+    replay the run there.
+
+    Args:
+        path (str, optional): The path of the store file.
+            (default: :obj:`"tmp/llm_cache/responses.sqlite3"`)
+    """
+
+    def __init__(self, path: str = "tmp/llm_cache/responses.sqlite3"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response BLOB, "
+                "created_at REAL)"
+            )
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+
+    @staticmethod
+    def make_key(
+        model: str,
+        model_config_dict: Dict[str, Any],
+        messages: List[OpenAIMessage],
+        tools: Optional[List[Dict[str, Any]]],
+        response_format: Optional[Type[BaseModel]],
+    ) -> str:
+        r"""The key of a request: a hash of the canonical JSON of the model,
+        its configuration, the messages, the tool schemas and the response
+        format."""
+        # The tools of the request are passed separately
+        config = {k: v for k, v in model_config_dict.items() if k != "tools"}
+        canonical = json.dumps(
+            {
+                "model": model,
+                "config": config,
+                "messages": messages,
+                "tools": tools,
+                "response_format": (
+                    response_format.model_json_schema() if response_format else None
+                ),
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[ChatCompletion]:
+        r"""Return the recorded response of the request, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self.stats["hits" if row else "misses"] += 1
+        if row is None:
+            return None
+        return ChatCompletion.model_validate(json.loads(zlib.decompress(row[0])))
+
+    def put(self, key: str, model: str, response: ChatCompletion) -> None:
+        r"""Record the response of a request."""
+        blob = zlib.compress(response.model_dump_json().encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, model, blob, time.time()),
+            )
+            self.stats["recorded"] += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RecordReplayModel(BaseModelBackend):
+    r"""A model backend that records the responses of another backend and
+    replays them for identical requests.
+
+    With ``temperature=0`` a rerun sends the same requests as the recorded
+    run, so it is answered from the store without network access or cost.
+    In ``"replay"`` mode a request without a recorded response raises
+    :obj:`ReplayMissError` instead of calling the model, which makes a run
+    fully offline and deterministic. Streaming responses are passed through
+    without recording.
+
+    Args:
+        backend (BaseModelBackend): The model backend to record.
+        store (LLMResponseStore): The store of the responses, usually shared
+            by all models of a run.
+        mode (str, optional): ``"record"`` to replay recorded responses and
+            record new ones, ``"replay"`` to only replay, or ``"off"`` to
+            always call the model. (default: :obj:`"record"`)
+
+    Example:
+        >>> store = LLMResponseStore("tmp/llm_cache/gaia.sqlite3")
+        >>> model = RecordReplayModel(ModelFactory.create(...), store)
+        >>> assistant_agent_kwargs = {"model": model, "tools": tools}
+    """
+
+    def __init__(
+        self,
+        backend: BaseModelBackend,
+        store: LLMResponseStore,
+        mode: str = "record",
+    ):
+        if mode not in RECORD_REPLAY_MODES:
+            raise ValueError(
+                f"Unknown record/replay mode {mode!r}, "
+                f"expected one of {RECORD_REPLAY_MODES}."
+            )
+        # The configuration and the token counter stay those of the backend
+        self.backend = backend
+        self.store = store
+        self.mode = mode
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    @property
+    def model_type(self) -> Any:
+        return self.backend.model_type
+
+    @property
+    def model_config_dict(self) -> Dict[str, Any]:
+        return self.backend.model_config_dict
+
+    @model_config_dict.setter
+    def model_config_dict(self, model_config_dict: Dict[str, Any]) -> None:
+        self.backend.model_config_dict = model_config_dict
+
+    @property
+    def token_counter(self) -> BaseTokenCounter:
+        return self.backend.token_counter
+
+    @property
+    def token_limit(self) -> int:
+        return self.backend.token_limit
+
+    @property
+    def stream(self) -> bool:
+        return self.backend.stream
+
+    def check_model_config(self):
+        self.backend.check_model_config()
+
+    def preprocess_messages(self, messages: List[OpenAIMessage]) -> List[OpenAIMessage]:
+        return self.backend.preprocess_messages(messages)
+
+    def _key(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]],
+        tools: Optional[List[Dict[str, Any]]],
+    ) -> Optional[str]:
+        if self.mode == "off" or self.stream:
+            return None
+        return self.store.make_key(
+            str(self.model_type),
+            self.model_config_dict,
+            messages,
+            tools,
+            response_format,
+        )
+
+    def _replay(self, key: Optional[str]) -> Optional[ChatCompletion]:
+        if key is None:
+            return None
+        response = self.store.get(key)
+        if response is None and self.mode == "replay":
+            raise ReplayMissError(
+                f"No recorded response of {self.model_type} for request "
+                f"{key[:12]} in {self.store.path}."
+            )
+        return response
+
+    def _record(self, key: Optional[str], response: Any) -> None:
+        # Parsed completions carry a Python object that JSON cannot restore
+        if key is not None and type(response) is ChatCompletion:
+            self.store.put(key, str(self.model_type), response)
+
+    def _run(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        key = self._key(messages, response_format, tools)
+        response = self._replay(key)
+        if response is None:
+            response = self.backend._run(messages, response_format, tools)
+            self._record(key, response)
+        return response
+
+    async def _arun(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        key = self._key(messages, response_format, tools)
+        response = self._replay(key)
+        if response is None:
+            response = await self.backend._arun(messages, response_format, tools)
+            self._record(key, response)
+        return response
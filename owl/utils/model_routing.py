@@ -0,0 +1,248 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from camel.logger import get_logger
+from camel.messages import OpenAIMessage
+from camel.models import BaseModelBackend
+from camel.utils import BaseTokenCounter
+from pydantic import BaseModel
+
+from .enhanced_role_playing import TASK_DONE_MARKERS
+
+logger = get_logger(__name__)
+
+CHEAP = "cheap"
+STRONG = "strong"
+
+
+@dataclass
+class RoutingRequest:
+    r"""What a routing policy knows about a model request.
+
+    Args:
+        role (str): The role of the agent sending the request, ``"user"`` or
+            ``"assistant"``.
+        messages (List[OpenAIMessage]): The messages of the request.
+        tools (List[Dict[str, Any]], optional): The tool schemas of the
+            request.
+    """
+
+    role: str
+    messages: List[OpenAIMessage]
+    tools: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def turn_messages(self) -> List[OpenAIMessage]:
+        r"""The messages of the current turn: the last message of the other
+        agent and the tool calls made since."""
+        for idx in range(len(self.messages) - 1, -1, -1):
+            if self.messages[idx].get("role") == "user":
+                return self.messages[idx:]
+        return []
+
+    @property
+    def instruction(self) -> str:
+        r"""The last message of the other agent."""
+        turn = self.turn_messages
+        content = turn[0].get("content") if turn else None
+        return content if isinstance(content, str) else str(content or "")
+
+    @property
+    def tool_results(self) -> List[str]:
+        r"""The results of the tool calls of the current turn."""
+        return [
+            str(message.get("content"))
+            for message in self.turn_messages
+            if message.get("role") == "tool"
+        ]
+
+
+@dataclass
+class RoutingDecision:
+    r"""The backend chosen for a request and why.
+
+    Args:
+        tier (str): ``"cheap"`` or ``"strong"``.
+        reason (str): A short explanation, logged with the decision.
+    """
+
+    tier: str
+    reason: str
+
+
+RoutingPolicy = Callable[[RoutingRequest], RoutingDecision]
+
+
+class DefaultRoutingPolicy:
+    r"""Sends instruction turns of the user agent and plain assistant turns
+    to the cheap model, and escalates the assistant to the strong model for
+    the final answer, after a failed tool call, after many tool calls in one
+    turn, and for long instructions.
+
+    Args:
+        max_cheap_tool_calls (int, optional): The number of tool calls in one
+            turn after which the turn counts as long reasoning.
+            (default: :obj:`4`)
+        max_cheap_instruction_chars (int, optional): The length of an
+            instruction above which it goes to the strong model.
+            (default: :obj:`2000`)
+        user_tier (str, optional): The tier of the user agent's turns.
+            (default: :obj:`"cheap"`)
+    """
+
+    def __init__(
+        self,
+        max_cheap_tool_calls: int = 4,
+        max_cheap_instruction_chars: int = 2000,
+        user_tier: str = CHEAP,
+    ):
+        self.max_cheap_tool_calls = max_cheap_tool_calls
+        self.max_cheap_instruction_chars = max_cheap_instruction_chars
+        self.user_tier = user_tier
+
+    @staticmethod
+    def is_tool_failure(result: str) -> bool:
+        r"""Whether a tool result reports an error."""
+        head = result.lstrip()[:200].lower()
+        return head.startswith(
+            ("{'error'", '{"error"', "error", "failed", "(false,")
+        ) or ("error executing" in head or "traceback (most recent call" in head)
+
+    def __call__(self, request: RoutingRequest) -> RoutingDecision:
+        if request.role == "user":
+            return RoutingDecision(self.user_tier, "user instruction")
+        instruction = request.instruction
+        if any(marker in instruction for marker in TASK_DONE_MARKERS):
+            return RoutingDecision(STRONG, "final answer")
+        tool_results = request.tool_results
+        if any(self.is_tool_failure(result) for result in tool_results):
+            return RoutingDecision(STRONG, "tool failure")
+        if len(tool_results) >= self.max_cheap_tool_calls:
+            return RoutingDecision(STRONG, f"{len(tool_results)} tool calls")
+        if len(instruction) > self.max_cheap_instruction_chars:
+            return RoutingDecision(STRONG, "long instruction")
+        return RoutingDecision(CHEAP, "easy turn")
+
+
+class RoutedModel(BaseModelBackend):
+    r"""A model backend that picks a cheap or a strong backend for every
+    request of an agent.
+
+    Most rounds of a society are routine: the user agent breaks the task
+    into instructions and the assistant calls a tool. These go to the cheap
+    backend, while the policy escalates the requests that need a stronger
+    model. The memory of the agent is sized for the smaller context window of
+    the two backends.
+
+    Args:
+        cheap (BaseModelBackend): The cheap and fast backend.
+        strong (BaseModelBackend): The strong backend.
+        role (str, optional): The role of the agent using the model,
+            ``"user"`` or ``"assistant"``. (default: :obj:`"assistant"`)
+        policy (RoutingPolicy, optional): Chooses the backend of a request.
+            (default: :obj:`DefaultRoutingPolicy()`)
+
+    Example:
+        >>> user_agent_kwargs = {
+        ...     "model": RoutedModel(gpt_4o_mini, gpt_4o, role="user")
+        ... }
+        >>> assistant_agent_kwargs = {
+        ...     "model": RoutedModel(gpt_4o_mini, gpt_4o), "tools": tools
+        ... }
+    """
+
+    def __init__(
+        self,
+        cheap: BaseModelBackend,
+        strong: BaseModelBackend,
+        role: str = "assistant",
+        policy: Optional[RoutingPolicy] = None,
+    ):
+        self.backends = {CHEAP: cheap, STRONG: strong}
+        self.role = role
+        self.policy = policy or DefaultRoutingPolicy()
+        self._lock = threading.Lock()
+        self.stats = {CHEAP: 0, STRONG: 0}
+        self.last_decision: Optional[RoutingDecision] = None
+
+    @property
+    def model_type(self) -> Any:
+        return self.backends[STRONG].model_type
+
+    @property
+    def model_config_dict(self) -> Dict[str, Any]:
+        return self.backends[STRONG].model_config_dict
+
+    @model_config_dict.setter
+    def model_config_dict(self, model_config_dict: Dict[str, Any]) -> None:
+        self.backends[STRONG].model_config_dict = model_config_dict
+
+    @property
+    def token_counter(self) -> BaseTokenCounter:
+        return self.backends[STRONG].token_counter
+
+    @property
+    def token_limit(self) -> int:
+        return min(backend.token_limit for backend in self.backends.values())
+
+    @property
+    def stream(self) -> bool:
+        return self.backends[STRONG].stream
+
+    def check_model_config(self):
+        for backend in self.backends.values():
+            backend.check_model_config()
+
+    def route(
+        self,
+        messages: List[OpenAIMessage],
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> BaseModelBackend:
+        r"""Choose and log the backend of a request.
+
+        Returns:
+            BaseModelBackend: The backend to send the request to.
+        """
+        decision = self.policy(RoutingRequest(self.role, messages, tools))
+        if decision.tier not in self.backends:
+            raise ValueError(f"Routing policy returned unknown tier {decision.tier!r}.")
+        backend = self.backends[decision.tier]
+        with self._lock:
+            self.stats[decision.tier] += 1
+            self.last_decision = decision
+        logger.info(
+            f"Routing {self.role} request to the {decision.tier} model "
+            f"{backend.model_type} ({decision.reason})."
+        )
+        return backend
+
+    def _run(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        return self.route(messages, tools)._run(messages, response_format, tools)
+
+    async def _arun(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        return await self.route(messages, tools)._arun(messages, response_format, tools)
@@ -0,0 +1,402 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple, Type
+
+from camel.agents import ChatAgent
+from camel.logger import get_logger
+from camel.messages import OpenAIMessage
+from camel.models import BaseModelBackend
+from camel.societies import RolePlaying
+from camel.utils import BaseTokenCounter
+from pydantic import BaseModel
+
+from .enhanced_role_playing import TASK_DONE_MARKERS
+
+logger = get_logger(__name__)
+
+# Priority of the requests of a final answer turn, which finish a society
+FINAL_ANSWER_PRIORITY = 10
+
+_MAX_POLL_INTERVAL = 1.0
+
+
+class RateLimiter:
+    r"""A token bucket scheduler for the requests-per-minute and
+    tokens-per-minute limits of a model provider.
+
+    Callers block in :meth:`acquire` (or await :meth:`aacquire`) until both
+    buckets hold enough capacity, so concurrent societies sharing a key send
+    requests at the highest rate the provider accepts instead of running
+    into 429 errors and retries. Waiting requests are served by priority,
+    then in arrival order.
+
+    With a ``state_file`` the buckets live in a file guarded by an exclusive
+    lock, so that several processes on a machine share the same limits.
+
+    Args:
+        requests_per_minute (float, optional): The request limit.
+            (default: :obj:`None`)
+        tokens_per_minute (float, optional): The token limit, counting the
+            prompt and the completion tokens. (default: :obj:`None`)
+        state_file (str, optional): A file holding the buckets, shared by all
+            processes using it. (default: :obj:`None`)
+
+    Example:
+        >>> limiter = get_rate_limiter(
+        ...     "openai", requests_per_minute=500, tokens_per_minute=300_000
+        ... )
+        >>> society = OwlRolePlaying(..., rate_limiter=limiter)
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        state_file: Optional[str] = None,
+    ):
+        self.limits = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.state_file = state_file
+        if state_file and os.path.dirname(state_file):
+            os.makedirs(os.path.dirname(state_file), exist_ok=True)
+        self._levels = {name: limit or 0.0 for name, limit in self.limits.items()}
+        self._updated = time.time()
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._delays: Deque[float] = deque(maxlen=1000)
+        self.stats = {"requests": 0, "queued": 0, "total_delay": 0.0, "max_delay": 0.0}
+
+    @property
+    def tokens_per_minute(self) -> Optional[float]:
+        return self.limits["tokens"]
+
+    @contextmanager
+    def _buckets(self) -> Iterator[Dict[str, float]]:
+        r"""The bucket levels, refilled up to now. Changes are saved."""
+        if not self.state_file:
+            self._refill(self._levels, time.time() - self._updated)
+            self._updated = time.time()
+            yield self._levels
+            return
+
+        import fcntl
+
+        with open(self.state_file, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                state = json.loads(content) if content else {}
+                now = time.time()
+                levels = state.get("levels", dict(self._levels))
+                self._refill(levels, now - state.get("updated", now))
+                yield levels
+                f.seek(0)
+                f.truncate()
+                json.dump({"levels": levels, "updated": now}, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refill(self, levels: Dict[str, float], elapsed: float) -> None:
+        for name, limit in self.limits.items():
+            if limit:
+                levels[name] = min(limit, levels[name] + elapsed * limit / 60)
+
+    def _try_take(self, tokens: int) -> float:
+        r"""Take the capacity of a request if available.
+
+        Returns:
+            float: 0 if the capacity was taken, else the seconds until it is
+                expected to be available.
+        """
+        needed = {"requests": 1, "tokens": tokens}
+        with self._buckets() as levels:
+            wait = 0.0
+            for name, limit in self.limits.items():
+                if not limit:
+                    continue
+                # A request larger than the bucket waits for a full bucket
+                need = min(needed[name], limit)
+                if levels[name] < need:
+                    wait = max(wait, (need - levels[name]) * 60 / limit)
+            if wait > 0:
+                return wait
+            for name, limit in self.limits.items():
+                if limit:
+                    levels[name] -= needed[name]
+            return 0.0
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        ticket = (-priority, next(self._seq))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: Tuple[int, int]) -> None:
+        self._waiters.remove(ticket)
+        heapq.heapify(self._waiters)
+        self._cond.notify_all()
+
+    def _record_delay(self, delay: float) -> None:
+        with self._cond:
+            self._delays.append(delay)
+            self.stats["requests"] += 1
+            self.stats["total_delay"] += delay
+            self.stats["max_delay"] = max(self.stats["max_delay"], delay)
+            if delay > 0.01:
+                self.stats["queued"] += 1
+        if delay > 1:
+            logger.info(f"Model request waited {delay:.1f}s for the rate limit.")
+
+    def acquire(self, tokens: int = 0, priority: int = 0) -> float:
+        r"""Block until a request of the given size may be sent.
+
+        Args:
+            tokens (int, optional): The estimated tokens of the request.
+                (default: :obj:`0`)
+            priority (int, optional): Requests with a higher priority are
+                served first. (default: :obj:`0`)
+
+        Returns:
+            float: The queueing delay in seconds.
+        """
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    wait = _MAX_POLL_INTERVAL
+                    if self._waiters[0] == ticket:
+                        wait = self._try_take(tokens)
+                        if wait <= 0:
+                            break
+                    self._cond.wait(timeout=min(wait, _MAX_POLL_INTERVAL))
+            finally:
+                self._dequeue(ticket)
+        delay = time.monotonic() - start
+        self._record_delay(delay)
+        return delay
+
+    async def aacquire(self, tokens: int = 0, priority: int = 0) -> float:
+        r"""Asynchronous version of :meth:`acquire`."""
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = 0.05
+                with self._cond:
+                    if self._waiters[0] == ticket:
+                        wait = self._try_take(tokens)
+                        if wait <= 0:
+                            break
+                await asyncio.sleep(min(wait, _MAX_POLL_INTERVAL))
+        finally:
+            with self._cond:
+                self._dequeue(ticket)
+        delay = time.monotonic() - start
+        self._record_delay(delay)
+        return delay
+
+    def correct(self, estimated_tokens: int, actual_tokens: int) -> None:
+        r"""Correct the token bucket once the actual usage of a request is
+        known. The bucket may go below zero, delaying the next requests."""
+        if not self.limits["tokens"] or actual_tokens == estimated_tokens:
+            return
+        with self._cond, self._buckets() as levels:
+            levels["tokens"] += estimated_tokens - actual_tokens
+
+    def metrics(self) -> Dict[str, Any]:
+        r"""The queueing delays of the requests so far.
+
+        Returns:
+            Dict[str, Any]: The number of requests, how many of them were
+                queued, and the mean, p95 and maximum delay in seconds.
+        """
+        with self._cond:
+            delays = sorted(self._delays)
+            requests = self.stats["requests"]
+            return {
+                "requests": requests,
+                "queued": self.stats["queued"],
+                "mean_delay": self.stats["total_delay"] / requests if requests else 0.0,
+                "p95_delay": (
+                    delays[min(len(delays) - 1, int(len(delays) * 0.95))]
+                    if delays
+                    else 0.0
+                ),
+                "max_delay": self.stats["max_delay"],
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key: str = "default", **kwargs) -> RateLimiter:
+    r"""The process-wide rate limiter of a provider key, created with the
+    given arguments on first use.
+
+    Args:
+        key (str, optional): The name of the limited resource, e.g. the
+            provider or its API key. (default: :obj:`"default"`)
+        **kwargs: The arguments of :obj:`RateLimiter`.
+
+    Returns:
+        RateLimiter: The rate limiter shared by all callers of the key.
+    """
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(**kwargs)
+        return _limiters[key]
+
+
+class RateLimitedModel(BaseModelBackend):
+    r"""A model backend waiting for a :obj:`RateLimiter` before every
+    request. Final answer turns of the assistant agent get a higher
+    priority, so that societies close to the end finish first.
+
+    Args:
+        backend (BaseModelBackend): The rate limited backend.
+        limiter (RateLimiter): The rate limiter.
+        role (str, optional): The role of the agent using the model,
+            ``"user"`` or ``"assistant"``. (default: :obj:`"assistant"`)
+        expected_completion_tokens (int, optional): The completion tokens
+            reserved for a request whose configuration has no
+            ``max_tokens``. (default: :obj:`1024`)
+    """
+
+    def __init__(
+        self,
+        backend: BaseModelBackend,
+        limiter: RateLimiter,
+        role: str = "assistant",
+        expected_completion_tokens: int = 1024,
+    ):
+        self.backend = backend
+        self.limiter = limiter
+        self.role = role
+        self.expected_completion_tokens = expected_completion_tokens
+
+    @property
+    def model_type(self) -> Any:
+        return self.backend.model_type
+
+    @property
+    def model_config_dict(self) -> Dict[str, Any]:
+        return self.backend.model_config_dict
+
+    @model_config_dict.setter
+    def model_config_dict(self, model_config_dict: Dict[str, Any]) -> None:
+        self.backend.model_config_dict = model_config_dict
+
+    @property
+    def token_counter(self) -> BaseTokenCounter:
+        return self.backend.token_counter
+
+    @property
+    def token_limit(self) -> int:
+        return self.backend.token_limit
+
+    @property
+    def stream(self) -> bool:
+        return self.backend.stream
+
+    def check_model_config(self):
+        self.backend.check_model_config()
+
+    def preprocess_messages(self, messages: List[OpenAIMessage]) -> List[OpenAIMessage]:
+        return self.backend.preprocess_messages(messages)
+
+    def _request(self, messages: List[OpenAIMessage]) -> Tuple[int, int]:
+        r"""The estimated tokens and the priority of a request."""
+        tokens = 0
+        if self.limiter.tokens_per_minute:
+            tokens = self.token_counter.count_tokens_from_messages(messages) + (
+                self.model_config_dict.get("max_tokens")
+                or self.expected_completion_tokens
+            )
+        priority = 0
+        if self.role == "assistant":
+            last_user = next(
+                (m for m in reversed(messages) if m.get("role") == "user"), {}
+            )
+            content = str(last_user.get("content") or "")
+            if any(marker in content for marker in TASK_DONE_MARKERS):
+                priority = FINAL_ANSWER_PRIORITY
+        return tokens, priority
+
+    def _correct(self, tokens: int, response: Any) -> None:
+        usage = getattr(response, "usage", None)
+        if tokens and usage is not None:
+            self.limiter.correct(tokens, usage.total_tokens)
+
+    def _run(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        tokens, priority = self._request(messages)
+        self.limiter.acquire(tokens, priority)
+        response = self.backend._run(messages, response_format, tools)
+        self._correct(tokens, response)
+        return response
+
+    async def _arun(
+        self,
+        messages: List[OpenAIMessage],
+        response_format: Optional[Type[BaseModel]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> Any:
+        tokens, priority = self._request(messages)
+        await self.limiter.aacquire(tokens, priority)
+        response = await self.backend._arun(messages, response_format, tools)
+        self._correct(tokens, response)
+        return response
+
+
+def rate_limit_agent(agent: ChatAgent, limiter: RateLimiter, role: str) -> None:
+    r"""Route all model calls of an agent through a rate limiter."""
+    manager = agent.model_backend
+    manager.models = [
+        model
+        if isinstance(model, RateLimitedModel)
+        else RateLimitedModel(model, limiter, role=role)
+        for model in manager.models
+    ]
+    manager.models_cycle = itertools.cycle(manager.models)
+    manager.current_model = manager.models[0]
+
+
+def rate_limit_society(society: RolePlaying, limiter: RateLimiter) -> RolePlaying:
+    r"""Route all model calls of the agents of a society through a rate
+    limiter, e.g. for societies not created by :obj:`OwlRolePlaying`.
+
+    Returns:
+        RolePlaying: The society.
+    """
+    rate_limit_agent(society.user_agent, limiter, "user")
+    rate_limit_agent(society.assistant_agent, limiter, "assistant")
+    return society
@@ -0,0 +1,208 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import io
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from camel.logger import get_logger
+
+logger = get_logger(__name__)
+
+ZSTD_SUFFIX = ".zst"
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "Compressed result files need the `zstandard` package, "
+            "install it with `pip install zstandard`."
+        ) from e
+    return zstandard
+
+
+def iter_result_file(
+    path: str, on_damage: Optional[Callable[[], None]] = None
+) -> Iterator[Dict[str, Any]]:
+    r"""Stream the records of a result file.
+
+    Reads JSONL files, optionally zstd-compressed (``.jsonl.zst``), and the
+    legacy JSON list format. A record cut off by a crash at the end of a JSONL
+    file is skipped with a warning.
+
+    Args:
+        path (str): The path of the result file.
+        on_damage (Callable[[], None], optional): Called when a damaged
+            record is skipped. (default: :obj:`None`)
+
+    Yields:
+        Dict[str, Any]: The records, in file order.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    with open(path, "rb") as raw:
+        if path.endswith(ZSTD_SUFFIX):
+            zstandard = _zstandard()
+            stream = zstandard.ZstdDecompressor().stream_reader(
+                raw, read_across_frames=True
+            )
+        else:
+            stream = raw
+        # A character cut off by a crash fails the JSON decoding of its line
+        lines = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+        line_no = 0
+        try:
+            for line_no, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(
+                        f"Skipping incomplete record on line {line_no} of {path}."
+                    )
+                    if on_damage is not None:
+                        on_damage()
+        except Exception:
+            # A truncated compressed frame at the end of the file
+            if not path.endswith(ZSTD_SUFFIX):
+                raise
+            logger.warning(f"Skipping truncated data after line {line_no} of {path}.")
+            if on_damage is not None:
+                on_damage()
+
+
+class ResultStore:
+    r"""An append-only store of benchmark results with an index on the task
+    id.
+
+    Every result is appended to a JSONL file as a single line, flushed and
+    synced to disk, so a crash loses at most the result being written and
+    never the earlier ones. Files ending in ``.zst`` hold one zstd frame per
+    result. The latest result of a task wins when a task is stored twice.
+
+    Args:
+        path (str): The path of the JSONL file, e.g. ``results/run.jsonl`` or
+            ``results/run.jsonl.zst``.
+        fsync (bool, optional): Whether to sync every append to disk.
+            (default: :obj:`True`)
+
+    Example:
+        >>> store = ResultStore("results/gaia.jsonl")
+        >>> if "task-1" not in store:
+        ...     store.append({"task_id": "task-1", "score": True})
+        >>> store.export_json("results/gaia.json")
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.compressed = path.endswith(ZSTD_SUFFIX)
+        self._lock = threading.Lock()
+        self._results: List[Dict[str, Any]] = []
+        self._index: Dict[str, int] = {}
+        self._compressor = _zstandard().ZstdCompressor() if self.compressed else None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            damaged = []
+            for result in iter_result_file(path, lambda: damaged.append(True)):
+                self._add(result)
+            if damaged or not self._ends_cleanly():
+                # Appending after a partial record would damage the next one
+                self.compact()
+
+    def _ends_cleanly(self) -> bool:
+        if self.compressed or os.path.getsize(self.path) == 0:
+            return True
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @property
+    def results(self) -> List[Dict[str, Any]]:
+        r"""The latest result of every task, in the order the tasks were
+        first stored."""
+        return list(self._results)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._index
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        idx = self._index.get(task_id)
+        return None if idx is None else self._results[idx]
+
+    def _add(self, result: Dict[str, Any]) -> None:
+        idx = self._index.get(result["task_id"])
+        if idx is None:
+            self._index[result["task_id"]] = len(self._results)
+            self._results.append(result)
+        else:
+            self._results[idx] = result
+
+    def _encode(self, result: Dict[str, Any]) -> bytes:
+        data = (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        return data
+
+    def append(self, result: Dict[str, Any]) -> None:
+        r"""Store a result.
+
+        Args:
+            result (Dict[str, Any]): The result, with a ``task_id`` field.
+        """
+        data = self._encode(result)
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self._add(result)
+
+    def compact(self) -> None:
+        r"""Rewrite the file with only the latest result of every task. The
+        new file replaces the old one atomically."""
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                for result in self._results:
+                    f.write(self._encode(result))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def export_json(self, path: str) -> None:
+        r"""Write the results in the legacy format: a single indented JSON
+        list.
+
+        Args:
+            path (str): The path of the JSON file.
+        """
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._results, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, path)
@@ -0,0 +1,337 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import heapq
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from camel.logger import get_logger
+
+from .attachment_cache import attachment_kind
+from .result_store import iter_result_file
+
+logger = get_logger(__name__)
+
+# Rough durations of a society by GAIA level, used until results are known
+DEFAULT_LEVEL_SECONDS = {1: 180.0, 2: 360.0, 3: 720.0}
+DEFAULT_SECONDS = 360.0
+# Seconds per thousand tokens when no result has both a timing and tokens
+DEFAULT_SECONDS_PER_KTOKEN = 2.0
+
+
+def _task_level(task: Dict[str, Any]) -> Optional[int]:
+    level = task.get("level", task.get("Level"))
+    try:
+        return int(level)
+    except (TypeError, ValueError):
+        return None
+
+
+def _task_attachment(task: Dict[str, Any]) -> Optional[str]:
+    if "attachment" in task:
+        return task["attachment"]
+    file_name = task.get("file_name")
+    return attachment_kind(str(file_name)) if file_name else None
+
+
+def _result_tokens(result: Dict[str, Any]) -> Optional[float]:
+    token_info = result.get("token_info")
+    if not isinstance(token_info, dict):
+        return None
+    return float(
+        token_info.get("prompt_token_count", 0)
+        + token_info.get("completion_token_count", 0)
+    )
+
+
+class _Mean:
+    __slots__ = ("total", "count")
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+@dataclass
+class TaskEstimate:
+    r"""The predicted cost of a task.
+
+    Args:
+        seconds (float): The predicted duration.
+        tokens (float, optional): The predicted prompt and completion tokens.
+        source (str): What the prediction is based on, e.g. ``"task"`` for a
+            previous run of the same task or ``"level 3, image"``.
+    """
+
+    seconds: float
+    tokens: Optional[float]
+    source: str
+
+
+class DurationPredictor:
+    r"""Predicts the duration and tokens of benchmark tasks from the results
+    of previous runs.
+
+    A task that ran before is predicted from its own results. Other tasks are
+    predicted from the mean of the tasks of the same level and attachment
+    kind, then of the same level, falling back to
+    :obj:`DEFAULT_LEVEL_SECONDS`. Results without a timing, as written before
+    timings were recorded, are converted from their token counts. While a run
+    goes on, :meth:`observe` learns from the finished tasks and corrects the
+    predictions of each level by how far off the finished ones were.
+
+    Args:
+        results (Iterable[Dict[str, Any]], optional): Previous results with
+            ``task_id``, ``level``, ``token_info`` and, if known,
+            ``elapsed`` and ``attachment`` fields. (default: :obj:`None`)
+        level_seconds (Dict[int, float], optional): The durations of the
+            levels without any result. (default: :obj:`DEFAULT_LEVEL_SECONDS`)
+    """
+
+    def __init__(
+        self,
+        results: Optional[Iterable[Dict[str, Any]]] = None,
+        level_seconds: Optional[Dict[int, float]] = None,
+    ):
+        self.level_seconds = level_seconds or DEFAULT_LEVEL_SECONDS
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._groups: Dict[Tuple, Tuple[_Mean, _Mean]] = {}
+        self._rate = _Mean()
+        # Per level, actual and predicted seconds of the tasks of this run
+        self._corrections: Dict[Optional[int], Tuple[_Mean, _Mean]] = {}
+        if results is not None:
+            self.fit(results)
+
+    @classmethod
+    def from_result_files(cls, paths: Iterable[str], **kwargs) -> "DurationPredictor":
+        r"""Create a predictor from result files of previous runs.
+
+        Args:
+            paths (Iterable[str]): JSON, JSONL or JSONL.zst result files.
+            **kwargs: Passed to :class:`DurationPredictor`.
+
+        Returns:
+            DurationPredictor: The fitted predictor.
+        """
+        predictor = cls(**kwargs)
+        for path in paths:
+            try:
+                predictor.fit(iter_result_file(path))
+            except FileNotFoundError:
+                logger.warning(f"Result file {path} not found.")
+        return predictor
+
+    def fit(self, results: Iterable[Dict[str, Any]]) -> None:
+        r"""Learn from previous results.
+
+        Args:
+            results (Iterable[Dict[str, Any]]): The results.
+        """
+        with self._lock:
+            for result in results:
+                self._add(result)
+
+    def _add(self, result: Dict[str, Any]) -> None:
+        seconds = result.get("elapsed")
+        tokens = _result_tokens(result)
+        if seconds is None and tokens is None:
+            # Skipped tasks have neither
+            return
+        if seconds is not None and tokens:
+            self._rate.add(seconds / tokens)
+        if "task_id" in result:
+            self._tasks[result["task_id"]] = (seconds, tokens)
+        level = _task_level(result)
+        for key in ((level, _task_attachment(result)), (level,), ()):
+            time_mean, token_mean = self._groups.setdefault(key, (_Mean(), _Mean()))
+            if seconds is not None:
+                time_mean.add(seconds)
+            if tokens is not None:
+                token_mean.add(tokens)
+
+    def _seconds(self, seconds: Optional[float], tokens: Optional[float]):
+        if seconds is not None or tokens is None:
+            return seconds
+        rate = self._rate.value
+        if rate is None:
+            rate = DEFAULT_SECONDS_PER_KTOKEN / 1000
+        return tokens * rate
+
+    def _predict(self, task: Dict[str, Any]) -> TaskEstimate:
+        if task.get("task_id") in self._tasks:
+            seconds, tokens = self._tasks[task["task_id"]]
+            return TaskEstimate(self._seconds(seconds, tokens), tokens, "task")
+        level = _task_level(task)
+        attachment = _task_attachment(task)
+        for key, source in (
+            ((level, attachment), f"level {level}, {attachment or 'no'} attachment"),
+            ((level,), f"level {level}"),
+        ):
+            if key in self._groups:
+                time_mean, token_mean = self._groups[key]
+                seconds = self._seconds(time_mean.value, token_mean.value)
+                if seconds is not None:
+                    return TaskEstimate(seconds, token_mean.value, source)
+        if level in self.level_seconds:
+            return TaskEstimate(self.level_seconds[level], None, "default")
+        time_mean, token_mean = self._groups.get((), (_Mean(), _Mean()))
+        seconds = self._seconds(time_mean.value, token_mean.value)
+        return TaskEstimate(
+            seconds if seconds is not None else DEFAULT_SECONDS,
+            token_mean.value,
+            "default",
+        )
+
+    def predict(self, task: Dict[str, Any], corrected: bool = True) -> TaskEstimate:
+        r"""Predict the cost of a task.
+
+        Args:
+            task (Dict[str, Any]): The task, with ``task_id``, ``level`` (or
+                ``Level``) and ``file_name`` fields.
+            corrected (bool, optional): Whether to apply the corrections
+                learned from the finished tasks of this run.
+                (default: :obj:`True`)
+
+        Returns:
+            TaskEstimate: The prediction.
+        """
+        with self._lock:
+            estimate = self._predict(task)
+            if corrected and estimate.source != "task":
+                actual, predicted = self._corrections.get(
+                    _task_level(task), (None, None)
+                )
+                if actual is not None and predicted.total > 0:
+                    # Clamped, so that one outlier does not reorder everything
+                    factor = min(4.0, max(0.25, actual.total / predicted.total))
+                    estimate.seconds *= factor
+        return estimate
+
+    def observe(self, task: Dict[str, Any], result: Dict[str, Any]) -> None:
+        r"""Learn from a task finished in this run.
+
+        Args:
+            task (Dict[str, Any]): The task.
+            result (Dict[str, Any]): Its result, with an ``elapsed`` field.
+        """
+        if result.get("elapsed") is None:
+            return
+        predicted = self.predict(task, corrected=False)
+        if predicted.source == "task":
+            return
+        with self._lock:
+            actual_mean, predicted_mean = self._corrections.setdefault(
+                _task_level(task), (_Mean(), _Mean())
+            )
+            actual_mean.add(result["elapsed"])
+            predicted_mean.add(predicted.seconds)
+
+
+def simulate_makespan(durations: Iterable[float], workers: int) -> float:
+    r"""The makespan of running tasks in the given order, each on the first
+    worker to become idle.
+
+    Args:
+        durations (Iterable[float]): The durations of the tasks, in the order
+            they are started.
+        workers (int): The number of workers.
+
+    Returns:
+        float: The time at which the last task finishes.
+    """
+    loads = [0.0] * max(1, workers)
+    for duration in durations:
+        heapq.heappush(loads, heapq.heappop(loads) + duration)
+    return max(loads)
+
+
+class LPTScheduler:
+    r"""Chooses the next task of an idle worker, longest predicted duration
+    first.
+
+    Starting the long tasks first keeps a long level 3 task that would start
+    last from setting the makespan of the run. The choice is made each time a
+    worker goes idle, with the predictions corrected by the tasks finished so
+    far, so the order adapts when a level turns out slower than predicted.
+
+    Args:
+        predictor (DurationPredictor, optional): Predicts the durations.
+            (default: :obj:`DurationPredictor()`)
+
+    Example:
+        >>> scheduler = LPTScheduler(
+        ...     DurationPredictor.from_result_files(["results/previous.jsonl"])
+        ... )
+        >>> benchmark.run(..., build_resources=build, scheduler=scheduler)
+    """
+
+    def __init__(self, predictor: Optional[DurationPredictor] = None):
+        self.predictor = predictor or DurationPredictor()
+
+    def order(self, tasks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        r"""The tasks in longest predicted duration first order."""
+        return sorted(tasks, key=lambda task: -self.predictor.predict(task).seconds)
+
+    def select(self, pending: List[Dict[str, Any]]) -> int:
+        r"""The index of the pending task to start next.
+
+        Args:
+            pending (List[Dict[str, Any]]): The tasks not started yet.
+
+        Returns:
+            int: The index in :obj:`pending` of the longest task.
+        """
+        return max(
+            range(len(pending)),
+            key=lambda idx: self.predictor.predict(pending[idx]).seconds,
+        )
+
+    def observe(self, task: Dict[str, Any], result: Dict[str, Any]) -> None:
+        r"""Learn from a finished task."""
+        self.predictor.observe(task, result)
+
+    def plan(self, tasks: List[Dict[str, Any]], workers: int) -> Dict[str, Any]:
+        r"""Predict the makespan of a run.
+
+        Args:
+            tasks (List[Dict[str, Any]]): The tasks of the run.
+            workers (int): The number of tasks running at once.
+
+        Returns:
+            Dict[str, Any]: The predicted makespan in seconds with this
+                scheduler and with the tasks in their given order, the
+                predicted tokens and the predictions of the tasks.
+        """
+        estimates = {task["task_id"]: self.predictor.predict(task) for task in tasks}
+        seconds = [estimates[task["task_id"]].seconds for task in tasks]
+        return {
+            "predicted_makespan": simulate_makespan(
+                sorted(seconds, reverse=True), workers
+            ),
+            "predicted_makespan_in_order": simulate_makespan(seconds, workers),
+            "predicted_tokens": sum(
+                estimate.tokens or 0 for estimate in estimates.values()
+            ),
+            "estimates": estimates,
+        }
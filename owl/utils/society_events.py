@@ -0,0 +1,151 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Set, Type
+
+
+@dataclass(kw_only=True)
+class SocietyEvent:
+    r"""Base class of the events yielded while a society is running.
+
+    Args:
+        round_idx (int): The (0-based) round the event belongs to.
+        timestamp (float): Unix time at which the event was created.
+    """
+
+    event_type: ClassVar[str] = "event"
+
+    round_idx: int
+    timestamp: float = field(default_factory=time.time)
+
+    def as_dict(self) -> Dict[str, Any]:
+        r"""Convert the event to a JSON-friendly dict."""
+        data = asdict(self)
+        data["type"] = self.event_type
+        return data
+
+
+@dataclass(kw_only=True)
+class InstructionEvent(SocietyEvent):
+    r"""The user agent issued a new instruction."""
+
+    event_type: ClassVar[str] = "instruction"
+
+    instruction: str
+
+
+@dataclass(kw_only=True)
+class ToolCallStartedEvent(SocietyEvent):
+    r"""The assistant agent started to call a tool."""
+
+    event_type: ClassVar[str] = "tool_call_started"
+
+    tool_name: str
+    args: Dict[str, Any]
+
+
+@dataclass(kw_only=True)
+class ToolCallFinishedEvent(SocietyEvent):
+    r"""A tool call of the assistant agent returned (or raised)."""
+
+    event_type: ClassVar[str] = "tool_call_finished"
+
+    tool_name: str
+    args: Dict[str, Any]
+    result: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+@dataclass(kw_only=True)
+class SolutionEvent(SocietyEvent):
+    r"""The assistant agent answered the instruction of the round.
+
+    :obj:`instruction`, :obj:`solution` and :obj:`tool_calls` are exactly the
+    fields recorded in the ``chat_history`` returned by :func:`run_society`.
+    """
+
+    event_type: ClassVar[str] = "solution"
+
+    instruction: str
+    solution: str
+    tool_calls: List[dict] = field(default_factory=list)
+
+
+@dataclass(kw_only=True)
+class TokenUsageEvent(SocietyEvent):
+    r"""Token usage of the round, together with the running totals.
+
+    ``cached_prompt_tokens`` counts the prompt tokens the provider reported
+    as served from its prompt cache; they are included in ``prompt_tokens``.
+    """
+
+    event_type: ClassVar[str] = "token_usage"
+
+    prompt_tokens: int
+    completion_tokens: int
+    total_prompt_tokens: int
+    total_completion_tokens: int
+    cached_prompt_tokens: int = 0
+    total_cached_prompt_tokens: int = 0
+
+
+@dataclass(kw_only=True)
+class TerminationEvent(SocietyEvent):
+    r"""The society stopped. Always the last event of a stream.
+
+    Args:
+        reason (str): One of ``"task_done"``, ``"assistant_terminated"``,
+            ``"user_terminated"``, ``"round_limit"``, ``"soft_budget"`` (a
+            final answer was forced) or ``"hard_budget"``.
+        answer (str): The last response of the assistant agent.
+        chat_history (List[dict]): The full chat history of the run.
+        token_info (dict): The accumulated token counts of the run.
+    """
+
+    event_type: ClassVar[str] = "termination"
+
+    reason: str
+    answer: str
+    chat_history: List[dict]
+    token_info: dict
+
+
+class SocietyEventBus:
+    r"""Hands the events raised inside a society step over to the consumer
+    of the stream, stamping them with the current round.
+
+    Args:
+        on_event (Callable[[SocietyEvent], None]): Called for every published
+            event.
+    """
+
+    def __init__(self, on_event: Callable[[SocietyEvent], None]):
+        self.round_idx = 0
+        self._on_event = on_event
+        self._published: Set[str] = set()
+
+    def start_round(self, round_idx: int) -> None:
+        self.round_idx = round_idx
+        self._published.clear()
+
+    def has_published(self, event_cls: Type[SocietyEvent]) -> bool:
+        r"""Whether an event of the given type was published this round."""
+        return event_cls.event_type in self._published
+
+    def publish(self, event_cls: Type[SocietyEvent], **fields: Any) -> None:
+        self._published.add(event_cls.event_type)
+        self._on_event(event_cls(round_idx=self.round_idx, **fields))
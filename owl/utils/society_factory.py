@@ -0,0 +1,167 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from camel.logger import get_logger
+from camel.societies import RolePlaying
+
+from .enhanced_role_playing import OwlRolePlaying
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class SocietyResources:
+    r"""The expensive parts of a society that can be shared across tasks:
+    model backends (with their HTTP connection pools) and toolkits.
+
+    Args:
+        user_agent_kwargs (Dict[str, Any]): Arguments of the user agent,
+            typically ``{"model": ...}``.
+        assistant_agent_kwargs (Dict[str, Any]): Arguments of the assistant
+            agent, typically ``{"model": ..., "tools": [...]}``.
+        cleanup (Callable[[], None], optional): Releases the resources, e.g.
+            closes the browser. (default: :obj:`None`)
+    """
+
+    user_agent_kwargs: Dict[str, Any]
+    assistant_agent_kwargs: Dict[str, Any]
+    cleanup: Optional[Callable[[], None]] = None
+    build_time: float = field(default=0.0, init=False)
+
+
+class WarmSocietyFactory:
+    r"""Builds models and toolkits once and hands out a fresh society for
+    every task.
+
+    Each society gets new agents, i.e. an empty memory and the system
+    messages of its task, while the model backends and tools are reused, so
+    creating a society takes milliseconds instead of seconds.
+
+    Some toolkits are bound to the thread that created them, e.g. the
+    Playwright browser of :obj:`BrowserToolkit`. By default the resources
+    are therefore built once per thread and reused by all societies created
+    on that thread. A factory must not hand the same resources to two
+    societies running at the same time; with ``per_thread=True`` this holds
+    as long as each thread runs one society at a time.
+
+    Args:
+        build_resources (Callable[[], SocietyResources]): Builds the models
+            and toolkits.
+        society_cls (Type[RolePlaying], optional): The society class.
+            (default: :obj:`OwlRolePlaying`)
+        per_thread (bool, optional): Whether to build the resources once per
+            thread instead of once per factory. (default: :obj:`True`)
+        **society_kwargs: Further arguments of every society, e.g.
+            ``user_role_name``.
+
+    Example:
+        >>> society_factory = WarmSocietyFactory(build_resources)
+        >>> for question in questions:
+        ...     answer, chat_history, token_info = run_society(
+        ...         society_factory(question)
+        ...     )
+    """
+
+    def __init__(
+        self,
+        build_resources: Callable[[], SocietyResources],
+        society_cls: Type[RolePlaying] = OwlRolePlaying,
+        per_thread: bool = True,
+        **society_kwargs,
+    ):
+        self.build_resources = build_resources
+        self.society_cls = society_cls
+        self.per_thread = per_thread
+        self.society_kwargs = {
+            "user_role_name": "user",
+            "assistant_role_name": "assistant",
+            "with_task_specify": False,
+            **society_kwargs,
+        }
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shared: Optional[SocietyResources] = None
+        self._all_resources: List[SocietyResources] = []
+        self.stats = {"resource_builds": 0, "societies": 0}
+
+    @property
+    def resources(self) -> SocietyResources:
+        r"""The resources of the calling thread, built on first use."""
+        if self.per_thread:
+            resources = getattr(self._local, "resources", None)
+            if resources is None:
+                resources = self._build()
+                self._local.resources = resources
+            return resources
+        with self._lock:
+            if self._shared is None:
+                self._shared = self._build()
+            return self._shared
+
+    def warm_up(self) -> None:
+        r"""Build the resources of the calling thread ahead of the first task."""
+        _ = self.resources
+
+    def __call__(self, question: str) -> RolePlaying:
+        r"""Create a society for the question.
+
+        Args:
+            question (str): The task of the society.
+
+        Returns:
+            RolePlaying: A new society sharing the warm models and toolkits.
+        """
+        resources = self.resources
+        society = self.society_cls(
+            task_prompt=question,
+            # The agents add their model to the kwargs, never share the dicts
+            user_agent_kwargs=dict(resources.user_agent_kwargs),
+            assistant_agent_kwargs=dict(resources.assistant_agent_kwargs),
+            **self.society_kwargs,
+        )
+        with self._lock:
+            self.stats["societies"] += 1
+        return society
+
+    def close(self) -> None:
+        r"""Release all resources built by the factory."""
+        with self._lock:
+            all_resources, self._all_resources = self._all_resources, []
+            self._shared = None
+        self._local = threading.local()
+        for resources in all_resources:
+            if resources.cleanup is None:
+                continue
+            try:
+                resources.cleanup()
+            except Exception as e:
+                logger.warning(f"Failed to release society resources: {e}")
+
+    def _build(self) -> SocietyResources:
+        start = time.perf_counter()
+        resources = self.build_resources()
+        resources.build_time = time.perf_counter() - start
+        with self._lock:
+            self._all_resources.append(resources)
+            self.stats["resource_builds"] += 1
+        logger.info(
+            f"Built society resources in {resources.build_time:.2f}s "
+            f"on thread {threading.current_thread().name}."
+        )
+        return resources
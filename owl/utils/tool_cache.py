@@ -0,0 +1,365 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from camel.logger import get_logger
+from camel.toolkits import FunctionTool
+
+logger = get_logger(__name__)
+
+# Tools whose calls change the world (or depend on it in ways the arguments
+# do not capture) are never cached. DocumentProcessingToolkit has a cache of
+# its own, keyed on the content of the documents.
+DEFAULT_UNCACHEABLE_TOOLKITS = frozenset(
+    {
+        "FileWriteToolkit",
+        "CodeExecutionToolkit",
+        "TerminalToolkit",
+        "BrowserToolkit",
+        "DocumentProcessingToolkit",
+    }
+)
+DEFAULT_UNCACHEABLE_TOOLS = frozenset({"write_to_file", "execute_code", "browse_url"})
+
+_MISSING = object()
+
+
+def is_failed_result(result: Any) -> bool:
+    r"""Whether a tool result reports a failure, so it must not be cached.
+
+    Besides :obj:`None` and ``(False, ...)`` tuples, toolkits such as
+    camel's ``SearchToolkit`` return failures as data: a dict with an
+    ``"error"`` key, or a list containing such dicts.
+    """
+    if result is None:
+        return True
+    if isinstance(result, tuple):
+        return bool(result) and result[0] is False
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and "error" in item for item in result)
+    return False
+
+
+def _file_versions(values: Iterable[Any]) -> Dict[str, List[int]]:
+    r"""The size and modification time of the arguments that are paths of
+    existing files."""
+    versions = {}
+    for value in values:
+        if isinstance(value, str) and os.path.isfile(value):
+            stat = os.stat(value)
+            versions[value] = [stat.st_size, stat.st_mtime_ns]
+    return versions
+
+
+class ToolResultCache:
+    r"""A persistent cache of tool results, keyed on the tool name and its
+    canonicalized arguments.
+
+    Results are kept in a SQLite file with a per-tool time to live and a
+    bounded total size, evicting the least recently used entries first. The
+    most recently used entries are also kept in memory. Failed calls
+    (exceptions or results for which :func:`is_failed_result` holds) are
+    not cached.
+
+    Args:
+        cache_dir (str, optional): The directory of the cache file.
+            (default: :obj:`"tmp/tool_cache"`)
+        default_ttl (float, optional): Seconds after which a result expires.
+            (default: :obj:`7 * 24 * 3600`)
+        tool_ttls (Dict[str, float], optional): Time to live per tool name,
+            e.g. ``{"search_google": 24 * 3600}``. A TTL of 0 disables
+            caching for the tool. (default: :obj:`None`)
+        max_disk_bytes (int, optional): The maximum total size of the cached
+            results on disk. (default: :obj:`512 * 1024 * 1024`)
+        max_memory_entries (int, optional): The number of entries of the
+            in-memory tier. (default: :obj:`256`)
+        uncacheable (Iterable[str], optional): Names of tools or toolkit
+            classes that are never cached. (default: the file writing, code
+            execution, terminal, browser and document processing tools)
+
+    Example:
+        >>> cache = ToolResultCache(tool_ttls={"search_google": 3600})
+        >>> tools = cache.wrap([*SearchToolkit().get_tools(), *other_tools])
+        >>> assistant_agent_kwargs = {"model": model, "tools": tools}
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "tmp/tool_cache",
+        default_ttl: float = 7 * 24 * 3600,
+        tool_ttls: Optional[Dict[str, float]] = None,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        max_memory_entries: int = 256,
+        uncacheable: Optional[Iterable[str]] = None,
+    ):
+        self.default_ttl = default_ttl
+        self.tool_ttls = tool_ttls or {}
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+        self.uncacheable: Set[str] = (
+            set(uncacheable)
+            if uncacheable is not None
+            else set(DEFAULT_UNCACHEABLE_TOOLKITS | DEFAULT_UNCACHEABLE_TOOLS)
+        )
+        self.stats = {"hits": 0, "memory_hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "tool_cache.sqlite3")
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, tool TEXT, value BLOB, "
+                "expires_at REAL, last_access REAL, size INTEGER)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access "
+                "ON entries (last_access)"
+            )
+        self._disk_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def ttl(self, tool_name: str) -> float:
+        return self.tool_ttls.get(tool_name, self.default_ttl)
+
+    def is_cacheable(self, tool: FunctionTool) -> bool:
+        r"""Whether calls of the tool may be cached."""
+        tool_name = tool.get_function_name()
+        owner = getattr(tool.func, "__self__", None)
+        return (
+            tool_name not in self.uncacheable
+            and type(owner).__name__ not in self.uncacheable
+            and self.ttl(tool_name) > 0
+        )
+
+    def wrap(self, tools: List[FunctionTool]) -> List[FunctionTool]:
+        r"""Wrap the cacheable tools of the list, leaving the others as is.
+
+        Args:
+            tools (List[FunctionTool]): The tools of an agent.
+
+        Returns:
+            List[FunctionTool]: The tools, with caching where allowed.
+        """
+        wrapped = []
+        for tool in tools:
+            if not isinstance(tool, FunctionTool):
+                tool = FunctionTool(tool)
+            if self.is_cacheable(tool) and not isinstance(tool, CachedFunctionTool):
+                tool = CachedFunctionTool(tool, self)
+            wrapped.append(tool)
+        return wrapped
+
+    @staticmethod
+    def make_key(tool_name: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+        r"""The cache key of a call: the tool name and the canonical JSON of
+        its arguments, with the size and modification time of the local files
+        they name, so a file rewritten at the same path is read again."""
+        call: Dict[str, Any] = {"tool": tool_name, "args": args, "kwargs": kwargs}
+        files = _file_versions([*args, *kwargs.values()])
+        if files:
+            call["files"] = files
+        canonical = json.dumps(
+            call,
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any:
+        r"""Return the cached result, or :obj:`_MISSING`."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.stats["misses"] += 1
+                return _MISSING
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE entries SET last_access = ? WHERE key = ?", (now, key)
+                )
+            value = pickle.loads(zlib.decompress(row[0]))
+            self._remember(key, row[1], value)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: str, tool_name: str, value: Any) -> None:
+        r"""Store the result of a successful call."""
+        try:
+            blob = zlib.compress(pickle.dumps(value))
+        except Exception as e:
+            logger.debug(f"Result of {tool_name} cannot be cached: {e}")
+            return
+        now = time.time()
+        expires_at = now + self.ttl(tool_name)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            with self._conn:
+                previous = self._conn.execute(
+                    "SELECT size FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, tool_name, blob, expires_at, now, len(blob)),
+                )
+            self._disk_bytes += len(blob) - (previous[0] if previous else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict(now)
+
+    def clear(self) -> None:
+        r"""Drop all cached results."""
+        with self._lock:
+            self._memory.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM entries")
+            self._disk_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        r"""Drop expired entries, then the least recently used ones until the
+        cache is 10% below its size limit."""
+        with self._conn:
+            self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            self._disk_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()[0]
+            target = int(self.max_disk_bytes * 0.9)
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access"
+            )
+            evicted = []
+            for key, size in rows:
+                if self._disk_bytes <= target:
+                    break
+                evicted.append((key,))
+                self._disk_bytes -= size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        for (key,) in evicted:
+            self._memory.pop(key, None)
+        self.stats["evictions"] += len(evicted)
+
+
+class CachedFunctionTool(FunctionTool):
+    r"""A :obj:`FunctionTool` answering repeated calls from a
+    :obj:`ToolResultCache`.
+
+    Args:
+        tool (FunctionTool): The wrapped tool.
+        cache (ToolResultCache): The cache.
+    """
+
+    def __init__(self, tool: FunctionTool, cache: ToolResultCache):
+        super().__init__(tool.func, openai_tool_schema=tool.get_openai_tool_schema())
+        self.tool = tool
+        self.cache = cache
+        # Counts of this tool instance, so that a run can report its own
+        # hits even if the cache is shared
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, args: tuple, kwargs: Dict[str, Any]) -> Tuple[str, Any]:
+        key = self.cache.make_key(self.get_function_name(), args, kwargs)
+        value = self.cache.get(key)
+        if value is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.debug(f"Tool cache hit for {self.get_function_name()}.")
+        return key, value
+
+    def _store(self, key: str, result: Any) -> None:
+        if is_failed_result(result):
+            return
+        self.cache.put(key, self.get_function_name(), result)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        key, value = self._lookup(args, kwargs)
+        if value is not _MISSING:
+            return value
+        result = self.tool(*args, **kwargs)
+        self._store(key, result)
+        return result
+
+    async def async_call(self, *args: Any, **kwargs: Any) -> Any:
+        key, value = self._lookup(args, kwargs)
+        if value is not _MISSING:
+            return value
+        result = await self.tool.async_call(*args, **kwargs)
+        self._store(key, result)
+        return result
+
+
+def _unwrap(tool: Any) -> Any:
+    # The proxies of owl (events, tracing, worker threads) expose the tool
+    # they wrap as `wrapped`
+    while not isinstance(tool, CachedFunctionTool) and hasattr(tool, "wrapped"):
+        tool = tool.wrapped
+    return tool
+
+
+def tool_cache_counts(tools: Iterable[Any]) -> Optional[Dict[str, int]]:
+    r"""Sum the hits and misses of the cached tools among the given tools,
+    also when they are wrapped in proxies.
+
+    Returns:
+        Optional[Dict[str, int]]: The counts, or :obj:`None` if none of the
+            tools is cached.
+    """
+    cached = [
+        tool for tool in map(_unwrap, tools) if isinstance(tool, CachedFunctionTool)
+    ]
+    if not cached:
+        return None
+    return {
+        "hits": sum(tool.hits for tool in cached),
+        "misses": sum(tool.misses for tool in cached),
+    }
@@ -0,0 +1,294 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from camel.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class TraceSpan:
+    r"""A finished span of a traced society run.
+
+    Args:
+        name (str): What was timed, e.g. ``"assistant_agent.step"`` or the
+            name of a tool.
+        cat (str): The category: ``"round"``, ``"agent"``, ``"model"`` or
+            ``"tool"``.
+        start (float): Seconds since the tracer was created.
+        duration (float): Wall time in seconds.
+        thread_id (int): The thread the span ran on.
+        args (Dict[str, Any]): Tokens, payload sizes and other details.
+    """
+
+    name: str
+    cat: str
+    start: float
+    duration: float
+    thread_id: int
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class SocietyTracer:
+    r"""Collects timing spans of a society run: every round, every step of
+    the user and assistant agents, every model call and every tool call.
+
+    Pass a tracer to :func:`run_society` (or :func:`arun_society`) and
+    export it once the run finished. Without a tracer nothing is patched,
+    so tracing costs nothing when disabled.
+
+    Example:
+        >>> tracer = SocietyTracer()
+        >>> answer, chat_history, token_info = run_society(society, tracer=tracer)
+        >>> tracer.export_chrome_trace("trace.json")  # chrome://tracing
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[TraceSpan] = []
+
+    def now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def record(
+        self, name: str, cat: str, start: float, end: float, **args: Any
+    ) -> None:
+        r"""Record a span from two timestamps obtained with :meth:`now`."""
+        span = TraceSpan(
+            name=name,
+            cat=cat,
+            start=start,
+            duration=end - start,
+            thread_id=threading.get_ident(),
+            args=args,
+        )
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        r"""Time the body of the `with` statement. The yielded dict can be
+        filled with details that are only known at the end."""
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.record(name, cat, start, self.now(), **args)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        r"""Total wall time and count per span name."""
+        totals: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            entry = totals.setdefault(span.name, {"count": 0, "total_time": 0.0})
+            entry["count"] += 1
+            entry["total_time"] += span.duration
+        return totals
+
+    def export_chrome_trace(self, path: str) -> None:
+        r"""Write the spans in the Chrome trace-event format, to be opened in
+        ``chrome://tracing`` or https://ui.perfetto.dev.
+
+        Args:
+            path (str): The path of the JSON file.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.cat,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": span.args,
+            }
+            for span in self.spans
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms"},
+                f,
+                ensure_ascii=False,
+                default=str,
+            )
+
+    def export_jsonl(self, path: str) -> None:
+        r"""Write one compact JSON object per span.
+
+        Args:
+            path (str): The path of the JSONL file.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for span in self.spans:
+                f.write(json.dumps(asdict(span), ensure_ascii=False, default=str))
+                f.write("\n")
+
+    @contextmanager
+    def instrument(self, society) -> Iterator[None]:
+        r"""Patch the agents, model backends and tools of the society to
+        record spans, and restore them on exit."""
+        restore: List = []
+        for agent_name, agent in (
+            ("user_agent", society.user_agent),
+            ("assistant_agent", society.assistant_agent),
+        ):
+            self._patch_agent(agent_name, agent, restore)
+            self._patch_model(agent_name, agent.model_backend, restore)
+            tools: Optional[Dict] = getattr(agent, "_internal_tools", None)
+            if tools:
+                original_tools = dict(tools)
+                for name, tool in original_tools.items():
+                    tools[name] = _TracedTool(tool, self)
+                restore.append(
+                    lambda tools=tools, original=original_tools: _restore_tools(
+                        tools, original
+                    )
+                )
+        try:
+            yield
+        finally:
+            for undo in reversed(restore):
+                undo()
+
+    def _patch_agent(self, agent_name: str, agent, restore: List) -> None:
+        step, astep = agent.step, agent.astep
+        span_name = f"{agent_name}.step"
+
+        def traced_step(*args, **kwargs):
+            with self.span(span_name, "agent") as details:
+                response = step(*args, **kwargs)
+                details.update(_response_details(response))
+                return response
+
+        async def traced_astep(*args, **kwargs):
+            with self.span(span_name, "agent") as details:
+                response = await astep(*args, **kwargs)
+                details.update(_response_details(response))
+                return response
+
+        agent.step, agent.astep = traced_step, traced_astep
+        restore.append(lambda: _unpatch(agent, "step", "astep"))
+
+    def _patch_model(self, agent_name: str, backend, restore: List) -> None:
+        run, arun = backend.run, backend.arun
+        span_name = f"{agent_name}.model"
+
+        def traced_run(messages, *args, **kwargs):
+            with self.span(span_name, "model") as details:
+                details["request_bytes"] = _payload_size(messages)
+                response = run(messages, *args, **kwargs)
+                details.update(_completion_details(response))
+                return response
+
+        async def traced_arun(messages, *args, **kwargs):
+            with self.span(span_name, "model") as details:
+                details["request_bytes"] = _payload_size(messages)
+                response = await arun(messages, *args, **kwargs)
+                details.update(_completion_details(response))
+                return response
+
+        backend.run, backend.arun = traced_run, traced_arun
+        restore.append(lambda: _unpatch(backend, "run", "arun"))
+
+
+class _TracedTool:
+    r"""Proxy around a :obj:`FunctionTool` recording a span per call."""
+
+    def __init__(self, tool, tracer: SocietyTracer):
+        self._tool = tool
+        self._tracer = tracer
+
+    @property
+    def wrapped(self):
+        r"""The proxied tool."""
+        return self._tool
+
+    def __getattr__(self, name):
+        return getattr(self._tool, name)
+
+    def __call__(self, *args, **kwargs):
+        with self._tracer.span(self._tool.get_function_name(), "tool") as details:
+            details["args_bytes"] = _payload_size(kwargs)
+            result = self._tool(*args, **kwargs)
+            details["result_bytes"] = _payload_size(result)
+            return result
+
+    async def async_call(self, *args, **kwargs):
+        with self._tracer.span(self._tool.get_function_name(), "tool") as details:
+            details["args_bytes"] = _payload_size(kwargs)
+            result = await self._tool.async_call(*args, **kwargs)
+            details["result_bytes"] = _payload_size(result)
+            return result
+
+
+def _unpatch(obj: Any, *names: str) -> None:
+    r"""Remove the instance attributes shadowing the methods of the class."""
+    for name in names:
+        delattr(obj, name)
+
+
+def _restore_tools(tools: Dict, original: Dict) -> None:
+    tools.clear()
+    tools.update(original)
+
+
+def _payload_size(payload: Any) -> int:
+    if isinstance(payload, str):
+        return len(payload.encode("utf-8"))
+    try:
+        return len(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(payload).encode("utf-8"))
+
+
+def _response_details(response) -> Dict[str, Any]:
+    info = getattr(response, "info", None) or {}
+    usage = info.get("usage") or {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "tool_calls": len(info.get("tool_calls") or []),
+    }
+
+
+def _completion_details(response) -> Dict[str, Any]:
+    r"""Tokens and response size of a model call. Streaming responses are
+    consumed later by the agent and only reported as such."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"stream": not hasattr(response, "choices")}
+    details: Dict[str, Any] = {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+    }
+    try:
+        message = response.choices[0].message
+        details["response_bytes"] = _payload_size(message.content or "") + (
+            _payload_size([call.model_dump() for call in message.tool_calls])
+            if message.tool_calls
+            else 0
+        )
+    except (AttributeError, IndexError):
+        pass
+    return details
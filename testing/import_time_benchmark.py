@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+"""
+Import-time benchmark for the OWL package.
+
+Runs every import statement below in a fresh interpreter with
+`python -X importtime`, takes the fastest of several runs and compares it
+with its budget. Statements importing camel are dominated by camel's own
+import time, which varies a lot between machines and runs, so for them only
+the time of the modules a baseline camel import does not load is counted,
+i.e. the time OWL adds to camel. Each statement also lists modules it must
+not import at all, which catches regressions independently of the speed of
+the machine. The script exits with status 1 if any budget is exceeded.
+
+Usage:
+    python testing/import_time_benchmark.py [--runs 5] [--scale 1.5] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+GREEN = "\033[92m"
+RED = "\033[91m"
+RESET = "\033[0m"
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy optional dependencies that must only be loaded when they are used
+DEFERRED_MODULES = [
+    "datasets",
+    "chunkr_ai",
+    "nest_asyncio",
+    "camel.benchmarks",
+]
+
+# The camel modules OWL builds on, whose import time is not counted
+CAMEL_BASELINE = "import camel.societies, camel.toolkits"
+
+# (import statement, budget in milliseconds, baseline statement whose
+# modules are not counted or None to count all, modules it must not import)
+BUDGETS: List[Tuple[str, float, Optional[str], List[str]]] = [
+    ("import owl", 150, None, ["camel", *DEFERRED_MODULES]),
+    ("import owl.utils", 150, None, ["camel", *DEFERRED_MODULES]),
+    ("from owl.utils import run_society", 250, CAMEL_BASELINE, DEFERRED_MODULES),
+    (
+        "from owl.utils import DocumentProcessingToolkit",
+        250,
+        CAMEL_BASELINE,
+        DEFERRED_MODULES,
+    ),
+]
+
+
+def measure(statement: str) -> Tuple[float, Dict[str, float], Dict[str, float]]:
+    r"""Run the statement with `-X importtime` in a fresh interpreter.
+
+    Returns:
+        Tuple[float, Dict[str, float], Dict[str, float]]: The total import
+            time in milliseconds, and the cumulative and own time of every
+            imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+        env={**os.environ, "PYTHONPATH": REPO_ROOT},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{result.stderr[-2000:]}")
+
+    total = 0.0
+    modules: Dict[str, float] = {}
+    own: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative, name = line.split("|")
+        cumulative_ms = int(cumulative) / 1000
+        modules[name.strip()] = cumulative_ms
+        own[name.strip()] = int(self_us.split(":")[1]) / 1000
+        # Top-level imports are indented by a single space
+        if not name.startswith("  "):
+            total += cumulative_ms
+    return total, modules, own
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="OWL import-time benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per statement.")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply all time budgets, e.g. on slow CI machines.",
+    )
+    parser.add_argument(
+        "--top", type=int, default=0, help="Show the N slowest imports of each."
+    )
+    args = parser.parse_args()
+
+    # The modules imported by every baseline statement
+    baselines: Dict[str, Set[str]] = {}
+    failed = False
+    for statement, budget, baseline, forbidden in BUDGETS:
+        runs = []
+        for _ in range(args.runs):
+            total, modules, own = measure(statement)
+            if baseline is not None:
+                if baseline not in baselines:
+                    baselines[baseline] = set(measure(baseline)[1])
+                total = sum(
+                    ms for name, ms in own.items() if name not in baselines[baseline]
+                )
+            runs.append((total, modules))
+        total, modules = min(runs, key=lambda run: run[0])
+        budget *= args.scale
+        if baseline is not None:
+            statement = f"{statement} (over `{baseline}`)"
+
+        problems = []
+        if total > budget:
+            problems.append(f"exceeds budget of {budget:.0f} ms")
+        imported = [
+            name
+            for name in forbidden
+            if name in modules or any(m.startswith(f"{name}.") for m in modules)
+        ]
+        if imported:
+            problems.append(f"imports {', '.join(imported)}")
+
+        if problems:
+            failed = True
+            print(f"{RED}✗ {statement}: {total:.0f} ms, {'; '.join(problems)}{RESET}")
+        else:
+            print(
+                f"{GREEN}✓ {statement}: {total:.0f} ms (budget {budget:.0f} ms){RESET}"
+            )
+
+        if args.top:
+            for name, cumulative in sorted(modules.items(), key=lambda m: -m[1])[
+                : args.top
+            ]:
+                print(f"    {cumulative:8.1f} ms  {name}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+r"""A local OpenAI-compatible chat completions server with a scriptable
+status code and delay, to test model backends without a provider.
+
+Usage as a standalone server:
+    python testing/unit/openai_stub.py --port 8001 --delay 2 --status 200
+
+Then point an ``OPENAI_COMPATIBLE_MODEL`` backend at
+``http://127.0.0.1:8001/v1``.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubOpenAIServer:
+    r"""An OpenAI-compatible server answering every chat completion with its
+    name, after :obj:`delay` seconds and with :obj:`status` as status code.
+
+    Both can be changed while the server runs.
+
+    Args:
+        name (str): The content of the answers.
+        status (int, optional): The status code of the responses.
+            (default: :obj:`200`)
+        delay (float, optional): Seconds before answering.
+            (default: :obj:`0.0`)
+        port (int, optional): The port, :obj:`0` for any free port.
+            (default: :obj:`0`)
+
+    Example:
+        >>> with StubOpenAIServer("A", delay=0.05) as server:
+        ...     model = ModelFactory.create(
+        ...         ModelPlatformType.OPENAI_COMPATIBLE_MODEL,
+        ...         "stub-model", url=server.url, api_key="x",
+        ...     )
+    """
+
+    def __init__(self, name: str, status: int = 200, delay: float = 0.0, port: int = 0):
+        self.name = name
+        self.status = status
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    status, delay = stub.status, stub.delay
+                time.sleep(delay)
+                body = json.dumps(stub._body(status)).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up, e.g. a cancelled hedged request
+                    pass
+
+        return Handler
+
+    def _body(self, status: int) -> dict:
+        if status != 200:
+            return {"error": {"message": f"Stub error {status}", "code": status}}
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub-model",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": self.name},
+                }
+            ],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--name", default="stub")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--status", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubOpenAIServer(args.name, args.status, args.delay, args.port)
+    print(f"Serving {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,62 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import os
+import zipfile
+
+import pytest
+
+from owl.utils.attachment_cache import AttachmentCache
+
+
+def _archive(tmp_path, members):
+    path = str(tmp_path / "attachment.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # Members are audio files, which are listed without a toolkit
+    return AttachmentCache(cache_dir=str(tmp_path / "cache"), max_archive_bytes=1000)
+
+
+def test_archive_is_unpacked(tmp_path, cache):
+    record = cache.extract(_archive(tmp_path, {"a/b.mp3": b"x" * 100}))
+
+    assert record.success
+    assert "## a/b.mp3" in record.read()
+
+
+@pytest.mark.parametrize("name", ["../evil.mp3", "a/../../evil.mp3"])
+def test_member_outside_of_the_archive_is_refused(tmp_path, cache, name):
+    record = cache.extract(_archive(tmp_path, {name: b"x"}))
+
+    assert not record.success
+    assert "outside of the extraction directory" in record.error
+    assert not os.path.exists(tmp_path / "cache" / "evil.mp3")
+    assert cache.stats["failed"] == 1
+
+
+def test_oversized_archive_is_not_unpacked(tmp_path, cache):
+    # Compresses to a few bytes
+    record = cache.extract(
+        _archive(tmp_path, {"a.mp3": b"\0" * 600, "b.mp3": b"\0" * 600})
+    )
+
+    assert not record.success
+    assert "more than the limit of 1000 bytes" in record.error
+    assert not os.path.exists(cache._entry_path(record.sha256, "_files"))
@@ -0,0 +1,59 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import json
+
+import owl.utils.batch_runner as batch_runner
+from owl.utils.batch_runner import run_societies
+
+
+class _Unserializable:
+    def __str__(self):
+        return "<tool result>"
+
+
+class _FailingScheduler:
+    def select(self, pending):
+        return 0
+
+    def observe(self, task, result):
+        raise RuntimeError("scheduler failed")
+
+
+def test_bad_results_do_not_abort_the_batch(tmp_path, monkeypatch):
+    async def arun_society(society, round_limit):
+        history = [{"tool_result": _Unserializable()}]
+        return f"answer {society}", history, {"prompt_token_count": 1}
+
+    monkeypatch.setattr(batch_runner, "arun_society", arun_society)
+    monkeypatch.setattr(batch_runner, "_bind_tools_to_thread", lambda *args: None)
+    output_path = tmp_path / "results.jsonl"
+    tasks = [{"task_id": str(idx), "question": str(idx)} for idx in range(3)]
+
+    results = run_societies(
+        tasks,
+        society_factory=lambda question: question,
+        max_concurrency=2,
+        output_path=str(output_path),
+        scheduler=_FailingScheduler(),
+    )
+
+    assert sorted(result["answer"] for result in results) == [
+        "answer 0",
+        "answer 1",
+        "answer 2",
+    ]
+    lines = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert len(lines) == 3
+    assert lines[0]["history"] == [{"tool_result": "<tool result>"}]
@@ -0,0 +1,128 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import os
+from types import SimpleNamespace
+
+import pytest
+from camel.memories import MemoryRecord
+from camel.messages import BaseMessage
+from camel.types import OpenAIBackendRole
+
+import owl.utils.checkpoint as checkpoint_module
+from owl.utils.checkpoint import SocietyCheckpointer
+
+
+class _Memory:
+    def __init__(self):
+        self.records = []
+
+    def retrieve(self):
+        return [SimpleNamespace(memory_record=record) for record in self.records]
+
+    def clear(self):
+        self.records = []
+
+    def write_records(self, records):
+        self.records.extend(records)
+
+
+def _society():
+    return SimpleNamespace(
+        task_prompt="What is 6*7?",
+        user_agent=SimpleNamespace(role_name="user", memory=_Memory()),
+        assistant_agent=SimpleNamespace(role_name="assistant", memory=_Memory()),
+    )
+
+
+def _record(content: str) -> MemoryRecord:
+    return MemoryRecord(
+        message=BaseMessage.make_assistant_message("assistant", content),
+        role_at_backend=OpenAIBackendRole.ASSISTANT,
+    )
+
+
+def _contents(agent):
+    return [record.message.content for record in agent.memory.records]
+
+
+def _run_rounds(checkpointer, society, start, end):
+    for round_idx in range(start, end):
+        for agent in (society.user_agent, society.assistant_agent):
+            agent.memory.records.append(_record(f"round {round_idx}"))
+        checkpointer.save(society, round_idx, [], {}, None)
+
+
+def _compact(society):
+    for agent in (society.user_agent, society.assistant_agent):
+        agent.memory.records = [_record("summary"), agent.memory.records[-1]]
+
+
+def test_resume_after_a_compaction(tmp_path):
+    society = _society()
+    checkpointer = SocietyCheckpointer(str(tmp_path), background=False)
+    _run_rounds(checkpointer, society, 0, 3)
+    _compact(society)
+    _run_rounds(checkpointer, society, 3, 4)
+
+    resumed = _society()
+    state = SocietyCheckpointer(str(tmp_path), background=False).restore(resumed)
+
+    assert state["round_idx"] == 3
+    assert _contents(resumed.assistant_agent) == ["summary", "round 2", "round 3"]
+    # The memory before the compaction is gone
+    assert sorted(os.listdir(tmp_path)) == [
+        "assistant_agent.1.jsonl",
+        "chat_history.jsonl",
+        "state.json",
+        "user_agent.1.jsonl",
+    ]
+
+
+def test_crash_before_the_state_after_a_compaction(tmp_path, monkeypatch):
+    society = _society()
+    checkpointer = SocietyCheckpointer(str(tmp_path), background=False)
+    _run_rounds(checkpointer, society, 0, 3)
+    _compact(society)
+
+    atomic_write = checkpoint_module._atomic_write
+
+    def crash_on_state(path, content):
+        if path.endswith("state.json"):
+            raise KeyboardInterrupt
+        atomic_write(path, content)
+
+    monkeypatch.setattr(checkpoint_module, "_atomic_write", crash_on_state)
+    with pytest.raises(KeyboardInterrupt):
+        _run_rounds(checkpointer, society, 3, 4)
+    monkeypatch.undo()
+
+    resumed = _society()
+    state = SocietyCheckpointer(str(tmp_path), background=False).restore(resumed)
+
+    # The last complete round, as it was before the compaction
+    assert state["round_idx"] == 2
+    assert _contents(resumed.user_agent) == ["round 0", "round 1", "round 2"]
+    assert _contents(resumed.assistant_agent) == ["round 0", "round 1", "round 2"]
+    # The files of the unfinished round are cleaned up
+    assert not os.path.exists(tmp_path / "assistant_agent.1.jsonl")
+
+    # The resumed run compacts and checkpoints again
+    checkpointer = SocietyCheckpointer(str(tmp_path), background=False)
+    checkpointer.restore(resumed)
+    _compact(resumed)
+    _run_rounds(checkpointer, resumed, 3, 4)
+    again = _society()
+    SocietyCheckpointer(str(tmp_path), background=False).restore(again)
+    assert _contents(again.user_agent) == ["summary", "round 2", "round 3"]
@@ -0,0 +1,44 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+from owl.utils.document_extractors import SECTION_CHARS, iter_byte_range
+
+
+def test_byte_range_keeps_characters_split_between_parts(tmp_path):
+    path = tmp_path / "zh.txt"
+    # 3 bytes per character, so the parts end inside characters
+    path.write_text("中文" * 2500, encoding="utf-8")
+
+    parts = list(iter_byte_range(str(path), 0))
+
+    assert len(parts) > 1
+    assert "".join(parts) == "中文" * 2500
+
+
+def test_byte_range_replaces_characters_cut_by_its_ends(tmp_path):
+    path = tmp_path / "zh.txt"
+    path.write_text("中" * 5000, encoding="utf-8")
+
+    text = "".join(iter_byte_range(str(path), 1, 2 * SECTION_CHARS + 2))
+
+    # Two continuation bytes at the start, one partial character at the end
+    assert text.count("�") == 3
+    assert text.strip("�") == "中" * ((2 * SECTION_CHARS - 1) // 3)
+
+
+def test_byte_range_of_ascii_text(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("0123456789" * 1000, encoding="utf-8")
+
+    assert "".join(iter_byte_range(str(path), 5, 15)) == "5678901234"
@@ -0,0 +1,41 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+from owl.utils.document_index import DocumentIndex, Passage, tokenize
+
+
+def test_tokenize_splits_cjk_runs_into_bigrams():
+    assert tokenize("The OWL 框架支持GPT模型") == [
+        "owl",
+        "框架",
+        "架支",
+        "支持",
+        "gpt",
+        "模型",
+    ]
+    assert tokenize("日本語 の") == ["日本", "本語", "の"]
+
+
+def test_search_finds_chinese_and_japanese_passages():
+    index = DocumentIndex(
+        [
+            Passage(1, "本项目是一个多智能体协作框架，用于自动化任务。"),
+            Passage(2, "今天天气很好，我们去公园散步。"),
+            Passage(3, "このフレームワークはエージェントを使います。"),
+        ]
+    )
+
+    assert [p.number for _, p in index.search("多智能体框架")] == [1]
+    assert index.search("公园", k=1)[0][1].number == 2
+    assert index.search("エージェント", k=1)[0][1].number == 3
@@ -0,0 +1,297 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import asyncio
+import time
+import zipfile
+from typing import List
+
+import pytest
+
+import owl.utils.document_toolkit as document_toolkit
+from owl.utils.document_toolkit import DocumentProcessingToolkit
+
+# Seven parts of 4000 characters, five lines of 800 characters each
+LONG_TEXT = "".join(f"{'word ' * 159}w{line:03d}\n" for line in range(35))
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _docx(path, pages: List[str]) -> str:
+    r"""Write a DOCX file with one paragraph per page."""
+    paragraphs = []
+    for idx, text in enumerate(pages):
+        page_break = '<w:r><w:br w:type="page"/></w:r>' if idx < len(pages) - 1 else ""
+        paragraphs.append(f"<w:p><w:r><w:t>{text}</w:t></w:r>{page_break}</w:p>")
+    document = (
+        f'<w:document xmlns:w="{_W}"><w:body>{"".join(paragraphs)}</w:body>'
+        "</w:document>"
+    )
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", document)
+    return str(path)
+
+
+@pytest.fixture
+def toolkit(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.delenv("CHUNKR_API_KEY", raising=False)
+    toolkit = DocumentProcessingToolkit(
+        cache_dir=str(tmp_path / "cache"), parse_processes=0
+    )
+    yield toolkit
+    toolkit.close()
+
+
+@pytest.fixture
+def long_file(tmp_path):
+    path = tmp_path / "long.txt"
+    path.write_text(LONG_TEXT, encoding="utf-8")
+    return str(path)
+
+
+def test_read_pages_continues_after_the_last_page(toolkit, long_file):
+    text = toolkit.read_document_pages(long_file, "1-2")
+
+    assert "--- Part 1 ---" in text and "--- Part 2 ---" in text
+    assert "--- Part 3 ---" not in text
+    assert text.endswith("Continue with pages='3-7'.]")
+
+
+def test_read_pages_restarts_at_a_cut_page(toolkit, long_file):
+    text = toolkit.read_document_pages(long_file, "1-2", max_chars=500)
+
+    assert "--- Part 2 ---" not in text
+    assert "Part 1 was cut after 500 of its 4000 characters" in text
+    assert text.endswith("Continue with pages='1-5' and max_chars=4000.]")
+    # The suggested call reads the whole page
+    text = toolkit.read_document_pages(long_file, "1-5", max_chars=4000)
+    assert "w004" in text and "was cut" not in text
+
+
+def test_cache_hits_keep_the_tier_of_the_extraction(toolkit, tmp_path):
+    csv_path = tmp_path / "table.csv"
+    csv_path.write_text("a,b\n1,2\n", encoding="utf-8")
+    json_path = tmp_path / "data.json"
+    json_path.write_text('{"a": 1}', encoding="utf-8")
+
+    for _ in range(2):
+        assert toolkit.extract_document_content(str(csv_path))[0]
+        assert toolkit.extract_document_content(str(json_path)) == (True, {"a": 1})
+
+    assert toolkit.extraction_tiers == {str(csv_path): "csv", str(json_path): "json"}
+    assert toolkit.tier_counts == {"csv": 1, "json": 1}
+    assert toolkit.cache_hits == 2
+
+
+@pytest.mark.parametrize(
+    "tool_name, kwargs, expected",
+    [
+        ("extract_document_content", {}, "content"),
+        ("query_document", {"question": "w003"}, "--- Passage 1, part 1 ---"),
+    ],
+)
+def test_tools_do_not_block_the_event_loop(
+    toolkit, long_file, monkeypatch, tool_name, kwargs, expected
+):
+    open_sections = toolkit._open_sections
+
+    def slow_extract(document_path):
+        time.sleep(0.5)
+        return True, "content"
+
+    def slow_open_sections(document_path):
+        time.sleep(0.5)
+        return open_sections(document_path)
+
+    monkeypatch.setattr(toolkit, "_extract_document_content", slow_extract)
+    monkeypatch.setattr(toolkit, "_open_sections", slow_open_sections)
+    monkeypatch.setattr(document_toolkit, "CPU_BOUND_SUFFIXES", ())
+    [tool] = [
+        tool for tool in toolkit.get_tools() if tool.get_function_name() == tool_name
+    ]
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        result = await tool.async_call(document_path=long_file, **kwargs)
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+
+    assert expected in str(result)
+    # The loop kept running during the half second of extraction
+    assert ticks > 10
+
+
+def test_changed_file_is_extracted_again(toolkit, tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("first version", encoding="utf-8")
+    assert toolkit.extract_document_content(str(path)) == (True, "first version")
+    assert toolkit.extract_document_content(str(path)) == (True, "first version")
+
+    path.write_text("second version", encoding="utf-8")
+
+    assert toolkit.extract_document_content(str(path)) == (True, "second version")
+    assert toolkit.tier_counts == {"text": 2}
+    assert toolkit.cache_hits == 1
+
+
+def test_failed_extractions_are_not_cached(toolkit, long_file, monkeypatch):
+    results = [(False, "Error while processing document"), (True, "content")]
+    calls = []
+
+    def extract(document_path):
+        calls.append(document_path)
+        return results[len(calls) - 1]
+
+    monkeypatch.setattr(toolkit, "_extract_document_content", extract)
+
+    assert toolkit.extract_document_content(long_file)[0] is False
+    assert toolkit.extract_document_content(long_file) == (True, "content")
+    assert toolkit.extract_document_content(long_file) == (True, "content")
+    assert len(calls) == 2
+
+
+class _FakeUnstructured:
+    def __init__(self, elements):
+        self.elements = elements
+        self.calls = 0
+
+    def parse_file_or_url(self, path):
+        self.calls += 1
+        return self.elements
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    # No text layer the fast extractor could read
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.4 not really a pdf")
+    return str(path)
+
+
+def test_unstructured_handles_what_fast_extraction_cannot(toolkit, scanned_pdf):
+    toolkit._uio = _FakeUnstructured(["A paragraph found by the layout parser."])
+
+    result = toolkit.extract_document_content(scanned_pdf)
+
+    assert result == (True, "A paragraph found by the layout parser.")
+    assert toolkit.extraction_tiers[scanned_pdf] == "unstructured"
+
+
+def test_garbled_text_escalates_to_ocr(toolkit, scanned_pdf, monkeypatch):
+    monkeypatch.setenv("CHUNKR_API_KEY", "x")
+    toolkit._uio = _FakeUnstructured(["\x00\x01\ufffd"])
+
+    async def chunkr(document_path, output_format="markdown"):
+        return "Text read by OCR."
+
+    monkeypatch.setattr(toolkit, "_extract_content_with_chunkr", chunkr)
+
+    assert toolkit.extract_document_content(scanned_pdf) == (True, "Text read by OCR.")
+    assert toolkit.extraction_tiers[scanned_pdf] == "chunkr"
+    assert toolkit.tier_counts == {"chunkr": 1}
+
+
+def test_iter_document_by_page_and_byte_range(toolkit, long_file):
+    sections = list(toolkit.iter_document(long_file, pages=[4, 2, 9]))
+    assert [section.number for section in sections] == [4, 2]
+    assert sections[0].text.startswith(LONG_TEXT[12000:12050])
+
+    text = "".join(
+        section.text
+        for section in toolkit.iter_document(long_file, byte_range=(800, 1700))
+    )
+    assert text == LONG_TEXT[800:1700]
+
+    sections = list(toolkit.iter_document(long_file, max_chars=5000))
+    assert [len(section.text) for section in sections] == [4000, 1000]
+
+
+def test_read_pages_of_a_docx(toolkit, tmp_path):
+    path = _docx(tmp_path / "report.docx", ["Introduction", "Methods", "Results"])
+
+    text = toolkit.read_document_pages(path, "2-3")
+
+    assert "--- Page 2 ---\nMethods" in text and "--- Page 3 ---\nResults" in text
+    assert "Introduction" not in text
+    assert text.endswith("[The document has 3 pages.]")
+    assert toolkit.read_document_pages(path, "3-1").startswith("Error reading")
+
+
+def test_query_document_gives_page_references(toolkit, tmp_path):
+    path = _docx(
+        tmp_path / "report.docx",
+        [
+            "The study was run in Lisbon in 2019.",
+            "The owls were counted at night by three observers.",
+            "In total 412 barn owls were seen.",
+        ],
+    )
+
+    text = toolkit.query_document(path, "How many barn owls were seen?", k=1)
+
+    assert text.startswith("--- Passage 1, page 3 ---\nIn total 412 barn owls")
+    assert "[The 1 most relevant of 3 passages.]" in text
+    # The index is cached with the extraction
+    toolkit._open_sections = None
+    assert toolkit.query_document(path, "Lisbon", k=1).startswith(
+        "--- Passage 1, page 1 ---"
+    )
+
+
+@pytest.mark.parametrize("parse_processes", [0, 1])
+def test_aextract_documents_in_a_running_loop(tmp_path, monkeypatch, parse_processes):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    toolkit = DocumentProcessingToolkit(
+        cache_dir=str(tmp_path / "cache"), parse_processes=parse_processes
+    )
+    docx_path = _docx(tmp_path / "a.docx", ["Content of the Word document."])
+    text_path = tmp_path / "b.txt"
+    text_path.write_text("Content of the text file.", encoding="utf-8")
+    paths = [docx_path, str(text_path), docx_path]
+
+    async def run():
+        other = asyncio.create_task(asyncio.sleep(0.01))
+        results = await toolkit.aextract_documents(paths)
+        # The synchronous method, called from the thread of the loop
+        again = toolkit.extract_documents(paths)
+        await other
+        return results, again
+
+    try:
+        results, again = asyncio.run(run())
+    finally:
+        toolkit.close()
+
+    assert results == [
+        (True, "Content of the Word document."),
+        (True, "Content of the text file."),
+        (True, "Content of the Word document."),
+    ]
+    assert again == results
+    # The process pool worked, without falling back to threads
+    assert toolkit.parse_processes == parse_processes
+    # A document listed twice is extracted once, then read from the cache
+    assert toolkit.tier_counts == {"docx": 1, "text": 1}
+    assert toolkit.cache_hits == 2
@@ -0,0 +1,133 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+import asyncio
+import time
+
+import pytest
+from camel.models import ModelFactory
+from camel.types import ModelPlatformType
+from openai_stub import StubOpenAIServer
+
+from owl.utils.hedged_model import HedgedModel
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def servers():
+    with StubOpenAIServer("A", delay=0.02) as a, StubOpenAIServer("B", delay=0.02) as b:
+        yield a, b
+
+
+def _backend(server: StubOpenAIServer):
+    return ModelFactory.create(
+        model_platform=ModelPlatformType.OPENAI_COMPATIBLE_MODEL,
+        model_type="stub-model",
+        url=server.url,
+        api_key="x",
+    )
+
+
+def _model(servers, **kwargs) -> HedgedModel:
+    kwargs = {"min_samples": 5, "cooldown": 0.5, **kwargs}
+    model = HedgedModel([_backend(server) for server in servers], **kwargs)
+    # Learn the latencies of the first backend
+    for _ in range(5):
+        model.run(MESSAGES)
+    return model
+
+
+def _answer(response) -> str:
+    return response.choices[0].message.content
+
+
+def test_slow_backend_is_hedged(servers):
+    model = _model(servers)
+    servers[0].delay = 2.0
+
+    start = time.monotonic()
+    response = model.run(MESSAGES)
+
+    assert _answer(response) == "B"
+    assert time.monotonic() - start < 1.0
+    assert model.stats["hedged"] == 1
+    assert model.stats["hedge_wins"] == 1
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retryable_errors_fail_over(servers, status):
+    # Without hedging, which could answer first on a cold connection
+    model = _model(servers, hedge=False)
+    servers[0].status = status
+
+    assert _answer(model.run(MESSAGES)) == "B"
+    assert model.stats["failovers"] == 1
+    # The failed backend is skipped while cooling down
+    requests = servers[0].requests
+    assert _answer(model.run(MESSAGES)) == "B"
+    assert servers[0].requests == requests
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retryable_errors_fail_over_async(servers, status):
+    # Without hedging, which could answer first on a cold connection
+    model = _model(servers, hedge=False)
+    servers[0].status = status
+
+    assert _answer(asyncio.run(model.arun(MESSAGES))) == "B"
+    assert model.stats["failovers"] == 1
+
+
+def test_other_errors_are_raised(servers):
+    model = _model(servers)
+    servers[0].status = 400
+
+    with pytest.raises(Exception) as info:
+        model.run(MESSAGES)
+    assert getattr(info.value, "status_code", None) == 400
+    assert servers[1].requests == 0
+
+
+def test_async_hedge_records_the_cancelled_request(servers):
+    model = _model(servers)
+    servers[0].delay = 2.0
+    latencies = model._states[0].latencies
+    count = len(latencies)
+    hedge_delay = model._hedge_delay(0, [1])
+
+    async def run():
+        response = await model.arun(MESSAGES)
+        # Let the cancelled request record its time
+        await asyncio.sleep(0.05)
+        return response
+
+    assert _answer(asyncio.run(run())) == "B"
+    assert len(latencies) == count + 1
+    assert latencies[-1] >= hedge_delay
+
+
+def test_backends_passed_in_keep_their_retries(servers):
+    backends = [_backend(server) for server in servers]
+    retries = [backend._client.max_retries for backend in backends]
+
+    model = HedgedModel(backends)
+
+    assert [backend._client.max_retries for backend in backends] == retries
+    assert all(backend._client.max_retries == 0 for backend in model.backends)
+    assert all(backend._async_client.max_retries == 0 for backend in model.backends)
+    assert model.backends[0] is not backends[0]
+
+    model = HedgedModel(backends, disable_client_retries=False)
+    assert model.backends == backends
@@ -0,0 +1,151 @@
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ========= Copyright 2023-2024 @ CAMEL-AI.org. All Rights Reserved. =========
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from camel.toolkits import FunctionTool
+
+from owl.utils.batch_runner import _ThreadBoundTool
+from owl.utils.tool_cache import (
+    CachedFunctionTool,
+    ToolResultCache,
+    is_failed_result,
+    tool_cache_counts,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ToolResultCache(cache_dir=str(tmp_path))
+    yield cache
+    cache.close()
+
+
+def _search_tool(results):
+    r"""A search tool returning the given results in turn."""
+    calls = []
+
+    def search_google(query: str):
+        r"""Search the web.
+
+        Args:
+            query (str): The query.
+        """
+        calls.append(query)
+        return results[len(calls) - 1]
+
+    return FunctionTool(search_google), calls
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        None,
+        (False, "Error while processing document"),
+        {"error": "google search failed."},
+        [{"error": "google search failed."}],
+        [{"title": "a", "url": "b"}, {"error": "rate limited"}],
+    ],
+)
+def test_failed_results_are_detected(result):
+    assert is_failed_result(result)
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        "",
+        [],
+        {},
+        (True, "content"),
+        [{"result_id": 1, "title": "a", "url": "b"}],
+        {"answer": "42"},
+    ],
+)
+def test_successful_results_are_detected(result):
+    assert not is_failed_result(result)
+
+
+def test_error_results_are_not_cached(cache):
+    tool, calls = _search_tool(
+        [[{"error": "google search failed."}], [{"title": "owl", "url": "u"}]]
+    )
+    [cached_tool] = cache.wrap([tool])
+
+    assert cached_tool(query="owl") == [{"error": "google search failed."}]
+    # The failure is not served again, the tool is called
+    assert cached_tool(query="owl") == [{"title": "owl", "url": "u"}]
+    # The success is
+    assert cached_tool(query="owl") == [{"title": "owl", "url": "u"}]
+    assert calls == ["owl", "owl"]
+    assert (cached_tool.hits, cached_tool.misses) == (1, 2)
+
+
+def test_error_dict_is_not_cached(cache):
+    tool, calls = _search_tool([{"error": "timeout"}, {"error": "timeout"}])
+    [cached_tool] = cache.wrap([tool])
+
+    cached_tool(query="owl")
+    cached_tool(query="owl")
+    assert len(calls) == 2
+
+
+def test_counts_of_proxied_tools(cache):
+    tool, _ = _search_tool(["a", "b"])
+    [cached_tool] = cache.wrap([tool])
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        proxy = _ThreadBoundTool(cached_tool, executor)
+        proxy(query="owl")
+        proxy(query="owl")
+
+    assert tool_cache_counts([proxy]) == {"hits": 1, "misses": 1}
+    assert tool_cache_counts([tool]) is None
+
+
+def test_rewritten_file_is_read_again(cache, tmp_path):
+    path = tmp_path / "notes.txt"
+    calls = []
+
+    def read_notes(file_path: str):
+        r"""Read a file.
+
+        Args:
+            file_path (str): The path of the file.
+        """
+        calls.append(file_path)
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    [cached_tool] = cache.wrap([FunctionTool(read_notes)])
+    path.write_text("old", encoding="utf-8")
+    assert cached_tool(file_path=str(path)) == "old"
+    assert cached_tool(file_path=str(path)) == "old"
+    assert len(calls) == 1
+
+    path.write_text("new content", encoding="utf-8")
+    assert cached_tool(file_path=str(path)) == "new content"
+    assert len(calls) == 2
+
+
+def test_document_toolkit_is_not_cached(cache, monkeypatch, tmp_path):
+    from owl.utils.document_toolkit import DocumentProcessingToolkit
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    toolkit = DocumentProcessingToolkit(cache_dir=str(tmp_path / "documents"))
+
+    tools = cache.wrap(toolkit.get_tools())
+
+    assert tools and not any(isinstance(tool, CachedFunctionTool) for tool in tools)
+    toolkit.close()